@@ -18,6 +18,9 @@ import arcpy  # third-parties second
 
 sys.path.append(os.path.dirname(__file__))
 
+# Kept open across the directors, not reloaded
+import director_pool
+
 def line_info(msg):
     f = inspect.currentframe()
     i = inspect.getframeinfo(f.f_back)
@@ -27,6 +30,15 @@ def main(project=""):
     try:
         base_project_folder = os.path.dirname(os.path.dirname(__file__))
 
+        # The IDW regions. Each director is given all of the regions at once,
+        # director_runner starts the largest regions first on the one Pool
+        # that is kept open for all of the steps.
+        idw_table_names = ["NBS_IDW", "ENBS_IDW", "HI_IDW", "SEUS_FAL_IDW", "SEUS_SPR_IDW", "SEUS_SUM_IDW",
+                           "WC_TRI_IDW", "GMEX_IDW", "AI_IDW", "GOA_IDW", "WC_ANN_IDW", "NEUS_FAL_IDW",
+                           "NEUS_SPR_IDW", "EBS_IDW",]
+
+        director_pool.start()
+
         #
         # Step 0 - create an ArcGIS Project
         #
@@ -194,11 +206,7 @@ def main(project=""):
 
             project_gdb = rf"{base_project_folder}\{project}\{project}.gdb"
 
-            director(project_gdb=project_gdb, Sequential=False, table_names=["NBS_IDW", "ENBS_IDW", "HI_IDW", "SEUS_FAL_IDW", "SEUS_SPR_IDW", "SEUS_SUM_IDW",])
-
-            director(project_gdb=project_gdb, Sequential=False, table_names=["WC_TRI_IDW", "GMEX_IDW", "AI_IDW", "GOA_IDW", "WC_ANN_IDW", "NEUS_FAL_IDW",])
-
-            director(project_gdb=project_gdb, Sequential=False, table_names=["NEUS_SPR_IDW", "EBS_IDW", "WC_GLMME"])
+            director(project_gdb=project_gdb, Sequential=False, table_names=idw_table_names + ["WC_GLMME"])
 
             # Debug
             #director(project_gdb=project_gdb, Sequential=False, table_names=["WC_GLMME",])
@@ -219,11 +227,7 @@ def main(project=""):
 
             project_gdb = rf"{base_project_folder}\{project}\{project}.gdb"
 
-            director(project_gdb=project_gdb, Sequential=False, table_names=["NBS_IDW", "ENBS_IDW", "HI_IDW", "SEUS_FAL_IDW", "SEUS_SPR_IDW", "SEUS_SUM_IDW",])
-
-            director(project_gdb=project_gdb, Sequential=False, table_names=["WC_TRI_IDW", "GMEX_IDW", "AI_IDW", "GOA_IDW", "WC_ANN_IDW", "NEUS_FAL_IDW",])
-
-            director(project_gdb=project_gdb, Sequential=False, table_names=["NEUS_SPR_IDW", "EBS_IDW", "WC_GLMME"])
+            director(project_gdb=project_gdb, Sequential=False, table_names=idw_table_names + ["WC_GLMME"])
 
             del project_gdb
             del director
@@ -244,15 +248,7 @@ def main(project=""):
                 director(project_gdb=project_gdb, Sequential=False, table_names=["WC_TRI_IDW", "AI_IDW"])
             del Test
 
-            director(project_gdb=project_gdb, Sequential=False, table_names=["NBS_IDW", "ENBS_IDW", "HI_IDW",])
-
-            director(project_gdb=project_gdb, Sequential=False, table_names=["SEUS_FAL_IDW", "SEUS_SPR_IDW", "SEUS_SUM_IDW",])
-
-            director(project_gdb=project_gdb, Sequential=False, table_names=["WC_TRI_IDW", "GMEX_IDW", "AI_IDW",])
-
-            director(project_gdb=project_gdb, Sequential=False, table_names=["GOA_IDW", "WC_ANN_IDW", "NEUS_FAL_IDW",])
-
-            director(project_gdb=project_gdb, Sequential=False, table_names=["NEUS_SPR_IDW", "EBS_IDW", "WC_GLMME"])
+            director(project_gdb=project_gdb, Sequential=False, table_names=idw_table_names + ["WC_GLMME"])
 
             del project_gdb
             del director
@@ -287,22 +283,7 @@ def main(project=""):
 
             project_gdb = rf"{base_project_folder}\{project}\{project}.gdb"
 
-            results = []
-
-##            result = director(project_gdb=project_gdb, Sequential=False, table_names=["NBS_IDW", "ENBS_IDW", "HI_IDW",])
-##            results.extend(result); del result
-##
-##            result = director(project_gdb=project_gdb, Sequential=False, table_names=["SEUS_FAL_IDW", "SEUS_SPR_IDW", "SEUS_SUM_IDW",])
-##            results.extend(result); del result
-
-##            result = director(project_gdb=project_gdb, Sequential=False, table_names=["WC_TRI_IDW", "AI_IDW", "GMEX_IDW",])
-##            results.extend(result); del result
-
-##            result = director(project_gdb=project_gdb, Sequential=False, table_names=["GOA_IDW", "WC_ANN_IDW", "NEUS_FAL_IDW",])
-##            results.extend(result); del result
-##
-##            result = director(project_gdb=project_gdb, Sequential=False, table_names=["NEUS_SPR_IDW", "EBS_IDW",])
-##            results.extend(result); del result
+            director(project_gdb=project_gdb, Sequential=False, table_names=idw_table_names)
 
             #result = director(project_gdb=project_gdb, Sequential=False, table_names=["WC_GLMME",])
             #results.extend(result); del result
@@ -328,19 +309,7 @@ def main(project=""):
                 # Debug
             del Test
 
-            director(project_gdb=project_gdb, Sequential=False, table_names=["NBS_IDW", "ENBS_IDW",])
-
-            director(project_gdb=project_gdb, Sequential=False, table_names=["HI_IDW", "SEUS_FAL_IDW",])
-
-            director(project_gdb=project_gdb, Sequential=False, table_names=["SEUS_SPR_IDW", "SEUS_SUM_IDW",])
-
-            director(project_gdb=project_gdb, Sequential=False, table_names=["WC_TRI_IDW", "GMEX_IDW",])
-
-            director(project_gdb=project_gdb, Sequential=False, table_names=["AI_IDW", "GOA_IDW",])
-
-            director(project_gdb=project_gdb, Sequential=False, table_names=["WC_ANN_IDW", "NEUS_FAL_IDW",])
-
-            director(project_gdb=project_gdb, Sequential=False, table_names=["NEUS_SPR_IDW", "EBS_IDW",])
+            director(project_gdb=project_gdb, Sequential=False, table_names=idw_table_names)
 
                 # Not yet
                 #result = director(project_gdb=project_gdb, Sequential=False, table_names=["WC_GLMME",])
@@ -365,22 +334,10 @@ def main(project=""):
             project_gdb = rf"{base_project_folder}\{project}\{project}.gdb"
 
             # Debug
-            director(project_gdb=project_gdb, Sequential=False, table_names=["GMEX_IDW",])
+            #director(project_gdb=project_gdb, Sequential=False, table_names=["GMEX_IDW",])
             # Debug
 
-    ##            director(project_gdb=project_gdb, Sequential=False, table_names=["NBS_IDW", "ENBS_IDW",])
-    ##
-    ##            director(project_gdb=project_gdb, Sequential=False, table_names=["HI_IDW", "SEUS_FAL_IDW",])
-    ##
-    ##            director(project_gdb=project_gdb, Sequential=False, table_names=["SEUS_SPR_IDW", "SEUS_SUM_IDW",])
-    ##
-    ##            director(project_gdb=project_gdb, Sequential=False, table_names=["WC_TRI_IDW", "GMEX_IDW",])
-    ##
-    ##            director(project_gdb=project_gdb, Sequential=False, table_names=["AI_IDW", "GOA_IDW",])
-    ##
-    ##            director(project_gdb=project_gdb, Sequential=False, table_names=["WC_ANN_IDW", "NEUS_FAL_IDW",])
-    ##
-    ##            director(project_gdb=project_gdb, Sequential=False, table_names=["NEUS_SPR_IDW", "EBS_IDW",])
+            director(project_gdb=project_gdb, Sequential=False, table_names=idw_table_names)
 
             del project_gdb
             del director
@@ -399,19 +356,7 @@ def main(project=""):
             #director(project_gdb=project_gdb, Sequential=False, table_names=["GMEX_IDW",])
             # Debug
 
-            director(project_gdb=project_gdb, Sequential=False, table_names=["NBS_IDW", "ENBS_IDW",])
-
-            director(project_gdb=project_gdb, Sequential=False, table_names=["HI_IDW", "SEUS_FAL_IDW",])
-
-            director(project_gdb=project_gdb, Sequential=False, table_names=["SEUS_SPR_IDW", "SEUS_SUM_IDW",])
-
-            director(project_gdb=project_gdb, Sequential=False, table_names=["WC_TRI_IDW", "GMEX_IDW",])
-
-            director(project_gdb=project_gdb, Sequential=False, table_names=["AI_IDW", "GOA_IDW",])
-
-            director(project_gdb=project_gdb, Sequential=False, table_names=["WC_ANN_IDW", "NEUS_FAL_IDW",])
-
-            director(project_gdb=project_gdb, Sequential=False, table_names=["NEUS_SPR_IDW", "EBS_IDW",])
+            director(project_gdb=project_gdb, Sequential=False, table_names=idw_table_names)
 
             del project_gdb
             del director
@@ -419,6 +364,9 @@ def main(project=""):
 
     # publish_to_portal_director
 
+        director_pool.close()
+
+        del idw_table_names
         del project
 
         results = True
@@ -448,6 +396,8 @@ def main(project=""):
         except:
             raise SystemExit(traceback.print_exc())
     finally:
+        # Ends the Pool when a step has failed, it is already closed otherwise
+        director_pool.terminate()
         if "results" in locals().keys(): del results
 
 if __name__ == '__main__':
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+#-------------------------------------------------------------------------------
+# Name:        core_species
+# Purpose:     Core species classification, a species is a core species
+#              when it was caught (WTCPUE > 0) in every survey year
+#
+# Author:      john.f.kennedy
+#
+# Created:     10/18/2026
+# Copyright:   (c) john.f.kennedy 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+# Used by dismap.calculate_core_species, which reads the Species, Year and
+# WTCPUE fields as columns with TableToNumPyArray and writes the CoreSpecies
+# field with a cursor. This module does not use arcpy.
+import pandas as pd
+
+def core_species(species, years, wtcpue):
+    # Returns a dictionary of species: True for the core species. The survey
+    # years are all of the years in the table, a species is a core species
+    # when the years with WTCPUE > 0 for the species are all of the survey
+    # years. A Null WTCPUE is not a catch.
+    df = pd.DataFrame({"Species" : species, "Year" : years, "WTCPUE" : pd.to_numeric(pd.Series(wtcpue), errors="coerce")})
+
+    n_years = df["Year"].nunique(dropna=False)
+
+    caught = df[df["WTCPUE"] > 0.0]
+
+    caught_years = caught.groupby("Species", sort=False, dropna=False)["Year"].nunique(dropna=False)
+
+    core = {specie : False for specie in pd.unique(df["Species"])}
+    core.update({specie : bool(n == n_years) for specie, n in caught_years.items()})
+
+    del df, n_years, caught, caught_years
+
+    return core
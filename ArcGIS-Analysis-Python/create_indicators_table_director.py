@@ -23,10 +23,6 @@ def line_info(msg):
     i = inspect.getframeinfo(f.f_back)
     return f"Script: {os.path.basename(i.filename)}\n\tNear Line: {i.lineno}\n\tFunction: {i.function}\n\tMessage: {msg}"
 
-# error callback function
-def custom_error_callback(error):
-    traceback.print_exception(type(error), error, error.__traceback__)
-
 def director(project_gdb="", Sequential=True, table_names=[]):
     try:
         # Test if passed workspace exists, if not raise SystemExit
@@ -36,9 +32,12 @@ def director(project_gdb="", Sequential=True, table_names=[]):
         import dismap
         importlib.reload(dismap)
 
+        import director_runner
+        importlib.reload(director_runner)
+
         import create_indicators_table_worker
         importlib.reload(create_indicators_table_worker)
-        from create_indicators_table_worker import worker
+        from create_indicators_table_worker import worker, worker_tasks, merge_tasks
         del create_indicators_table_worker
 
         arcpy.SetLogHistory(True) # Look in %AppData%\Roaming\Esri\ArcGISPro\ArcToolbox\History
@@ -114,6 +113,13 @@ def director(project_gdb="", Sequential=True, table_names=[]):
                 arcpy.management.Copy(rf"{project_gdb}\{table_name}_Longitude", rf"{region_gdb}\{table_name}_Longitude")
                 arcpy.AddMessage("\tCopy: {0}\n".format(arcpy.GetMessages(0).replace("\n", '\n\t')))
 
+                # The region's polygons, used as the zones of the Zonal Indicators table
+                geographic_area = [row[0] for row in arcpy.da.SearchCursor(rf"{project_gdb}\Datasets", ["GeographicArea"], where_clause = f"TableName = '{table_name}'")][0]
+                if arcpy.Exists(rf"{project_gdb}\{geographic_area}"):
+                    arcpy.management.Copy(rf"{project_gdb}\{geographic_area}", rf"{region_gdb}\{geographic_area}")
+                    arcpy.AddMessage("\tCopy: {0}\n".format(arcpy.GetMessages(0).replace("\n", '\n\t')))
+                del geographic_area
+
             else:
                 arcpy.AddWarning(f"One or more datasets contains zero records!!")
                 for d in datasets:
@@ -130,164 +136,14 @@ def director(project_gdb="", Sequential=True, table_names=[]):
 
             del region_gdb, table_name
 
-        results = []
-
-        # Sequential Processing
-        if Sequential:
-            arcpy.AddMessage(f"Sequential Processing")
-            jobs={}
-            for i in range(0, len(table_names)):
-                arcpy.AddMessage(f"Processing: {table_names[i]}")
-
-                table_name = table_names[i]
-                region_gdb = rf"{scratch_folder}\{table_name}.gdb"
-
-                worker_results = ""
-
-                try:
-                    worker_results = worker(region_gdb=region_gdb)
-                except SystemExit as se:
-                    pool.terminate()
-                    raise SystemExit(str(se))
-
-                if type(worker_results).__name__ == "str" and len(worker_results) != 0:
-                    results.append(worker_results)
-                elif type(worker_results).__name__ == "str" and len(worker_results) == 0:
-                    raise SystemExit(f"worker_results is str, but empty!!")
-                elif type(worker_results).__name__ == "list" and len(worker_results) != 0:
-                    if type(worker_results[0]).__name__ == "list":
-                        worker_results = [r for rt in worker_results for r in rt]
-                    for result in worker_results:
-                        results.append(result)
-                        del result
-                elif type(worker_results).__name__ == "list" and len(worker_results) == 0:
-                    raise SystemExit(f"worker_results is list, but empty!!")
-
-                del worker_results, region_gdb, table_name
-
-                del i
-            del jobs
-
-        # Non-Sequential Processing
-        if not Sequential and not results:
-            arcpy.AddMessage(f"Non-Sequential Processing")
-
-            import multiprocessing
-            from time import localtime, strftime, sleep
-
-            arcpy.env.autoCancelling = True
-
-            sys.path.append(os.path.dirname(__file__))
-            sys.path.append(sys.exec_prefix)
-
-            arcpy.AddMessage(f"Start multiprocessing using the ArcGIS Pro pythonw.exe.")
-            #Set multiprocessing exe in case we're running as an embedded process, i.e ArcGIS
-            #get_install_path() uses a registry query to figure out 64bit python exe if available
-            multiprocessing.set_executable(os.path.join(sys.exec_prefix, 'pythonw.exe'))
-
-            # Get CPU count and then take 2 away for other process
-            _processes = multiprocessing.cpu_count() - 2
-            _processes = _processes if len(table_names) >= _processes else len(table_names)
-            arcpy.AddMessage(f"Creating the multiprocessing Pool with {_processes} processes")
-            #Create a pool of workers, keep one cpu free for surfing the net.
-            #Let each worker process only handle 1 task before being restarted (in case of nasty memory leaks)
-            #with multiprocessing.Pool(processes=multiprocessing.cpu_count() - 1) as pool:
-            #with multiprocessing.Pool(processes=multiprocessing.cpu_count() - 1, maxtasksperchild=10) as pool:
-            with multiprocessing.Pool(processes=_processes, maxtasksperchild=10) as pool:
-
-                arcpy.AddMessage(f"\tPrepare arguments for processing")
-
-                # Use apply_async so we can handle exceptions gracefully
-                jobs={}
-                for i in range(0, len(table_names)):
-                    try:
-                        arcpy.AddMessage(f"Processing: {table_names[i]}")
-
-                        table_name = table_names[i]
-                        region_gdb = rf"{scratch_folder}\{table_name}.gdb"
-
-                        jobs[table_name] = pool.starmap_async(worker, [[region_gdb]], chunksize=10, error_callback=custom_error_callback)
-
-                        del table_name, region_gdb
-
-                    except SystemExit as se:
-                        pool.terminate()
-                        raise SystemExit(str(se))
-
-                    del i
-
-                all_finished = False
-                while True:
-                    all_finished = True
-
-                    arcpy.AddMessage(f"\nHave the workers finished?\nIt's {strftime('%a %b %d %I:%M %p', localtime())}")
-
-                    for table_name, result in jobs.items():
-                        if result.ready():
-                            arcpy.AddMessage(f"Process {table_name} has finished")
-                        else:
-                            all_finished = False
-                            arcpy.AddMessage(f"Process {table_name} is running. . .")
-                        del table_name, result
-
-                    if all_finished:
-                        break
-
-                    sleep(_processes * 7.5)
-
-                del all_finished
-                del _processes
-
-                arcpy.AddMessage(f"Get the return values")
-
-                for table_name, job_result in jobs.items():
-
-                    worker_results = ""
-
-                    try:
-                        worker_results = job_result.get()
-                    except SystemExit as se:
-                        pool.terminate()
-                        raise SystemExit(str(se))
-
-                    if type(worker_results).__name__ == "str" and len(worker_results) != 0:
-                        results.append(worker_results)
-                    elif type(worker_results).__name__ == "str" and len(worker_results) == 0:
-                        raise SystemExit(f"worker_results is str, but empty!!")
-                    elif type(worker_results).__name__ == "list" and len(worker_results) != 0:
-                        if type(worker_results[0]).__name__ == "list":
-                            worker_results = [r for rt in worker_results for r in rt]
-                        for result in worker_results:
-                            results.append(result)
-                            del result
-                    elif type(worker_results).__name__ == "list" and len(worker_results) == 0:
-                        raise SystemExit(f"worker_results is list, but empty!!")
-
-                    del table_name, job_result, worker_results
-
-                arcpy.AddMessage(f"\tClose the process pool")
-                # close the process pool
-                pool.close()
-                # wait for all tasks to complete and processes to close
-                arcpy.AddMessage(f"\tWait for all tasks to complete and processes to close")
-                pool.join()
-                # Just in case
-                pool.terminate()
-
-                del pool
-                del jobs
-
-            del multiprocessing, localtime, strftime, sleep
-
-            arcpy.AddMessage(f"\tDone with multiprocessing Pool")
-
-        # Post-Processing
-        arcpy.AddMessage("Post-Processing")
-        if results:
-            arcpy.AddMessage("Processing Results")
-            print(results)
-
-            for result in results:
+        # Copy a region's results to the project GDB as soon as its worker
+        # has finished, while the workers for the other regions are still
+        # running
+        def post_process(table_name, worker_results):
+            arcpy.AddMessage(f"Processing Results: {table_name}")
+            # The metadata of the region's datasets is added in one call
+            metadata_datasets = []
+            for result in worker_results:
 
                 dataset = os.path.basename(result)
                 region_gdb  = os.path.dirname(result)
@@ -307,12 +163,27 @@ def director(project_gdb="", Sequential=True, table_names=[]):
                     dismap.alter_fields(csv_data_folder, rf"{project_gdb}\{dataset}")
                 del desc
 
-                # Adding metadata
-                dismap.import_metadata(rf"{project_gdb}\{dataset}")
+                # Metadata is added after the loop
+                metadata_datasets.append(rf"{project_gdb}\{dataset}")
 
                 del region_gdb, dataset
 
                 del result
+            dismap.import_metadata(metadata_datasets)
+            del metadata_datasets
+
+            del table_name, worker_results
+
+        # Run the worker for each part of the species of each region. The
+        # parts of a region are written to its Indicators table by
+        # merge_tasks as soon as they finish (see director_runner).
+        results = director_runner.run_workers(worker, table_names, scratch_folder, Sequential, post_process, tasks=worker_tasks, merge=merge_tasks)
+
+        # Post-Processing
+        arcpy.AddMessage("Post-Processing")
+        if results:
+            arcpy.AddMessage("Processing Results")
+            print(results)
 
             deletes = []
             for result in results:
@@ -360,7 +231,7 @@ def director(project_gdb="", Sequential=True, table_names=[]):
         # Variables assigned in function
         del scratch_folder, csv_data_folder
         # Imports
-        del dismap, worker
+        del dismap, director_runner, worker, worker_tasks, merge_tasks, post_process
         # Function Parameters
         del project_gdb, Sequential, table_names
 
@@ -424,7 +295,8 @@ def process_indicator_tables(project_gdb="", project=""):
         dismap.import_metadata(indicators)
 
         #in_tables = [it for it in arcpy.ListTables("*_Indicators") if it == "AI_IDW_Indicators"]
-        in_tables = [it for it in arcpy.ListTables("*_Indicators") if not any(lo in it for lo in ["GFDL", "GLMME"])]
+        # The Zonal Indicators tables have a different schema and are not appended
+        in_tables = [it for it in arcpy.ListTables("*_Indicators") if not any(lo in it for lo in ["GFDL", "GLMME", "_Zonal_Indicators"])]
 
         if not in_tables:
             arcpy.AddWarning(f"Indicator Tables are not present in the {os.path.basename(project_gdb)} GDB")
@@ -104,663 +104,569 @@ def printRowContent(region_indicators):
     finally:
         if "results" in locals().keys(): del results
 
-def worker(region_gdb=""):
-    try:
-        # Test if passed workspace exists, if not raise SystemExit
-        if not arcpy.Exists(rf"{region_gdb}"):
-            raise SystemExit(line_info(f"{os.path.basename(region_gdb)} is missing!!"))
-
-        import numpy as np
-        import math
-
-        import dismap
-        importlib.reload(dismap)
-
-        np.seterr(divide='ignore', invalid='ignore')
-
-        arcpy.SetLogHistory(True) # Look in %AppData%\Roaming\Esri\ArcGISPro\ArcToolbox\History
-        arcpy.SetLogMetadata(True)
-        arcpy.SetSeverityLevel(2) # 0—A tool will not throw an exception, even if the tool produces an error or warning.
-                                  # 1—If a tool produces a warning or an error, it will throw an exception.
-                                  # 2—If a tool produces an error, it will throw an exception. This is the default.
-        arcpy.SetMessageLevels(['NORMAL']) # NORMAL, COMMANDSYNTAX, DIAGNOSTICS, PROJECTIONTRANSFORMATION
-
-        table_name        = os.path.basename(region_gdb).replace(".gdb","")
-        scratch_folder    = os.path.dirname(region_gdb)
-        project_folder    = os.path.dirname(scratch_folder)
-        csv_data_folder   = rf"{project_folder}\CSV Data"
-        image_folder      = rf"{project_folder}\Images"
-        scratch_workspace = rf"{scratch_folder}\{table_name}\scratch.gdb"
-
-        arcpy.AddMessage(f"Table Name: {table_name}\nProject Folder: {project_folder}\nScratch Folder: {scratch_folder}\n")
-
-        arcpy.env.workspace                 = region_gdb
-        arcpy.env.scratchWorkspace          = scratch_workspace
-        arcpy.env.overwriteOutput              = True
-        arcpy.env.parallelProcessingFactor  = "100%"
-        #arcpy.env.compression               = "LZ77"
-        #arcpy.env.geographicTransformations = "WGS_1984_(ITRF08)_To_NAD_1983_2011"
-        #arcpy.env.pyramid                   = "PYRAMIDS -1 BILINEAR LZ77 NO_SKIP"
-        arcpy.env.resamplingMethod          = "BILINEAR"
-        arcpy.env.resamplingMethod          = u'STATISTICS 1 1'
-        #arcpy.env.buildStatsAndRATForTempRaster = True
-
-        arcpy.management.CreateTable(region_gdb, f"{table_name}_Indicators", "", "", "")
-        arcpy.AddMessage("\tCreate Table: {0}\n".format(arcpy.GetMessages(0).replace("\n", '\n\t')))
-
-        dismap.add_fields(csv_data_folder, os.path.join(region_gdb, f"{table_name}_Indicators"))
-        dismap.import_metadata(rf"{region_gdb}\{table_name}_Indicators")
-
-        del csv_data_folder
-
-        arcpy.AddMessage(f"Generating {table_name} Indicators Table")
-
-        # "DatasetCode", "CSVFile", "TransformUnit", "TableName", "GeographicArea",
-        # "CellSize", "PointFeatureType", "FeatureClassName", "Region", "Season",
-        # "DateCode", "Status", "DistributionProjectCode", "DistributionProjectName",
-        # "SummaryProduct", "FilterRegion", "FilterSubRegion", "FeatureServiceName",
-        # "FeatureServiceTitle", "MosaicName", "MosaicTitle", "ImageServiceName",
-        # "ImageServiceTitle"
-
-        arcpy.AddMessage(f"\tGet list of vaules for the {table_name} Indicators table from the Datasets table")
-
-        fields = ["DatasetCode", "TableName", "CellSize", "Region", "Season",
-                  "DateCode", "DistributionProjectCode", "DistributionProjectName",
-                  "SummaryProduct",]
-        region_list = [row for row in arcpy.da.SearchCursor(rf"{region_gdb}\Datasets", fields, where_clause = f"TableName = '{table_name}'")][0]
-        del fields
-
-        # Assigning variables from items in the chosen table list
-        # ['AI_IDW', 'AI_IDW_Region', 'AI', 'Aleutian Islands', None, 'IDW']
-        datasetcode             = region_list[0]
-        table_name              = region_list[1]
-        cellsize                = region_list[2]
-        region                  = region_list[3]
-        season                  = region_list[4]
-        datecode                = region_list[5]
-        distributionprojectcode = region_list[6]
-        distributionprojectname = region_list[7]
-        summaryproduct          = region_list[8]
-        del region_list
-
-        # Convert the Month Day Year date code to YYYYMMDD
-        #datecode = dismap.date_code(datecode)
-        #print(datecode)
-        #print(dismap.date_code(datecode))
-
-        arcpy.env.cellSize = cellsize; del cellsize
-
-        # Region Raster Mask
-        datasetcode_raster_mask = os.path.join(region_gdb, f"{table_name}_Raster_Mask")
-
-        # we need to set the mask and extent of the environment, or the raster and items may not come out correctly.
-        arcpy.env.extent     = arcpy.Describe(datasetcode_raster_mask).extent
-        arcpy.env.mask       = datasetcode_raster_mask
-        arcpy.env.snapRaster = datasetcode_raster_mask
-        del datasetcode_raster_mask
-
-        # Region Indicators
-        region_indicators = rf"{region_gdb}\{table_name}_Indicators"
-
-        # Region Bathymetry
-        region_bathymetry = rf"{region_gdb}\{table_name}_Bathymetry"
-
-        # Region Latitude
-        region_latitude = rf"{region_gdb}\{table_name}_Latitude"
-
-        # Region Longitude
-        region_longitude = rf"{region_gdb}\{table_name}_Longitude"
-
-        layerspeciesyearimagename = rf"{region_gdb}\{table_name}_LayerSpeciesYearImageName"
-
-        input_rasters = {}
-
-        arcpy.AddMessage(f"\tCreate a list of input biomass raster path locations")
-
-        #fields = "DatasetCode;Region;Season;Species;CommonName;SpeciesCommonName;CoreSpecies;Year;StdTime;Variable;Value;Dimensions"
-        #fields = fields.split(";")
-        fields = ['ImageName', 'Variable', 'Species', 'CommonName', 'CoreSpecies', 'Year']
-
-        #print(fields)
-        #fields = [f.name for f in arcpy.ListFields(datasetcode_tmp) if f.type not in ['Geometry', 'OID']]
-        with arcpy.da.SearchCursor(layerspeciesyearimagename, fields, where_clause = f"DatasetCode = '{datasetcode}'") as cursor:
-            for row in cursor:
-                image_name, variable, species, commonname, corespecies, year = row[0], row[1], row[2], row[3], row[4], row[5]
-                #if variable not in variables: variables.append(variable)
-                #print(variable, image_name)
-                #variable = f"_{variable}" if "Species Richness" in variable else variable
-                if "Species Richness" not in variable:
-                    #print(variable, year)
-                    input_raster_path = rf"{image_folder}\{table_name}\{variable}\{image_name}.tif"
-                    #print(input_raster_path)
-                    #input_rasters[variable, year] = [image_name, variable, species, commonname, corespecies, year, input_raster_path]
-                    #input_rasters[variable][year] = [image_name, variable, species, commonname, corespecies, year, input_raster_path]
-                    #input_rasters[variable] = {year : image_name}
-                    if variable not in input_rasters:
-                        input_rasters[variable] = {year : [image_name, variable, species, commonname, corespecies, year, input_raster_path]}
-                    else:
-                        value = input_rasters[variable]
-                        if year not in value:
-                            value[year] = [image_name, variable, species, commonname, corespecies, year, input_raster_path]
-                            input_rasters[variable] = value
-                        del value
-
-                    del input_raster_path
-
-                del row, image_name, variable, species, commonname, corespecies, year
-            del cursor
-
-        #print(variables)
-        del fields
-        #del variables
-        del layerspeciesyearimagename
-        del image_folder
-
-        # Start with empty row_values list of list
-        row_values = []
-
-        arcpy.AddMessage(f"Interate over the species names")
-
-        for variable in sorted(input_rasters):
-
-            first_year = 9999
-
-            raster_years = input_rasters[variable]
-
-            for raster_year in sorted(raster_years):
-
-                image_name, variable, species, commonname, corespecies, year, input_raster_path = raster_years[raster_year]
-
-                PrintRecord = False
-                if PrintRecord:
-                    arcpy.AddMessage(f"\t> Image Name: {image_name}")
-                    arcpy.AddMessage(f"\t\t> Variable:      {variable}")
-                    arcpy.AddMessage(f"\t\t> Species:       {species}")
-                    arcpy.AddMessage(f"\t\t> Common Name:   {commonname}")
-                    arcpy.AddMessage(f"\t\t> Core Species:  {corespecies}")
-                    arcpy.AddMessage(f"\t\t> Year:          {year}")
-                    arcpy.AddMessage(f"\t\t> Output Raster: {os.path.basename(input_raster_path)}")
-                del PrintRecord
-
-                arcpy.AddMessage(f"Processing {image_name} Biomass Raster for year: {raster_year}")
-
-                # Get maximumBiomass value to filter out "zero" rasters
-                maximumBiomass = float(arcpy.management.GetRasterProperties(input_raster_path, "MAXIMUM").getOutput(0))
-
-                arcpy.AddMessage(f"\t> Biomass Raster Maximum: {maximumBiomass}")
-
-                # print(variable, corespecies, first_year, year)
-
-                # If maximumBiomass greater than zero, then process raster
-                if maximumBiomass > 0.0:
-                    # Test is for first year
-
-                    first_year = year if year < first_year else first_year
-                    #print(f"\t{first_year}, {year} {first_year == year}")
-
-                    arcpy.AddMessage(f"\t> Calculating biomassArray")
-
-                    biomassArray = arcpy.RasterToNumPyArray(input_raster_path, nodata_to_value=np.nan)
-                    biomassArray[biomassArray <= 0.0] = np.nan
-
-                    #sumWtCpue = sum of all wtcpue values (get this from input_raster_path stats??)
-                    sumBiomassArray = np.nansum(biomassArray)
-
-                    arcpy.AddMessage(f"\t> sumBiomassArray: {sumBiomassArray}")
-
-                    arcpy.AddMessage(f"\t> biomassArray non-nan count: {np.count_nonzero(~np.isnan(biomassArray))}")
-
-                    # ###--->>> Biomass End
-
-                    arcpy.AddMessage(f"\t> Calculating latitudeArray")
-
-                    # ###--->>> Latitude Start
-                    #CenterOfGravityLatitude    = None
-                    #MinimumLatitude            = None
-                    #MaximumLatitude            = None
-                    #OffsetLatitude             = None
-                    #CenterOfGravityLatitudeSE  = None
-
-                    # Latitude
-                    latitudeArray = arcpy.RasterToNumPyArray(region_latitude, nodata_to_value=np.nan)
-                    #print(latitudeArray.shape)
-                    latitudeArray[np.isnan(biomassArray)] = np.nan
-                    #print(latitudeArray.shape)
-
-                    #arcpy.AddMessage(f"\t\t> latitudeArray non-nan count: {np.count_nonzero(~np.isnan(latitudeArray)):,d}")
-
-                    #arcpy.AddMessage(f"\t\t> Latitude Min: {np.nanmin(latitudeArray)}")
-
-                    #arcpy.AddMessage(f"\t\t> Latitude Max: {np.nanmax(latitudeArray)}")
-
-                    # make the biomass and latitude arrays one dimensional
-
-                    flatBiomassArray = biomassArray.flatten()
-
-                    flatLatitudeArray = latitudeArray.flatten()
-
-                    # latsInds is an array of indexes representing the sort
-
-                    latsInds = flatLatitudeArray.argsort()
-
-                    # sort biomass and latitude arrays by lat sorted index
-
-                    sortedBiomassArray = flatBiomassArray[latsInds]
-                    sortedLatitudeArray = flatLatitudeArray[latsInds]
-
-                    # calculate the cumulative sum of the sorted biomass values
-
-                    sortedBiomassArrayCumSum = np.nancumsum(sortedBiomassArray)
-
-                    # quantile is cumulative sum value divided by total biomass
+def append_indicators(region_indicators="", indicators=None):
+    # Writes an indicators structured array to the table in bulk, with the
+    # NaN values and empty text as Null. The rows are grouped by their Null
+    # fields (see indicators_engine.null_groups), and each group is written
+    # without those fields, so they are Null in the table. The groups are
+    # merged and sorted by their row in the array before the one Append, so
+    # the rows stay in species and year order.
+    from numpy.lib import recfunctions
 
-                    sortedBiomassArrayQuantile = sortedBiomassArrayCumSum / np.nansum(flatBiomassArray)
+    import indicators_engine
+    importlib.reload(indicators_engine)
 
-                    # find the difference between 0.95 and each cumulative sum value ... asbolute value gives the closest distance
+    table_name = os.path.basename(region_indicators).lower()
 
-                    diffArray = np.abs(sortedBiomassArrayQuantile - 0.95)
+    groups = indicators_engine.null_groups(indicators)
 
-                    # find the index of the smallest difference
+    # Temporary tables
+    tmp_tables = []
+    for i, (fields, rows) in enumerate(groups):
+        tmp_table = rf"memory\{table_name}_tmp_{i}"
+        group = recfunctions.repack_fields(indicators[fields][rows])
+        if len(groups) > 1:
+            group = recfunctions.append_fields(group, "RowOrder", rows.astype("i4"), usemask=False)
+        arcpy.da.NumPyArrayToTable(group, tmp_table)
+        tmp_tables.append(tmp_table)
+        del i, fields, rows, tmp_table, group
 
-                    minIndex = diffArray.argmin()
+    if len(tmp_tables) > 1:
+        # A field missing from a group is Null in the merged table
+        arcpy.management.Merge(inputs = tmp_tables, output = rf"memory\{table_name}_merged")
+        arcpy.management.Sort(in_dataset = rf"memory\{table_name}_merged", out_dataset = rf"memory\{table_name}_sorted", sort_field = [["RowOrder", "ASCENDING"]])
+        tmp_tables.extend([rf"memory\{table_name}_merged", rf"memory\{table_name}_sorted"])
 
-                    # get the lat at that index
+    # RowOrder is not in the target, so it is left out by NO_TEST
+    arcpy.management.Append(inputs = tmp_tables[-1], target = region_indicators, schema_type="NO_TEST", field_mapping="", subtype="")
+    arcpy.AddMessage("\tAppend: {0}\n".format(arcpy.GetMessages(0).replace("\n", '\n\t')))
 
-                    #maxLat = sortedLatitudeArray[minIndex]
-                    MaximumLatitude = sortedLatitudeArray[minIndex]
+    # Remove the temporary tables
+    for tmp_table in tmp_tables:
+        arcpy.management.Delete(tmp_table)
+        del tmp_table
 
-                    # do the same for 0.05
+    del recfunctions, indicators_engine, table_name, groups, tmp_tables, region_indicators, indicators
 
-                    diffArray = np.abs(sortedBiomassArrayQuantile - 0.05)
+def write_indicators(region_gdb="", indicators=None, writer=append_indicators):
+    # Creates the region's Indicators table and writes the indicators
+    # structured array (see indicators_engine.indicators_array) with writer,
+    # a function of (table, indicators). Returns the path of the table.
+    import dismap
+    importlib.reload(dismap)
 
-                    minIndex = diffArray.argmin()
+    table_name      = os.path.basename(region_gdb).replace(".gdb","")
+    csv_data_folder = rf"{os.path.dirname(os.path.dirname(region_gdb))}\CSV Data"
 
-                    #minLat = sortedLatitudeArray[minIndex]
-                    MinimumLatitude = sortedLatitudeArray[minIndex]
+    region_indicators = rf"{region_gdb}\{table_name}_Indicators"
 
-                    del sortedBiomassArrayCumSum, sortedBiomassArrayQuantile
-                    del diffArray, minIndex
-                    del sortedLatitudeArray, sortedBiomassArray, flatBiomassArray
-                    del latsInds, flatLatitudeArray
+    arcpy.management.CreateTable(region_gdb, f"{table_name}_Indicators", "", "", "")
+    arcpy.AddMessage("\tCreate Table: {0}\n".format(arcpy.GetMessages(0).replace("\n", '\n\t')))
 
-                    weightedLatitudeArray = np.multiply(biomassArray, latitudeArray)
+    dismap.add_fields(csv_data_folder, region_indicators)
+    dismap.import_metadata(region_indicators)
 
-                    sumWeightedLatitudeArray = np.nansum(weightedLatitudeArray)
+    del csv_data_folder, table_name
 
-                    #arcpy.AddMessage("\t\t> Sum Weighted Latitude: {sumWeightedLatitudeArray}")
+    arcpy.AddMessage(f"Inserting {len(indicators)} records into the table")
 
-                    CenterOfGravityLatitude = sumWeightedLatitudeArray / sumBiomassArray
+    if len(indicators):
+        writer(region_indicators, indicators)
 
-                    if year == first_year:
-                        first_year_offset_latitude = CenterOfGravityLatitude
+    getcount = arcpy.management.GetCount(region_indicators)[0]
+    arcpy.AddMessage(f'\n> "{os.path.basename(region_indicators)}" has {getcount} records\n')
+    del getcount
 
-                    OffsetLatitude = CenterOfGravityLatitude - first_year_offset_latitude
+    del dismap, indicators, region_gdb, writer
 
-                    weightedLatitudeArrayVariance = np.nanvar(weightedLatitudeArray)
-                    weightedLatitudeArrayCount = np.count_nonzero(~np.isnan(weightedLatitudeArray))
+    return region_indicators
 
-                    CenterOfGravityLatitudeSE = math.sqrt(weightedLatitudeArrayVariance) / math.sqrt(weightedLatitudeArrayCount)
+def region_setup(region_gdb=""):
+    # The values that are the same for every task of a region: the values
+    # from the Datasets table, the biomass rasters, the image statistics,
+    # the ledger, the covariates and the zones. Called once for a region, by
+    # worker_tasks when the region is split, otherwise by the worker.
+    import numpy as np
 
-                    del weightedLatitudeArrayVariance, weightedLatitudeArrayCount
+    import image_statistics
+    importlib.reload(image_statistics)
 
-                    #arcpy.AddMessage(f"\t\t> Center of Gravity Latitude: {round(CenterOfGravityLatitude,6)}"
-                    arcpy.AddMessage(f"\t\t> Center of Gravity Latitude: {CenterOfGravityLatitude}")
-                    arcpy.AddMessage(f"\t\t> Minimum Latitude (5th Percentile): {MinimumLatitude}")
-                    arcpy.AddMessage(f"\t\t> Maximum Latitude (95th Percentile): {MaximumLatitude}")
-                    arcpy.AddMessage(f"\t\t> Offset Latitude: {OffsetLatitude}")
-                    arcpy.AddMessage(f"\t\t> Center of Gravity Latitude Standard Error: {CenterOfGravityLatitudeSE}")
+    import indicators_engine
+    importlib.reload(indicators_engine)
 
-                    del latitudeArray, weightedLatitudeArray, sumWeightedLatitudeArray
+    import indicators_ledger
+    importlib.reload(indicators_ledger)
 
-                    # ###--->>> Latitude End
+    table_name   = os.path.basename(region_gdb).replace(".gdb","")
+    image_folder = rf"{os.path.dirname(os.path.dirname(region_gdb))}\Images"
 
-                    arcpy.AddMessage(f"\t> Calculating longitudeArray")
+    # "DatasetCode", "CSVFile", "TransformUnit", "TableName", "GeographicArea",
+    # "CellSize", "PointFeatureType", "FeatureClassName", "Region", "Season",
+    # "DateCode", "Status", "DistributionProjectCode", "DistributionProjectName",
+    # "SummaryProduct", "FilterRegion", "FilterSubRegion", "FeatureServiceName",
+    # "FeatureServiceTitle", "MosaicName", "MosaicTitle", "ImageServiceName",
+    # "ImageServiceTitle"
 
-                    # ###--->>> Longitude Start
-                    #CenterOfGravityLongitude   = None
-                    #MinimumLongitude           = None
-                    #MaximumLongitude           = None
-                    #OffsetLongitude            = None
-                    #CenterOfGravityLongitudeSE = None
+    arcpy.AddMessage(f"\tGet list of vaules for the {table_name} Indicators table from the Datasets table")
 
-                    # For issue of international date line
-                    # Added/Modified by JFK June 15, 2022
-                    longitudeArray = arcpy.RasterToNumPyArray(region_longitude, nodata_to_value=np.nan)
+    fields = ["DatasetCode", "Region", "Season", "DateCode", "DistributionProjectCode",
+              "DistributionProjectName", "SummaryProduct", "FilterSubRegion", "CellSize", "GeographicArea",]
+    region_list = [row for row in arcpy.da.SearchCursor(rf"{region_gdb}\Datasets", fields, where_clause = f"TableName = '{table_name}'")][0]
+    del fields
 
-                    longitudeArray = np.mod(longitudeArray, 360.0)
+    setup = dict(zip(["datasetcode", "region", "season", "datecode", "distributionprojectcode",
+                      "distributionprojectname", "summaryproduct", "filter_subregion",], region_list[:8]))
+    cellsize, geographic_area = region_list[8], region_list[9]
+    del region_list
 
-                    longitudeArray[np.isnan(biomassArray)] = np.nan
+    input_rasters = {}
 
-                    # make the biomass and latitude arrays one dimensional
+    arcpy.AddMessage(f"\tCreate a list of input biomass raster path locations")
 
-                    flatBiomassArray = biomassArray.flatten()
+    fields = ['ImageName', 'Variable', 'Species', 'CommonName', 'CoreSpecies', 'Year']
 
-                    flatLongitudeArray = longitudeArray.flatten()
-
-                    # longsInds is an array of indexes representing the sort
-
-                    longsInds = flatLongitudeArray.argsort()
-
-                    # sort biomass and latitude arrays by long sorted index
-
-                    sortedBiomassArray = flatBiomassArray[longsInds]
-                    sortedLongitudeArray = flatLongitudeArray[longsInds]
-
-                    # calculate the cumulative sum of the sorted biomass values
-
-                    sortedBiomassArrayCumSum = np.nancumsum(sortedBiomassArray)
-
-                    # quantile is cumulative sum value divided by total biomass
-
-                    sortedBiomassArrayQuantile = sortedBiomassArrayCumSum / np.nansum(flatBiomassArray)
-
-                    # find the difference between 0.95 and each cumulative sum value ... asbolute value gives the closest distance
-
-                    diffArray = np.abs(sortedBiomassArrayQuantile - 0.95)
-
-                    # find the index of the smallest difference
-
-                    minIndex = diffArray.argmin()
-
-                    # get the lat at that index
-
-                    MaximumLongitude = sortedLongitudeArray[minIndex]
-
-                    # do the same for 0.05
-
-                    diffArray = np.abs(sortedBiomassArrayQuantile - 0.05)
-
-                    minIndex = diffArray.argmin()
-
-                    MinimumLongitude = sortedLongitudeArray[minIndex]
-
-                    del sortedBiomassArrayCumSum, sortedBiomassArrayQuantile, diffArray, minIndex
-                    del sortedLongitudeArray, sortedBiomassArray, flatBiomassArray
-                    del longsInds, flatLongitudeArray
-
-                    weightedLongitudeArray = np.multiply(biomassArray, longitudeArray)
-
-                    sumWeightedLongitudeArray = np.nansum(weightedLongitudeArray)
-
-                    CenterOfGravityLongitude = sumWeightedLongitudeArray / sumBiomassArray
-
-                    if year == first_year:
-                       first_year_offset_longitude = CenterOfGravityLongitude
-
-                    OffsetLongitude = CenterOfGravityLongitude - first_year_offset_longitude
-
-                    weightedLongitudeArrayVariance = np.nanvar(weightedLongitudeArray)
-                    weightedLongitudeArrayCount = np.count_nonzero(~np.isnan(weightedLongitudeArray))
-
-                    CenterOfGravityLongitudeSE = math.sqrt(weightedLongitudeArrayVariance) / math.sqrt(weightedLongitudeArrayCount)
-
-                    del weightedLongitudeArrayVariance, weightedLongitudeArrayCount
-
-                    # Convert 360 back to 180
-                    # Added/Modified by JFK June 15, 2022
-                    CenterOfGravityLongitude = np.mod(CenterOfGravityLongitude - 180.0, 360.0) - 180.0
-                    MinimumLongitude = np.mod(MinimumLongitude - 180.0, 360.0) - 180.0
-                    MaximumLongitude = np.mod(MaximumLongitude - 180.0, 360.0) - 180.0
-
-                    #arcpy.AddMessage(f"\t\t> Sum Weighted Longitude: {0}".format(sumWeightedLongitudeArray))
-
-                    #arcpy.AddMessage(f"\t\t> Center of Gravity Longitude: {round(CenterOfGravityLongitude,6)}"
-                    arcpy.AddMessage(f"\t\t> Center of Gravity Longitude: {CenterOfGravityLongitude}")
-
-                    #arcpy.AddMessage(F"\t\t> Center of Gravity Longitude: {np.mod(CenterOfGravityLongitude - 180.0, 360.0) -180.0}")
-
-                    arcpy.AddMessage(f"\t\t> Minimum Longitude (5th Percentile): {MinimumLongitude}")
-                    arcpy.AddMessage(f"\t\t> Maximum Longitude (95th Percentile): {MaximumLongitude}")
-                    arcpy.AddMessage(f"\t\t> Offset Longitude: {OffsetLongitude}")
-                    arcpy.AddMessage(f"\t\t> Center of Gravity Longitude Standard Error: {CenterOfGravityLongitudeSE}")
-
-                    del longitudeArray, weightedLongitudeArray, sumWeightedLongitudeArray
-
-                    # ###--->>> Longitude End
-
-                    arcpy.AddMessage(f"\t> Calculating bathymetryArray")
-
-                    # ###--->>> Center of Gravity Depth (Bathymetry) Start
-
-                    #CenterOfGravityDepth       = None
-                    #MinimumDepth               = None
-                    #MaximumDepth               = None
-                    #OffsetDepth                = None
-                    #CenterOfGravityDepthSE     = None
-
-                    # Bathymetry
-                    bathymetryArray = arcpy.RasterToNumPyArray(region_bathymetry, nodata_to_value=np.nan)
-                    # If biomass cells are Null, make bathymetry cells Null as well
-                    bathymetryArray[np.isnan(biomassArray)] = np.nan
-                    # For bathymetry values zero are larger, make zero
-                    bathymetryArray[bathymetryArray >= 0.0] = 0.0
-
-                    #arcpy.AddMessage("\t\t> bathymetryArray non-nan count: {0}".format(np.count_nonzero(~np.isnan(bathymetryArray)))
-                    #arcpy.AddMessage("\t\t> Bathymetry Min: {0}".format(np.nanmin(bathymetryArray))
-                    #arcpy.AddMessage("\t\t> Bathymetry Max: {0}".format(np.nanmax(bathymetryArray))
-                    # make the biomass and latitude arrays one dimensional
-
-                    flatBiomassArray = biomassArray.flatten()
-
-                    flatBathymetryArray = bathymetryArray.flatten()
-
-                    # bathyInds is an array of indexes representing the sort
-
-                    bathyInds = flatBathymetryArray.argsort()
+    with arcpy.da.SearchCursor(rf"{region_gdb}\{table_name}_LayerSpeciesYearImageName", fields, where_clause = f"DatasetCode = '{setup['datasetcode']}'") as cursor:
+        for row in cursor:
+            image_name, variable, species, commonname, corespecies, year = row[0], row[1], row[2], row[3], row[4], row[5]
+            if "Species Richness" not in variable:
+                input_raster_path = rf"{image_folder}\{table_name}\{variable}\{image_name}.tif"
+                if year not in input_rasters.setdefault(variable, {}):
+                    input_rasters[variable][year] = [image_name, variable, species, commonname, corespecies, year, input_raster_path]
+                del input_raster_path
+            del row, image_name, variable, species, commonname, corespecies, year
+        del cursor
+    del fields
 
-                    # sort biomass and latitude arrays by lat sorted index
+    setup["input_rasters"] = input_rasters
 
-                    sortedBiomassArray = flatBiomassArray[bathyInds]
-                    sortedBathymetryArray = flatBathymetryArray[bathyInds]
+    # The statistics saved by create_rasters_worker, so GetRasterProperties
+    # is only needed for rasters that are missing from the file
+    setup["raster_statistics"] = image_statistics.read_image_statistics(image_statistics.image_statistics_path(image_folder, table_name))
 
-                    # calculate the cumulative sum of the sorted biomass values
+    arcpy.AddMessage(f"\tImage statistics found for {len([1 for years in input_rasters.values() for value in years.values() if value[0] in setup['raster_statistics']])} biomass rasters")
 
-                    sortedBiomassArrayCumSum = np.nancumsum(sortedBiomassArray)
+    # The indicators calculated on earlier runs, a raster is only
+    # calculated again when its checksum or the covariate checksum changes,
+    # and only read for its zones when the zone checksum changes
+    setup["ledger"] = indicators_ledger.read_indicators_ledger(indicators_ledger.indicators_ledger_path(image_folder, table_name), indicators_ledger.zonal_ledger_path(image_folder, table_name))
 
-                    # quantile is cumulative sum value divided by total biomass
+    arcpy.AddMessage(f"\tIndicators ledger has {len(setup['ledger'])} entries")
 
-                    sortedBiomassArrayQuantile = sortedBiomassArrayCumSum/np.nansum(flatBiomassArray)
+    arcpy.AddMessage(f"\tLoad the {table_name} Latitude, Longitude and Bathymetry rasters")
 
-                    # find the difference between 0.95 and each cumulative sum
-                    # value ... asbolute value gives the closest distance
+    # These grids are the same for every species-year in the region, so they
+    # are decoded and sorted once
+    covariates = indicators_engine.region_covariates(
+                                                     arcpy.RasterToNumPyArray(rf"{region_gdb}\{table_name}_Latitude", nodata_to_value=np.nan),
+                                                     arcpy.RasterToNumPyArray(rf"{region_gdb}\{table_name}_Longitude", nodata_to_value=np.nan),
+                                                     arcpy.RasterToNumPyArray(rf"{region_gdb}\{table_name}_Bathymetry", nodata_to_value=np.nan),
+                                                    )
 
-                    diffArray = np.abs(sortedBiomassArrayQuantile - 0.95)
+    setup["covariates"]         = covariates
+    setup["covariate_checksum"] = indicators_engine.covariates_checksum(covariates)
 
-                    # find the index of the smallest difference
+    # The zones are the polygons of the region's GeographicArea feature
+    # class (copied by the director). They are rasterized and labeled
+    # once, and only used when the region has more than one polygon.
+    region_zones = rf"{region_gdb}\{geographic_area}"
 
-                    minIndex = diffArray.argmin()
+    if arcpy.Exists(region_zones) and int(arcpy.management.GetCount(region_zones)[0]) > 1:
+        arcpy.AddMessage(f"\tCreate the zone labels from the {int(arcpy.management.GetCount(region_zones)[0])} {geographic_area} polygons")
 
-                    # get the lat at that index
+        # The zones are on the grid of the Region Raster Mask. The
+        # environment is only set for the conversion, so the settings of
+        # the director are left as they are when it splits the region.
+        datasetcode_raster_mask = os.path.join(region_gdb, f"{table_name}_Raster_Mask")
+        zone_raster = rf"memory\{table_name}_Zones"
+        with arcpy.EnvManager(cellSize = cellsize, extent = arcpy.Describe(datasetcode_raster_mask).extent, mask = datasetcode_raster_mask, snapRaster = datasetcode_raster_mask):
+            arcpy.conversion.PolygonToRaster(in_features = region_zones, value_field = "OBJECTID", out_rasterdataset = zone_raster, cell_assignment = "CELL_CENTER", priority_field = "", cellsize = cellsize)
+        setup["zones"] = indicators_engine.region_zones(arcpy.RasterToNumPyArray(zone_raster, nodata_to_value=0), covariates)
+        setup["zone_checksum"] = indicators_engine.zones_checksum(setup["zones"])
+        arcpy.management.Delete(zone_raster)
+        del datasetcode_raster_mask, zone_raster
+    else:
+        setup["zones"] = None
+        setup["zone_checksum"] = ""
 
-                    #maxLat = sortedBathymetryArray[minIndex]
-                    MaximumDepth = sortedBathymetryArray[minIndex]
+    del region_zones, geographic_area, cellsize, input_rasters, covariates
+    del np, image_statistics, indicators_engine, indicators_ledger
+    del table_name, image_folder, region_gdb
 
-                    # do the same for 0.05
+    return setup
 
-                    diffArray = np.abs(sortedBiomassArrayQuantile - 0.05)
+def region_arrays_path(region_gdb=""):
+    # The .npz file with the covariates and zones of a split region, in the
+    # region's scratch folder, e.g. Scratch\AI_IDW\AI_IDW_Region_Arrays.npz
+    table_name = os.path.basename(region_gdb).replace(".gdb","")
+    return rf"{os.path.dirname(region_gdb)}\{table_name}\{table_name}_Region_Arrays.npz"
 
-                    minIndex = diffArray.argmin()
+def worker_tasks(region_gdb=""):
+    # The species of the region split into parts, one task for each part, so
+    # a large region is spread over the Pool (see director_runner.run_workers).
+    # The offsets are calculated across the years of a species, so a species
+    # is never split between tasks. The region is set up once here (see
+    # region_setup) and each task gets the values for its species. The
+    # covariates and zones are saved to a .npz file that the tasks load, so
+    # they are not copied to each task.
+    import multiprocessing
+
+    import indicators_engine
+    importlib.reload(indicators_engine)
+
+    setup = region_setup(region_gdb)
+
+    variables = sorted(setup["input_rasters"])
+
+    # Get CPU count and then take 2 away for other process
+    parts = min(max(multiprocessing.cpu_count() - 2, 1), len(variables))
+
+    # The parts are in species order, so the rows of the parts are joined in
+    # part order
+    size = -(-len(variables) // parts) if parts else 0
+
+    tasks = []
+
+    if size:
+        region_arrays = region_arrays_path(region_gdb)
+        indicators_engine.save_region_arrays(region_arrays, setup["covariates"], setup["zones"])
+
+        shared = {key : value for key, value in setup.items() if key not in ["input_rasters", "raster_statistics", "ledger", "covariates", "zones"]}
+
+        for i in range(0, len(variables), size):
+            input_rasters = {variable : setup["input_rasters"][variable] for variable in variables[i:i + size]}
+            image_names   = {value[0] for years in input_rasters.values() for value in years.values()}
+            task_setup    = dict(shared,
+                                 input_rasters     = input_rasters,
+                                 raster_statistics = {image_name : value for image_name, value in setup["raster_statistics"].items() if image_name in image_names},
+                                 ledger            = {image_name : entry for image_name, entry in setup["ledger"].items() if image_name in image_names},
+                                 region_arrays     = region_arrays,)
+            tasks.append({"variables" : variables[i:i + size], "part" : i // size, "setup" : task_setup})
+            del i, input_rasters, image_names, task_setup
+
+        del region_arrays, shared
+
+    del multiprocessing, indicators_engine, setup, variables, parts, size
+
+    return tasks
+
+def write_zonal_indicators(region_gdb="", zonal=None, writer=append_indicators):
+    # Creates the region's Zonal Indicators table and writes the zonal
+    # structured array (see indicators_engine.zonal_array). The table is not
+    # in table_definitions.json, so the fields are added from the dtype.
+    # Returns the path of the table.
+    table_name = os.path.basename(region_gdb).replace(".gdb","")
+
+    region_zonal_indicators = rf"{region_gdb}\{table_name}_Zonal_Indicators"
+
+    arcpy.management.CreateTable(region_gdb, f"{table_name}_Zonal_Indicators", "", "", "")
+    arcpy.AddMessage("\tCreate Table: {0}\n".format(arcpy.GetMessages(0).replace("\n", '\n\t')))
+
+    field_types = {"U" : "TEXT", "i" : "LONG", "f" : "DOUBLE",}
+    field_description = [[field, field_types[zonal.dtype[field].kind], "", zonal.dtype[field].itemsize // 4 if zonal.dtype[field].kind == "U" else ""] for field in zonal.dtype.names]
+    arcpy.management.AddFields(in_table=region_zonal_indicators, field_description=field_description, template="")
+    arcpy.AddMessage("\tAdd Fields: {0}\n".format(arcpy.GetMessages(0).replace("\n", '\n\t')))
+    del field_types, field_description
+
+    arcpy.AddMessage(f"Inserting {len(zonal)} records into the table")
+
+    if len(zonal):
+        writer(region_zonal_indicators, zonal)
+
+    del table_name, zonal, region_gdb, writer
+
+    return region_zonal_indicators
+
+def write_ledger(region_gdb="", ledger={}):
+    # Saves the new and changed entries of the region's indicators ledger,
+    # after the Indicators table has been written
+    import indicators_ledger
+    importlib.reload(indicators_ledger)
+
+    table_name   = os.path.basename(region_gdb).replace(".gdb","")
+    image_folder = rf"{os.path.dirname(os.path.dirname(region_gdb))}\Images"
+
+    if ledger:
+        arcpy.AddMessage(f"Saving {len(ledger)} entries to the {table_name} indicators ledger")
+        indicators_ledger.write_indicators_ledger(indicators_ledger.indicators_ledger_path(image_folder, table_name), ledger, indicators_ledger.zonal_ledger_path(image_folder, table_name))
+
+    del indicators_ledger, table_name, image_folder, region_gdb, ledger
+
+def merge_tasks(region_gdb="", task_results=[]):
+    # Writes the indicators of all of the region's tasks, in part order, to
+    # the region's Indicators table (and Zonal Indicators table, when the
+    # region has zones), then saves the ledger entries
+    import numpy as np
+    task_results = sorted(task_results, key=lambda task_result: task_result[0])
+    indicators = np.concatenate([indicators for part, indicators, ledger, zonal in task_results])
+    results = [write_indicators(region_gdb, indicators)]
+    zonal = [zonal for part, indicators, ledger, zonal in task_results if zonal is not None]
+    if zonal:
+        results.append(write_zonal_indicators(region_gdb, np.concatenate(zonal)))
+    write_ledger(region_gdb, {image_name : entry for part, indicators, ledger, zonal in task_results for image_name, entry in ledger.items()})
+    # The covariates and zones saved by worker_tasks
+    if os.path.isfile(region_arrays_path(region_gdb)):
+        os.remove(region_arrays_path(region_gdb))
+    del np, task_results, indicators, zonal
+    return results
 
-                    #minLat = sortedBathymetryArray[minIndex]
-                    MinimumDepth = sortedBathymetryArray[minIndex]
+def worker(region_gdb="", variables=None, part=0, setup=None):
+    # variables: the species variables to calculate the indicators for. When
+    # None, all of the region's species are calculated and the Indicators
+    # table is written. Otherwise [part, indicators, ledger, zonal] is
+    # returned and written by merge_tasks.
+    # setup: the values from region_setup, given by worker_tasks
+    try:
+        # Test if passed workspace exists, if not raise SystemExit
+        if not arcpy.Exists(rf"{region_gdb}"):
+            raise SystemExit(line_info(f"{os.path.basename(region_gdb)} is missing!!"))
 
-                    del sortedBiomassArrayCumSum, sortedBiomassArrayQuantile, diffArray, minIndex
-                    del sortedBathymetryArray, sortedBiomassArray, flatBiomassArray
-                    del bathyInds, flatBathymetryArray
+        import numpy as np
 
-                    weightedBathymetryArray = np.multiply(biomassArray, bathymetryArray)
+        import dismap
+        importlib.reload(dismap)
 
-                    sumWeightedBathymetryArray = np.nansum(weightedBathymetryArray)
+        import weighted_quantile
+        importlib.reload(weighted_quantile)
 
-                    arcpy.AddMessage(f"\t\t> Sum Weighted Bathymetry: {sumWeightedBathymetryArray}")
+        import indicators_engine
+        importlib.reload(indicators_engine)
 
-                    CenterOfGravityDepth = sumWeightedBathymetryArray / sumBiomassArray
+        import indicators_ledger
+        importlib.reload(indicators_ledger)
 
-                    if year == first_year:
-                        first_year_offset_depth = CenterOfGravityDepth
+        np.seterr(divide='ignore', invalid='ignore')
 
-                    OffsetDepth = CenterOfGravityDepth - first_year_offset_depth
+        arcpy.SetLogHistory(True) # Look in %AppData%\Roaming\Esri\ArcGISPro\ArcToolbox\History
+        arcpy.SetLogMetadata(True)
+        arcpy.SetSeverityLevel(2) # 0—A tool will not throw an exception, even if the tool produces an error or warning.
+                                  # 1—If a tool produces a warning or an error, it will throw an exception.
+                                  # 2—If a tool produces an error, it will throw an exception. This is the default.
+        arcpy.SetMessageLevels(['NORMAL']) # NORMAL, COMMANDSYNTAX, DIAGNOSTICS, PROJECTIONTRANSFORMATION
 
-                    weightedBathymetryArrayVariance = np.nanvar(weightedBathymetryArray)
-                    weightedBathymetryArrayCount = np.count_nonzero(~np.isnan(weightedBathymetryArray))
+        table_name        = os.path.basename(region_gdb).replace(".gdb","")
+        scratch_folder    = os.path.dirname(region_gdb)
+        project_folder    = os.path.dirname(scratch_folder)
+        csv_data_folder   = rf"{project_folder}\CSV Data"
+        scratch_workspace = rf"{scratch_folder}\{table_name}\scratch.gdb"
 
-                    CenterOfGravityDepthSE = math.sqrt(weightedBathymetryArrayVariance) / math.sqrt(weightedBathymetryArrayCount)
+        arcpy.AddMessage(f"Table Name: {table_name}\nProject Folder: {project_folder}\nScratch Folder: {scratch_folder}\n")
 
-                    del weightedBathymetryArrayVariance, weightedBathymetryArrayCount
+        arcpy.env.workspace                 = region_gdb
+        arcpy.env.scratchWorkspace          = scratch_workspace
+        arcpy.env.overwriteOutput              = True
+        arcpy.env.parallelProcessingFactor  = "100%"
+        #arcpy.env.compression               = "LZ77"
+        #arcpy.env.geographicTransformations = "WGS_1984_(ITRF08)_To_NAD_1983_2011"
+        #arcpy.env.pyramid                   = "PYRAMIDS -1 BILINEAR LZ77 NO_SKIP"
+        arcpy.env.resamplingMethod          = "BILINEAR"
+        arcpy.env.resamplingMethod          = u'STATISTICS 1 1'
+        #arcpy.env.buildStatsAndRATForTempRaster = True
 
-                    arcpy.AddMessage("\t\t> Center of Gravity Depth: {0}".format(CenterOfGravityDepth))
+        del csv_data_folder
 
-                    arcpy.AddMessage("\t\t> Minimum Depth (5th Percentile): {0}".format(MinimumDepth))
+        arcpy.AddMessage(f"Generating {table_name} Indicators Table")
 
-                    arcpy.AddMessage("\t\t> Maximum Depth (95th Percentile): {0}".format(MaximumDepth))
+        # The values that are the same for every task of the region (see
+        # region_setup). The tasks of a split region get them from
+        # worker_tasks, with the covariates and zones in a .npz file.
+        if setup is None:
+            setup = region_setup(region_gdb)
+        else:
+            setup = dict(setup)
+            setup["covariates"], setup["zones"] = indicators_engine.load_region_arrays(setup.pop("region_arrays"))
+
+        datasetcode             = setup["datasetcode"]
+        region                  = setup["region"]
+        season                  = setup["season"]
+        datecode                = setup["datecode"]
+        distributionprojectcode = setup["distributionprojectcode"]
+        distributionprojectname = setup["distributionprojectname"]
+        summaryproduct          = setup["summaryproduct"]
+        filter_subregion        = setup["filter_subregion"]
+        input_rasters           = setup["input_rasters"]
+        raster_statistics       = setup["raster_statistics"]
+        ledger                  = setup["ledger"]
+        covariates              = setup["covariates"]
+        covariate_checksum      = setup["covariate_checksum"]
+        zones                   = setup["zones"]
+        zone_checksum           = setup["zone_checksum"]
+        del setup
+
+        # The image name and checksum for each species-year, the ledger
+        # values of the rasters that have not changed, and the zonal values
+        # of the unchanged rasters from the ledger, keyed by position. The
+        # unchanged rasters without saved zonal values are in cached_paths.
+        image_names, checksums, cached, cached_zonal, cached_paths = [], [], {}, {}, {}
+
+        # The descriptive values and the biomass raster path for each
+        # species-year, in species and year order
+        records, raster_paths = [], []
 
-                    arcpy.AddMessage("\t\t> Offset Depth: {0}".format(OffsetDepth))
+        arcpy.AddMessage(f"Interate over the species names")
 
-                    arcpy.AddMessage("\t\t> Center of Gravity Depth Standard Error: {0}".format(CenterOfGravityDepthSE))
+        for variable in sorted(v for v in input_rasters if variables is None or v in variables):
 
-                    del bathymetryArray, weightedBathymetryArray
-                    del sumWeightedBathymetryArray
+            raster_years = input_rasters[variable]
 
-                    # ###--->>> Center of Gravity Depth (Bathymetry) End
+            for raster_year in sorted(raster_years):
 
-                    # Clean Up
-                    del biomassArray, sumBiomassArray
+                image_name, variable, species, commonname, corespecies, year, input_raster_path = raster_years[raster_year]
 
-                elif maximumBiomass == 0.0:
-                    CenterOfGravityLatitude    = None
-                    MinimumLatitude            = None
-                    MaximumLatitude            = None
-                    OffsetLatitude             = None
-                    CenterOfGravityLatitudeSE  = None
-                    CenterOfGravityLongitude   = None
-                    MinimumLongitude           = None
-                    MaximumLongitude           = None
-                    OffsetLongitude            = None
-                    CenterOfGravityLongitudeSE = None
-                    CenterOfGravityDepth       = None
-                    MinimumDepth               = None
-                    MaximumDepth               = None
-                    OffsetDepth                = None
-                    CenterOfGravityDepthSE     = None
+                PrintRecord = False
+                if PrintRecord:
+                    arcpy.AddMessage(f"\t> Image Name: {image_name}")
+                    arcpy.AddMessage(f"\t\t> Variable:      {variable}")
+                    arcpy.AddMessage(f"\t\t> Species:       {species}")
+                    arcpy.AddMessage(f"\t\t> Common Name:   {commonname}")
+                    arcpy.AddMessage(f"\t\t> Core Species:  {corespecies}")
+                    arcpy.AddMessage(f"\t\t> Year:          {year}")
+                    arcpy.AddMessage(f"\t\t> Output Raster: {os.path.basename(input_raster_path)}")
+                del PrintRecord
 
+                # Get maximumBiomass value to filter out "zero" rasters
+                if image_name in raster_statistics:
+                    maximumBiomass = raster_statistics[image_name]["Maximum"]
                 else:
-                    arcpy.AddMessage('Something wrong with biomass raster')
+                    maximumBiomass = float(arcpy.management.GetRasterProperties(input_raster_path, "MAXIMUM").getOutput(0))
 
+                arcpy.AddMessage(f"\t> {image_name} Biomass Raster Maximum: {maximumBiomass}")
 
-                arcpy.AddMessage(f"\t> Assigning variables to row values")
+                # Only rasters with a maximumBiomass greater than zero are
+                # processed, the indicators for the others are left Null
+                if maximumBiomass > 0.0:
+                    checksum = raster_statistics[image_name]["Checksum"] if image_name in raster_statistics else ""
+                    values = indicators_ledger.ledger_values(ledger, image_name, checksum, covariate_checksum)
+                    if values is None:
+                        raster_paths.append(input_raster_path)
+                    else:
+                        cached[len(records)] = values
+                        if zones is not None:
+                            layer = indicators_ledger.zonal_ledger_values(ledger, image_name, checksum, covariate_checksum, zone_checksum)
+                            if layer is None:
+                                cached_paths[len(records)] = input_raster_path
+                            else:
+                                cached_zonal[len(records)] = layer
+                            del layer
+                        raster_paths.append(None)
+                    del values
+                else:
+                    if not maximumBiomass == 0.0:
+                        arcpy.AddWarning(f"\t> Something wrong with biomass raster {image_name}")
+                    checksum = ""
+                    raster_paths.append(None)
+
+                image_names.append(image_name)
+                checksums.append(checksum)
+                del checksum
+
+                records.append([
+                                datasetcode,
+                                region,
+                                season,
+                                datecode,
+                                species,
+                                commonname,
+                                corespecies,
+                                year,
+                                distributionprojectname,
+                                distributionprojectcode,
+                                summaryproduct,
+                               ])
 
-                # Clean-up
                 del maximumBiomass
-
-                # Standard for all records
-                DatasetCode             = datasetcode
-                Region                  = region
-                Season                  = season
-                DateCode                = datecode
-                Species                 = species
-                CommonName              = commonname
-                CoreSpecies             = corespecies
-                Year                    = year
-                DistributionProjectName = distributionprojectname
-                DistributionProjectCode = distributionprojectcode
-                SummaryProduct          = summaryproduct
-
-                row = [
-                       DatasetCode,
-                       Region,
-                       Season,
-                       DateCode,
-                       Species,
-                       CommonName,
-                       CoreSpecies,
-                       Year,
-                       DistributionProjectName,
-                       DistributionProjectCode,
-                       SummaryProduct,
-                       CenterOfGravityLatitude,
-                       MinimumLatitude,
-                       MaximumLatitude,
-                       OffsetLatitude,
-                       CenterOfGravityLatitudeSE,
-                       CenterOfGravityLongitude,
-                       MinimumLongitude,
-                       MaximumLongitude,
-                       OffsetLongitude,
-                       CenterOfGravityLongitudeSE,
-                       CenterOfGravityDepth,
-                       MinimumDepth,
-                       MaximumDepth,
-                       OffsetDepth,
-                       CenterOfGravityDepthSE,
-                      ]
-
-                del DatasetCode, Region, Season, DateCode, Species, CommonName
-                del CoreSpecies, Year, DistributionProjectName
-                del DistributionProjectCode, SummaryProduct, CenterOfGravityLatitude
-                del MinimumLatitude, MaximumLatitude, OffsetLatitude
-                del CenterOfGravityLatitudeSE, CenterOfGravityLongitude
-                del MinimumLongitude, MaximumLongitude, OffsetLongitude
-                del CenterOfGravityLongitudeSE, CenterOfGravityDepth, MinimumDepth
-                del MaximumDepth, OffsetDepth, CenterOfGravityDepthSE
-
-                # Append to list
-                row_values.append(row)
-                del row
-
                 del image_name, variable, species, commonname, corespecies, year, input_raster_path
                 del raster_year
 
             del raster_years
-            del first_year
 
-            if "first_year_offset_latitude"  in locals(): del first_year_offset_latitude
-            if "first_year_offset_longitude" in locals(): del first_year_offset_longitude
-            if "first_year_offset_depth"     in locals(): del first_year_offset_depth
+        arcpy.AddMessage(f"Calculating the indicators for {len([p for p in raster_paths if p])} of {len(raster_paths)} biomass rasters, {len(cached)} unchanged rasters from the ledger")
+
+        # The zonal indicators for each record, None for the rasters
+        # without biomass
+        zonal_layers = [cached_zonal.get(i) for i in range(len(records))]
+
+        def read_biomass(i):
+            biomass_array = arcpy.RasterToNumPyArray(raster_paths[i], nodata_to_value=np.nan)
+            # The zones use the same read of the raster
+            if zones is not None:
+                zonal_layers[i] = indicators_engine.zonal_indicators(biomass_array, zones)
+            return biomass_array
+
+        # The biomass rasters are read as the engine needs them, one at a
+        # time, so the whole region is never held in memory
+        biomass_arrays = (None if input_raster_path is None else read_biomass(i) for i, input_raster_path in enumerate(raster_paths))
+
+        calculated = indicators_engine.calculated_array(len(records), biomass_arrays, covariates)
+
+        for i, values in cached.items():
+            calculated[i] = values
+            del i, values
+
+        # The unchanged rasters are only read for the zones, when the ledger
+        # does not have their zonal values
+        if cached_paths:
+            arcpy.AddMessage(f"Reading {len(cached_paths)} unchanged biomass rasters for their zonal values, {len(cached_zonal)} from the ledger")
+        for i, input_raster_path in cached_paths.items():
+            zonal_layers[i] = indicators_engine.zonal_indicators(arcpy.RasterToNumPyArray(input_raster_path, nodata_to_value=np.nan), zones)
+            del i, input_raster_path
+
+        # The new and changed entries for the ledger, with the zonal values
+        # when the region has zones. A raster without saved statistics has no
+        # checksum to look it up with on the next run, so it is not added
+        # (create_rasters_worker saves the statistics).
+        ledger = {}
+        for i, input_raster_path in enumerate(raster_paths):
+            if (input_raster_path is not None or i in cached_paths) and checksums[i]:
+                ledger[image_names[i]] = dict(zip(indicators_ledger.INDICATORS_LEDGER_FIELDS, [image_names[i], checksums[i], covariate_checksum] + list(calculated[i].tolist())))
+                if zones is not None:
+                    ledger[image_names[i]].update(indicators_ledger.zonal_entry(zone_checksum, zones, zonal_layers[i]))
+            del i, input_raster_path
+
+        # The offsets are calculated across the years of each species, from
+        # both the calculated and the unchanged rasters
+        indicators = indicators_engine.indicators_from_calculated(records, calculated)
+
+        if zones is not None:
+            arcpy.AddMessage(f"Calculating the zonal indicators for {len(zones['zones'])} zones")
+            zonal = indicators_engine.zonal_array(records, zonal_layers, zones, filter_subregion)
+        else:
+            zonal = None
 
-        del region_bathymetry, region_latitude, region_longitude, input_rasters
+        del biomass_arrays, read_biomass, raster_paths, calculated
+        del image_names, checksums, cached, cached_zonal, cached_paths, covariate_checksum
+        del zones, zone_checksum, zonal_layers, filter_subregion
 
-        arcpy.AddMessage("Inserting records into the table")
+        for species, year, latitude, longitude, depth in indicators[["Species", "Year", "CenterOfGravityLatitude", "CenterOfGravityLongitude", "CenterOfGravityDepth"]].tolist():
+            arcpy.AddMessage(f"\t> {species} {year}: Center of Gravity Latitude: {latitude}, Longitude: {longitude}, Depth: {depth}")
+            del species, year, latitude, longitude, depth
 
-        # This gets a list of fields in the table
-        fields = [f.name for f in arcpy.ListFields(region_indicators) if f.type not in ['Geometry', 'OID']]
+        del records
 
-        # Open an InsertCursor
-        cursor = arcpy.da.InsertCursor(region_indicators, fields)
-        del fields
+        del input_rasters
+        del raster_statistics
+        del covariates
 
-        # Insert new rows into the table
-        for row in row_values:
-            try:
-                row = [None if x != x else x for x in row]
-                cursor.insertRow(row)
-            except:
-                # Get the traceback object
-                tb = sys.exc_info()[2]
-                tbinfo = traceback.format_tb(tb)[0]
-                # Concatenate information together concerning the error into a message string
-                pymsg = "PYTHON ERRORS:\nTraceback info:\n" + tbinfo + "\nError Info:\n" + str(sys.exc_info()[1])
-                raise SystemExit(pymsg)
-            finally:
-                del row
+        if variables is None:
+            region_indicators = write_indicators(region_gdb, indicators)
 
-        # Delete cursor object
-        del cursor
+            write_ledger(region_gdb, ledger)
 
-        # Delete
-        del row_values
+            PrintRowContent = False
+            if PrintRowContent:
+                printRowContent(region_indicators)
+            del PrintRowContent
 
-        getcount = arcpy.management.GetCount(region_indicators)[0]
-        arcpy.AddMessage(f'\n> "{os.path.basename(region_indicators)}" has {getcount} records\n')
-        del getcount
+            results = [region_indicators]
 
-        PrintRowContent = False
-        if PrintRowContent:
-            printRowContent(region_indicators)
-        del PrintRowContent
+            if zonal is not None:
+                results.append(write_zonal_indicators(region_gdb, zonal))
 
-        results = [region_indicators]
+            del region_indicators
+        else:
+            results = [part, indicators, ledger, zonal]
 
-        del region_indicators
+        # Delete
+        del indicators, ledger, zonal
 
         # Values from Datasets table
         del datasetcode, region, season, datecode, distributionprojectcode
@@ -768,9 +674,9 @@ def worker(region_gdb=""):
         # Variables assigned based on the passed paramater
         del table_name, scratch_folder, project_folder, scratch_workspace
         # Imported modules
-        del np, math, dismap
+        del np, dismap, weighted_quantile, indicators_engine, indicators_ledger
         # Passed paramater
-        del region_gdb
+        del region_gdb, variables, part
 
     except KeyboardInterrupt:
         raise SystemExit
@@ -866,6 +772,13 @@ def main(project):
             arcpy.management.Copy(rf"{project_gdb}\{table_name}_Longitude", rf"{region_gdb}\{table_name}_Longitude")
             arcpy.AddMessage("\tCopy: {0}\n".format(arcpy.GetMessages(0).replace("\n", '\n\t')))
 
+            # The region's polygons, used as the zones of the Zonal Indicators table
+            geographic_area = [row[0] for row in arcpy.da.SearchCursor(rf"{project_gdb}\Datasets", ["GeographicArea"], where_clause = f"TableName = '{table_name}'")][0]
+            if arcpy.Exists(rf"{project_gdb}\{geographic_area}"):
+                arcpy.management.Copy(rf"{project_gdb}\{geographic_area}", rf"{region_gdb}\{geographic_area}")
+                arcpy.AddMessage("\tCopy: {0}\n".format(arcpy.GetMessages(0).replace("\n", '\n\t')))
+            del geographic_area
+
         else:
             arcpy.AddWarning(f"One or more datasets contains zero records!!")
             for d in datasets:
@@ -23,10 +23,6 @@ def line_info(msg):
     i = inspect.getframeinfo(f.f_back)
     return f"Script: {os.path.basename(i.filename)}\n\tNear Line: {i.lineno}\n\tFunction: {i.function}\n\tMessage: {msg}"
 
-# error callback function
-def custom_error_callback(error):
-    traceback.print_exception(type(error), error, error.__traceback__)
-
 def director(project_gdb="", Sequential=True, table_names=[]):
     try:
         # Test if passed workspace exists, if not raise SystemExit
@@ -36,6 +32,9 @@ def director(project_gdb="", Sequential=True, table_names=[]):
         import dismap
         importlib.reload(dismap)
 
+        import director_runner
+        importlib.reload(director_runner)
+
         import create_rasters_worker
         importlib.reload(create_rasters_worker)
         from create_rasters_worker import worker
@@ -122,156 +121,9 @@ def director(project_gdb="", Sequential=True, table_names=[]):
             del point_locations
             del region_gdb, table_name
 
-        results = []
-
-        # Sequential Processing
-        if Sequential:
-            arcpy.AddMessage(f"Sequential Processing")
-            jobs={}
-            for i in range(0, len(table_names)):
-                arcpy.AddMessage(f"Processing: {table_names[i]}")
-
-                table_name = table_names[i]
-                region_gdb = rf"{scratch_folder}\{table_name}.gdb"
-
-                worker_results = ""
-
-                try:
-                    worker_results = worker(region_gdb=region_gdb)
-                except SystemExit as se:
-                    raise SystemExit(str(se))
-
-                if type(worker_results).__name__ == "str" and len(worker_results) != 0:
-                    results.append(worker_results)
-                elif type(worker_results).__name__ == "str" and len(worker_results) == 0:
-                    raise SystemExit(f"worker_results is str, but empty!!")
-                elif type(worker_results).__name__ == "list" and len(worker_results) != 0:
-                    if type(worker_results[0]).__name__ == "list":
-                        worker_results = [r for rt in worker_results for r in rt]
-                    for result in worker_results:
-                        results.append(result)
-                        del result
-                elif type(worker_results).__name__ == "list" and len(worker_results) == 0:
-                    raise SystemExit(f"worker_results is list, but empty!!")
-
-                del worker_results, region_gdb, table_name
-
-                del i
-            del jobs
-
-        # Non-Sequential Processing
-        if not Sequential:
-            arcpy.AddMessage(f"Non-Sequential Processing")
-
-            import multiprocessing
-            from time import localtime, strftime, sleep
-
-            arcpy.env.autoCancelling = True
-
-            sys.path.append(os.path.dirname(__file__))
-            sys.path.append(sys.exec_prefix)
-
-            arcpy.AddMessage(f"Start multiprocessing using the ArcGIS Pro pythonw.exe.")
-            #Set multiprocessing exe in case we're running as an embedded process, i.e ArcGIS
-            #get_install_path() uses a registry query to figure out 64bit python exe if available
-            multiprocessing.set_executable(os.path.join(sys.exec_prefix, 'pythonw.exe'))
-
-            # Get CPU count and then take 2 away for other process
-            _processes = multiprocessing.cpu_count() - 2
-            _processes = _processes if len(table_names) >= _processes else len(table_names)
-            arcpy.AddMessage(f"Creating the multiprocessing Pool with {_processes} processes")
-            #Create a pool of workers, keep one cpu free for surfing the net.
-            #Let each worker process only handle 1 task before being restarted (in case of nasty memory leaks)
-            #with multiprocessing.Pool(processes=multiprocessing.cpu_count() - 1) as pool:
-            #with multiprocessing.Pool(processes=multiprocessing.cpu_count() - 1, maxtasksperchild=10) as pool:
-            with multiprocessing.Pool(processes=_processes, maxtasksperchild=10) as pool:
-
-                arcpy.AddMessage(f"\tPrepare arguments for processing")
-
-                # Use apply_async so we can handle exceptions gracefully
-                jobs={}
-                for i in range(0, len(table_names)):
-                    try:
-                        arcpy.AddMessage(f"Processing: {table_names[i]}")
-
-                        table_name = table_names[i]
-                        region_gdb = rf"{scratch_folder}\{table_name}.gdb"
-
-                        #jobs[table_name] = pool.starmap_async(worker, [[region_gdb]], chunksize=10, callback=custom_callback, error_callback=custom_error_callback)
-                        jobs[table_name] = pool.starmap_async(worker, [[region_gdb]], chunksize=10, error_callback=custom_error_callback)
-
-                        del table_name, region_gdb
-
-                    except SystemExit as se:
-                        pool.terminate()
-                        raise SystemExit(str(se))
-
-                    del i
-
-                all_finished = False
-                while True:
-                    all_finished = True
-
-                    arcpy.AddMessage(f"\nHave the workers finished?\nIt's {strftime('%a %b %d %I:%M %p', localtime())}")
-
-                    for table_name, result in jobs.items():
-                        if result.ready():
-                            arcpy.AddMessage(f"Process {table_name} has finished")
-                        else:
-                            all_finished = False
-                            arcpy.AddMessage(f"Process {table_name} is running. . .")
-                        del table_name, result
-
-                    if all_finished:
-                        break
-
-                    sleep(_processes * 7.5)
-
-                del all_finished
-                del _processes
-
-                arcpy.AddMessage(f"Get the return values")
-
-                for table_name, job_result in jobs.items():
-
-                    worker_results = ""
-
-                    try:
-                        worker_results = job_result.get()
-                    except SystemExit as se:
-                        pool.terminate()
-                        raise SystemExit(str(se))
-
-                    if type(worker_results).__name__ == "str" and len(worker_results) != 0:
-                        results.append(worker_results)
-                    elif type(worker_results).__name__ == "str" and len(worker_results) == 0:
-                        raise SystemExit(f"worker_results is str, but empty!!")
-                    elif type(worker_results).__name__ == "list" and len(worker_results) != 0:
-                        if type(worker_results[0]).__name__ == "list":
-                            worker_results = [r for rt in worker_results for r in rt]
-                        for result in worker_results:
-                            results.append(result)
-                            del result
-                    elif type(worker_results).__name__ == "list" and len(worker_results) == 0:
-                        raise SystemExit(f"worker_results is list, but empty!!")
-
-                    del table_name, job_result, worker_results
-
-                arcpy.AddMessage(f"\tClose the process pool")
-                # close the process pool
-                pool.close()
-                # wait for all tasks to complete and processes to close
-                arcpy.AddMessage(f"\tWait for all tasks to complete and processes to close")
-                pool.join()
-                # Just in case
-                pool.terminate()
-
-                del pool
-                del jobs
-
-            del multiprocessing, localtime, strftime, sleep
-
-            arcpy.AddMessage(f"\tDone with multiprocessing Pool")
+        # Run the worker for each region. The results of a region are
+        # collected as soon as its worker finishes (see director_runner).
+        results = director_runner.run_workers(worker, table_names, scratch_folder, Sequential)
 
         # Post-Processing
         arcpy.AddMessage("Post-Processing")
@@ -324,7 +176,7 @@ def director(project_gdb="", Sequential=True, table_names=[]):
         # Variables assigned in function
         del scratch_folder, csv_data_folder
         # Imports
-        del dismap, worker
+        del dismap, director_runner, worker
         # Function Parameters
         del project_gdb, Sequential, table_names
 
@@ -23,7 +23,10 @@ def line_info(msg):
     i = inspect.getframeinfo(f.f_back)
     return f"Script: {os.path.basename(i.filename)}\n\tNear Line: {i.lineno}\n\tFunction: {i.function}\n\tMessage: {msg}"
 
-def worker(region_gdb=""):
+def worker(region_gdb="", idw_method="GA"):
+    # idw_method: "GA" uses arcpy.ga.IDW, "NumPy" interpolates with
+    # idw_engine. GA stays the default until the NumPy rasters have been
+    # compared with the GA rasters for the regions.
     try:
         # Test if passed workspace exists, if not raise SystemExit
         if not arcpy.Exists(rf"{region_gdb}"):
@@ -34,7 +37,16 @@ def worker(region_gdb=""):
         #importlib.reload(dismap)
 
         # Import the worker module to process data
-        # N/A
+        import numpy as np
+
+        import image_statistics
+        importlib.reload(image_statistics)
+
+        import idw_engine
+        importlib.reload(idw_engine)
+
+        import geotiff_writer
+        importlib.reload(geotiff_writer)
 
         # Set History and Metadata logs, set serverity and message level
         arcpy.SetLogHistory(True) # Look in %AppData%\Roaming\Esri\ArcGISPro\ArcToolbox\History
@@ -99,6 +111,8 @@ def worker(region_gdb=""):
         # DisMAP project
         psr = arcpy.SpatialReference(geographic_area_sr)
         arcpy.env.outputCoordinateSystem = psr
+        # Spatial reference of the rasters written by geotiff_writer
+        psr_wkt, psr_epsg = psr.exportToString().split(";")[0], psr.factoryCode
         del geographic_area_sr, geographic_area, psr
 
         region_raster_mask        = rf"{region_gdb}\{table_name}_Raster_Mask"
@@ -146,28 +160,78 @@ def worker(region_gdb=""):
         else:
             pass
 
-        arcpy.AddMessage(f"\tMake Feature Layer for {point_locations}")
-
-        # Prepare the points layer
-        point_locations_path = rf"{region_gdb}\{point_locations}"
-        point_locations_path_layer = arcpy.management.MakeFeatureLayer(point_locations_path, "Region Sample Locations Layer")
-        del point_locations_path
-
-        if summary_product == "Yes":
-            # Add the YearWeights feild
-            fields =  [f.name for f in arcpy.ListFields(point_locations_path_layer) if f.type not in ['Geometry', 'OID']]
-            if "YearWeights" not in fields:
-                # Add the YearWeights field to the Dataset. This is used for the IDW modeling later
-                arcpy.management.AddField(point_locations_path_layer, "YearWeights", "SHORT", field_alias = "Year Weights")
-            del fields
-
-        getcount = arcpy.management.GetCount(point_locations_path_layer)[0]
-        arcpy.AddMessage(f'\t{point_locations} has {getcount} records')
-        del getcount
-
-        for output_raster in output_rasters:
+        arcpy.AddMessage(f"\tRead {point_locations} into memory")
+
+        # The sample locations are read once and indexed by Species and Year,
+        # so the records for a species-year are a slice of the sorted array
+        # instead of a layer selection
+        samples = arcpy.da.FeatureClassToNumPyArray(rf"{region_gdb}\{point_locations}", idw_engine.SAMPLE_FIELDS,
+                                                    spatial_reference = arcpy.env.outputCoordinateSystem,
+                                                    null_value = {"MapValue" : np.nan})
+        sample_index = idw_engine.sample_index(samples["Species"], samples["Year"])
+
+        arcpy.AddMessage(f'\t{point_locations} has {len(samples)} records')
+
+        # The NumPy IDW reads the raster mask once, and interpolates all of
+        # the species for a year window together
+        use_idw_engine = summary_product == "Yes" and idw_method == "NumPy"
+
+        if use_idw_engine:
+            arcpy.AddMessage(f"\tRead {os.path.basename(region_raster_mask)} for the IDW engine")
+
+            # The mask is read a block of rows at a time and kept as one bit
+            # a cell, the cell centers are made for each tile and the rasters
+            # are written a block of rows at a time, so no array the size of
+            # the grid is held in memory
+            mask_raster = arcpy.Raster(region_raster_mask)
+            mask_xmin, mask_ymax, mask_rows = mask_raster.extent.XMin, mask_raster.extent.YMax, mask_raster.height
+            mask_strips = (arcpy.RasterToNumPyArray(region_raster_mask, arcpy.Point(mask_xmin, mask_ymax - min(row + geotiff_writer.TILE_SIZE, mask_rows) * mask_raster.meanCellHeight),
+                                                    mask_raster.width, min(geotiff_writer.TILE_SIZE, mask_rows - row), nodata_to_value=np.nan).astype("float32")
+                           for row in range(0, mask_rows, geotiff_writer.TILE_SIZE))
+            mask        = idw_engine.cell_mask(mask_xmin, mask_ymax, mask_raster.meanCellWidth, mask_strips)
+            mask_cells  = int(mask["row_cells"][-1])
+            lowerLeft   = arcpy.Point(mask_raster.extent.XMin, mask_raster.extent.YMin)
+            grid        = geotiff_writer.grid_geometry(lowerLeft.X, lowerLeft.Y, cell_size, psr_wkt, psr_epsg)
+            del mask_raster, mask_xmin, mask_ymax, mask_rows, mask_strips
+
+            # The IDW weights for each year window are saved here and reused
+            # while the sample locations and raster mask are unchanged. This is
+            # outside of the region scratch folder, which is deleted by the
+            # director.
+            idw_weights_folder = rf"{scratch_folder}\IDW Weights\{table_name}"
+
+            # The interpolations for the year window being processed are written
+            # to this file, a row for each species, and the mask is interpolated
+            # in tiles of up to idw_engine.TILE_CELLS cells
+            window_file = rf"{scratch_folder}\{table_name}\{table_name}_IDW_Window.npy"
+            window_year, window_predictions, window_rows = None, None, {}
+
+            # The tiles are interpolated by threads when the worker is not
+            # already running in a Pool process (see director_runner)
+            import multiprocessing
+            tile_workers = 1 if multiprocessing.current_process().daemon else max(multiprocessing.cpu_count() - 2, 1)
+            del multiprocessing
+
+        # Minimum, maximum, sum, count and checksum of each output raster,
+        # used by the indicators and species richness workers to skip the
+        # empty rasters
+        output_raster_statistics = {}
+
+        # The rows of the rasters written by this run are removed first, so
+        # if the run fails part way the next stages do not trust the old
+        # statistics (or the indicators ledger the old checksums) of rasters
+        # that have already been written again
+        image_statistics_csv = image_statistics.image_statistics_path(rf"{project_folder}\Images", table_name)
+        image_statistics.remove_image_statistics(image_statistics_csv, list(output_rasters))
+
+        # In year order, so each year window is only interpolated once
+        for output_raster in sorted(output_rasters, key=lambda r: output_rasters[r][3]):
             image_name, variable, species, year, output_raster_path =  output_rasters[output_raster]
 
+            # The statistics of the raster when they are calculated while it
+            # is written, so the raster is not read again
+            raster_statistics = None
+
             #if not arcpy.Exists(output_raster_path):
 
             msg = f"\n\t\tImage Name: {output_raster}\n"
@@ -177,36 +241,62 @@ def worker(region_gdb=""):
             msg = msg + f"\t\t\tOutput Raster: {os.path.basename(output_raster_path)}\n"
             arcpy.AddMessage(msg); del msg
 
-            arcpy.AddMessage(f'\t\t\tSelect Layer by Attribute: "CLEAR_SELECTION"')
+            # Records for species and year
+            arcpy.AddMessage(f"\t\t\t{point_locations} has {len(idw_engine.index_rows(sample_index, species, [year]))} records for {species} and year {year}")
+
+            arcpy.AddMessage(f"\t\t\tCreating Raster File {output_raster}.tif for {species} and {year}")
 
-            arcpy.management.SelectLayerByAttribute( point_locations_path_layer, "CLEAR_SELECTION" )
+            if use_idw_engine:
+                arcpy.AddMessage(f"\t\t\tProcessing IDW (NumPy)")
 
-            arcpy.AddMessage(f'\t\t\tSelect Layer by Attribute: Species = "{species}" AND Year = {year}')
+                if year != window_year:
+                    arcpy.AddMessage(f"\t\t\t\tInterpolating all species from years {year-2} to {year+2}")
 
-            # Select for species and year
-            arcpy.management.SelectLayerByAttribute( point_locations_path_layer, "NEW_SELECTION", f"Species = '{species}' AND Year = {year}" )
+                    points, point_index = idw_engine.window_samples(samples["SHAPE@X"], samples["SHAPE@Y"], samples["Year"], year)
 
-            # Get the count of records for selected species
-            getcount = arcpy.management.GetCount(point_locations_path_layer)[0]
-            arcpy.AddMessage(f"\t\t\t{point_locations} has {getcount} records for {species} and year {year}")
-            del getcount
+                    # Values of the species with a raster for the year
+                    window_species = {output_rasters[r][2] for r in output_rasters if output_rasters[r][3] == year}
+                    species_values = {s : idw_engine.window_values(samples, sample_index, point_index, s, year, len(points)) for s in window_species}
+                    # Species without any records in the window are left out
+                    species_values = {s : species_values[s] for s in species_values if not np.isnan(species_values[s]).all()}
 
-            arcpy.AddMessage(f"\t\t\tCreating Raster File {output_raster}.tif for {species} and {year}")
+                    idw_weights_file = rf"{idw_weights_folder}\{table_name}_{year}_{cell_size}.npz"
+                    # The file of the last window is closed before it is replaced
+                    window_predictions = None
+                    if species_values:
+                        window_predictions = np.lib.format.open_memmap(window_file, mode="w+", dtype=np.float32, shape=(len(species_values), mask_cells))
+                    window_rows = idw_engine.interpolate_window_tiled(points, mask, species_values, year, cell_size, window_predictions, idw_weights_file, workers=tile_workers)
+                    window_year = year
 
-            if summary_product == "Yes":
-                arcpy.AddMessage(f"\t\t\tProcessing IDW")
+                    arcpy.AddMessage(f"\t\t\t\t{len(points)} sample locations, {len(window_rows)} species, {len(idw_engine.mask_tiles(mask))} tiles")
 
-                # Select weighted years
-                arcpy.management.SelectLayerByAttribute( point_locations_path_layer, "NEW_SELECTION", f"Species = '{species}' AND Year >= ({year-2}) AND Year <= ({year+2})" )
+                    del points, point_index, species_values, window_species, idw_weights_file
 
-                # Get the count of records for selected species
-                getcount = arcpy.management.GetCount(point_locations_path_layer)[0]
+                if species in window_rows:
+                    cell_values = window_predictions[window_rows.pop(species)]
+                else:
+                    cell_values = None
+                    arcpy.AddWarning(f"\t\t\t\tThere are no {species} records from years {year-2} to {year+2}")
 
-                arcpy.AddMessage(f"\t\t\t\t{point_locations_path_layer} has {getcount} records for {species} and from years {year-2} to {year+2}")
-                del getcount
+                # Convert the raster back to WTCPUE from WTCPUECubeRoot, a block
+                # of rows at a time, with the statistics calculated as the
+                # blocks are written
+                biomass_strips = (np.power(strip, 3) for strip in idw_engine.mask_strips(mask, cell_values, geotiff_writer.TILE_SIZE))
+                raster_statistics = {}
+                geotiff_writer.write_geotiff_strips(output_raster_path, mask["shape"], image_statistics.strip_statistics(mask["shape"], biomass_strips, raster_statistics), grid)
+                del cell_values, biomass_strips
 
-                # Calculate YearWeights=3-(abs(Tc-Ti))
-                arcpy.management.CalculateField(in_table=point_locations_path_layer, field="YearWeights", expression=f"3 - (abs({int(year)} - !Year!))", expression_type="PYTHON", code_block="")
+            elif summary_product == "Yes":
+                arcpy.AddMessage(f"\t\t\tProcessing IDW")
+
+                # Weighted years, with YearWeights=3-(abs(Tc-Ti)) calculated in NumPy
+                window_samples = idw_engine.sample_subset(samples, idw_engine.index_rows(sample_index, species, idw_engine.window_years(year)), year)
+
+                arcpy.AddMessage(f"\t\t\t\t{point_locations} has {len(window_samples)} records for {species} and from years {year-2} to {year+2}")
+
+                tmp_samples = f"memory\\{output_raster}_Samples"
+                arcpy.da.NumPyArrayToFeatureClass(window_samples, tmp_samples, ("X", "Y"), arcpy.env.outputCoordinateSystem)
+                del window_samples
 
                 # we need to set the mask and extent of the environment, or the raster and items may not come out correctly.
                 arcpy.env.extent     = arcpy.Describe(region_raster_mask).extent
@@ -232,7 +322,7 @@ def worker(region_gdb=""):
                 tmp_raster = f"memory\\{output_raster}"
 
                 # Execute IDW using the selected selected species, years, and MapValue
-                arcpy.ga.IDW(in_features         = point_locations_path_layer,
+                arcpy.ga.IDW(in_features         = tmp_samples,
                              z_field             = 'MapValue',
                              out_ga_layer        = '',
                              out_raster          = tmp_raster,
@@ -261,8 +351,8 @@ def worker(region_gdb=""):
                     arcpy.management.Delete(tmp_raster)
                 del tmp_raster
 
-                # Reser the YearWeights to None
-                arcpy.management.CalculateField(in_table=point_locations_path_layer, field="YearWeights", expression="None", expression_type="PYTHON", code_block="")
+                arcpy.management.Delete(tmp_samples)
+                del tmp_samples
 
             elif summary_product == "No":
                 arcpy.AddMessage(f"\t\t\tProcessing SDM")
@@ -273,8 +363,13 @@ def worker(region_gdb=""):
                 arcpy.env.snapRaster = region_raster_mask
                 #del region_raster_mask
 
+                # Records for species and year
+                tmp_samples = f"memory\\{output_raster}_Samples"
+                arcpy.da.NumPyArrayToFeatureClass(idw_engine.sample_subset(samples, idw_engine.index_rows(sample_index, species, [year])),
+                                                  tmp_samples, ("X", "Y"), arcpy.env.outputCoordinateSystem)
+
                 # Set local variables
-                inFeatures     = point_locations_path_layer
+                inFeatures     = tmp_samples
                 valField       = 'MapValue'
                 #outRaster      = tmp_raster
                 outRaster      = output_raster_path
@@ -288,6 +383,9 @@ def worker(region_gdb=""):
 
                 del inFeatures, valField, outRaster, assignmentType, priorityField, cellSize
 
+                arcpy.management.Delete(tmp_samples)
+                del tmp_samples
+
                 arcpy.ClearEnvironment("extent")
                 arcpy.ClearEnvironment("mask")
                 arcpy.ClearEnvironment("snapRaster")
@@ -309,32 +407,46 @@ def worker(region_gdb=""):
             else:
                 pass
 
-            # Clear selection
-            arcpy.management.SelectLayerByAttribute( point_locations_path_layer, "CLEAR_SELECTION" )
-
             from arcpy import metadata as md
             tif_md = md.Metadata(output_raster_path)
             tif_md.title = image_name.replace("_", " ")
             tif_md.save()
             del md, tif_md
 
-            arcpy.management.BuildPyramids(
-                                            in_raster_dataset   = output_raster_path,
-                                            pyramid_level       = -1,
-                                            SKIP_FIRST          = "NONE",
-                                            resample_technique  = "BILINEAR",
-                                            compression_type    = "DEFAULT",
-                                            compression_quality = 75,
-                                            skip_existing       = "OVERWRITE"
-                                          )
+            if raster_statistics is None:
+                arcpy.management.BuildPyramids(
+                                                in_raster_dataset   = output_raster_path,
+                                                pyramid_level       = -1,
+                                                SKIP_FIRST          = "NONE",
+                                                resample_technique  = "BILINEAR",
+                                                compression_type    = "DEFAULT",
+                                                compression_quality = 75,
+                                                skip_existing       = "OVERWRITE"
+                                              )
+
+                raster_statistics = image_statistics.image_statistics(arcpy.RasterToNumPyArray(output_raster_path, nodata_to_value=np.nan))
+
+            raster_statistics.update({"ImageName" : image_name, "Variable" : variable, "Species" : species, "Year" : year})
+            output_raster_statistics[image_name] = raster_statistics
+            arcpy.AddMessage(f"\t\t\tMinimum: {raster_statistics['Minimum']}, Maximum: {raster_statistics['Maximum']}, Sum: {raster_statistics['Sum']}, Count: {raster_statistics['Count']}")
+            del raster_statistics
 
             # Clean up
             del image_name, variable, species, year, output_raster_path, output_raster
 
-        del point_locations
-        # Delete point_locations_path_layer
-        arcpy.management.Delete(point_locations_path_layer)
-        del point_locations_path_layer
+        arcpy.AddMessage(f"\tWriting statistics for {len(output_raster_statistics)} rasters to {os.path.basename(image_statistics_csv)}")
+        image_statistics.write_image_statistics(image_statistics_csv, output_raster_statistics)
+        del image_statistics_csv, output_raster_statistics
+
+        if use_idw_engine:
+            del mask, mask_cells, lowerLeft, grid, idw_weights_folder
+            del window_year, window_predictions, window_rows, tile_workers
+            if os.path.isfile(window_file):
+                os.remove(window_file)
+            del window_file
+        del use_idw_engine
+
+        del point_locations, samples, sample_index
 
         # Gather results to be returned
         results = [region_gdb]
@@ -353,8 +465,9 @@ def worker(region_gdb=""):
         del table_name, scratch_folder, project_folder, scratch_workspace
         # Imports
         #del dismap
+        del np, image_statistics, idw_engine, geotiff_writer, psr_wkt, psr_epsg
         # Function parameter
-        del region_gdb
+        del region_gdb, idw_method
 
     except KeyboardInterrupt:
         raise SystemExit
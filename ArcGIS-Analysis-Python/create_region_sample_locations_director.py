@@ -55,6 +55,10 @@ def director(project_gdb="", Sequential=True, table_names=[]):
 
         import dismap
         importlib.reload(dismap)
+
+        import director_runner
+        importlib.reload(director_runner)
+
         import math
 
         import create_region_sample_locations_worker
@@ -131,209 +135,12 @@ def director(project_gdb="", Sequential=True, table_names=[]):
             del region_gdb
             del table_name
 
-        results = []
-
-        # Sequential Processing
-        if Sequential:
-            arcpy.AddMessage(f"Sequential Processing")
-            jobs={}
-            for i in range(0, len(table_names)):
-                try:
-                    arcpy.AddMessage(f"Processing: {table_names[i]}")
-
-                    table_name = table_names[i]
-                    region_gdb = rf"{scratch_folder}\{table_name}.gdb"
-
-                    worker_results = ""
-
-                    worker_results = worker(region_gdb=region_gdb)
-
-                    results.extend(worker_results)
-
-                    del worker_results, region_gdb, table_name
-
-                except SystemExit as se:
-                    arcpy.AddError(str(se))
-                    traceback.print_exc()
-                except Exception as e:
-                    arcpy.AddError(str(e))
-                    traceback.print_exc()
-                except:
-                    traceback.print_exc()
-
-                del i
-            del jobs
-
-        # Non-Sequential Processing
-        # https://superfastpython.com/multiprocessing-pool-map_async/
-        if not Sequential:
-            arcpy.AddMessage(f"Non-Sequential Processing")
-
-            import multiprocessing
-
-            arcpy.env.autoCancelling = True
-
-            sys.path.append(os.path.dirname(__file__))
-            sys.path.append(sys.exec_prefix)
-
-            arcpy.AddMessage(f"Start multiprocessing using the ArcGIS Pro pythonw.exe.")
-            #Set multiprocessing exe in case we're running as an embedded process, i.e ArcGIS
-            #get_install_path() uses a registry query to figure out 64bit python exe if available
-            multiprocessing.set_executable(os.path.join(sys.exec_prefix, 'pythonw.exe'))
-
-            # Get CPU count and then take 2 away for other process
-            _processes = multiprocessing.cpu_count() - 2
-            _processes = _processes if len(table_names) >= _processes else len(table_names)
-            chunk_size = math.ceil((len(table_names) / _processes) / 2) * 2
-            arcpy.AddMessage(f"Creating the multiprocessing Pool with {_processes} processes")
-            #Create a pool of workers, keep one cpu free for surfing the net.
-            #Let each worker process only handle 1 task before being restarted (in case of nasty memory leaks)
-            with multiprocessing.Pool(processes=_processes, maxtasksperchild=1) as pool:
-
-##                # issues tasks to process pool
-##                gdbs = [[rf"{scratch_folder}\{table_name}.gdb" for table_name in table_names]]
-##                #result = pool.starmap_async(worker, gdbs, chunksize=chunk_size, callback=custom_callback, error_callback=custom_error_callback)
-##                result = pool.starmap_async(worker, gdbs, chunksize=chunk_size)
-##                # get the return values
-##                try:
-##                    values = result.get()
-##                except Exception as e:
-##                    print(f'Failed with: {e}')
-##                del result, gdbs
-##                if "values" in locals().keys(): del values
-
-                arcpy.AddMessage(f"\tPrepare arguments for processing")
-
-                # Use apply_async so we can handle exceptions gracefully
-                jobs={}
-                for i in range(0, len(table_names)):
-                    try:
-                        arcpy.AddMessage(f"Processing: {table_names[i]}")
-
-                        table_name = table_names[i]
-                        region_gdb = rf"{scratch_folder}\{table_name}.gdb"
-
-                        #jobs[table_name] = pool.starmap_async(worker, [[region_gdb]], chunksize=4, callback=custom_callback, error_callback=custom_error_callback)
-                        #jobs[table_name] = pool.starmap_async(worker, [[region_gdb]], chunksize=10, error_callback=custom_error_callback)
-                        #jobs[table_name] = pool.starmap_async(worker2, [[region_gdb]], chunksize=chunk_size, callback=custom_callback, error_callback=custom_error_callback)
-                        jobs[table_name] = pool.apply_async(worker, [region_gdb])
-
-                        del table_name, region_gdb
-
-                    except:
-                        pool.terminate()
-                        traceback.print_exc()
-
-                    del i
-
-                all_finished = False
-                # Set a start time so that we can see how log things take
-                start_time = time()
-                result_completed = {}
-                while True:
-                    all_finished = True
-
-                    # Elapsed time
-                    end_time = time()
-                    elapse_time =  end_time - start_time
-
-                    arcpy.AddMessage(f"\nHave the workers finished?")
-                    finish_time = strftime('%a %b %d %I:%M %p', localtime())
-                    arcpy.AddMessage(f"It's {finish_time}")
-                    time_elapsed = u"Elapsed Time {0} (H:M:S)".format(strftime("%H:%M:%S", gmtime(elapse_time)))
-                    arcpy.AddMessage(time_elapsed)
-
-                    finish_time = f"{finish_time}. {time_elapsed}"
-                    del time_elapsed
-
-                    for table_name, result in jobs.items():
-                        #arcpy.AddMessage(f"Ready: {result.get()}")
-                        #try:
-                        #    arcpy.AddMessage(f"Sucessful: {result.successful()}")
-                        #except ValueError:
-                        #    print(f"Process: {table_name} is not ready!!")
-                        #try:
-                        #    # wait for and get the result from the task
-                        #    value = result.get()
-                        #    # report the result
-                        #    print(f'Got: {value}')
-                        #except Exception as e:
-                        #    print(f'Failed to get the result: {e}')
-                        #    raise SystemExit
-                        if result.ready():
-                            #try:
-                            #    # wait for and get the result from the task
-                            #    value = result.get()
-                            #    # report the result
-                            #    print(f'Got: {value}')
-                            #except Exception as e:
-                            #    print(f'Failed to get the result: {e}')
-                            # check if the tasks were successful
-                            #if result.successful():
-                            #    print('Successful')
-                            #else:
-                            #    print('Unsuccessful')
-                            if table_name not in result_completed:
-                                result_completed[table_name] = finish_time
-                                try:
-                                    # wait for and get the result from the task
-                                    value = result.get()
-                                    del value
-                                    # report the result
-                                    #print(f'Got: {value}')
-                                    #arcpy.AddMessage(f"Ready: {result.get()}")
-                                    #arcpy.AddMessage(f"Sucessful: {result.successful()}")
-                                except Exception as e:
-                                    print(f'Failed to get the result: {e}')
-                                    pool.terminate()
-                            arcpy.AddMessage(f"Process {table_name} was finished on {result_completed[table_name]}")
-                        else:
-                            #print(result.get())
-                            all_finished = False
-                            arcpy.AddMessage(f"Process {table_name} is running. . .")
-                        del table_name, result
-
-                    del elapse_time, end_time, finish_time
-
-                    if all_finished:
-                        break
-
-                    sleep(_processes * 7.5)
-
-                del result_completed
-                del start_time
-                del all_finished
-
-                arcpy.AddMessage(f"Get the return values")
-
-                for table_name, job_result in jobs.items():
-                    worker_results = job_result.get()
-                    results.extend(worker_results)
-                    del table_name, job_result, worker_results
-
-                arcpy.AddMessage(f"\tClose the process pool")
-                # close the process pool
-                pool.close()
-                # wait for all tasks to complete and processes to close
-                pool.join()
-                # Just in case
-                pool.terminate()
-
-                del jobs
-
-            del pool
-            del _processes, chunk_size
-            del multiprocessing
-
-            arcpy.AddMessage(f"\tDone with multiprocessing Pool")
-
-        # Post-Processing
-        arcpy.AddMessage("Post-Processing")
-        if results:
-            arcpy.AddMessage("Processing Results")
-            #print(results)
-
-            for result in results:
+        # Copy a region's results to the project GDB as soon as its worker
+        # has finished, while the workers for the other regions are still
+        # running
+        def post_process(table_name, worker_results):
+            arcpy.AddMessage(f"Processing Results: {table_name}")
+            for result in worker_results:
                 dataset = os.path.basename(result)
                 region_gdb  = os.path.dirname(result)
 
@@ -365,6 +172,17 @@ def director(project_gdb="", Sequential=True, table_names=[]):
                 del region_gdb, dataset
 
                 del result
+            del table_name, worker_results
+
+        # Run the worker for each region. The results of a region are
+        # collected as soon as its worker finishes (see director_runner).
+        results = director_runner.run_workers(worker, table_names, scratch_folder, Sequential, post_process)
+
+        # Post-Processing
+        arcpy.AddMessage("Post-Processing")
+        if results:
+            arcpy.AddMessage("Processing Results")
+            #print(results)
 
             deletes = []
             for result in results:
@@ -411,7 +229,7 @@ def director(project_gdb="", Sequential=True, table_names=[]):
         # Variables assigned in function
         del scratch_folder, csv_data_folder
         # Imports
-        del dismap, math, worker
+        del dismap, director_runner, math, worker, post_process
         del sleep, gmtime, localtime, strftime, time
         # Function Parameters
         del project_gdb, Sequential, table_names
@@ -31,7 +31,9 @@ def custom_callback(result):
 def custom_error_callback(error):
     print(f'Got an error: {error}', flush=True)
 
-def worker(region_gdb=""):
+def worker(region_gdb="", chunk_size=None):
+    # chunk_size: number of CSV rows read at a time, the default is
+    # sample_locations_ingest.CHUNK_SIZE. The whole file is read when it is 0.
     try:
         # Test if passed workspace exists, if not raise SystemExit
         if not arcpy.Exists(rf"{region_gdb}"):
@@ -41,6 +43,12 @@ def worker(region_gdb=""):
         import dismap
         importlib.reload(dismap)
 
+        import sample_locations_ingest
+        importlib.reload(sample_locations_ingest)
+
+        if chunk_size is None:
+            chunk_size = sample_locations_ingest.CHUNK_SIZE
+
         # Import
         import pandas as pd
         import numpy as np
@@ -104,265 +112,119 @@ def worker(region_gdb=""):
         pd.set_option("display.expand_frame_repr", False)
 
 
-        encoding, index_column = dismap.get_encoding_index_col(process_table)
+        table_definition = dismap.table_definitions(csv_data_folder, table_name)
 
-        with warnings.catch_warnings():
-            warnings.simplefilter(action='ignore', category=FutureWarning)
-            # DataFrame
-            df = pd.read_csv(
-                             process_table,
-                             index_col = index_column,
-                             encoding  = encoding,
-                             delimiter = ",",
-                             dtype     = field_csv_dtypes,
-                            )
-        del encoding, index_column
-
-##        with warnings.catch_warnings():
-##            warnings.simplefilter(action='ignore', category=FutureWarning)
-##            # DataFrame
-##            df = pd.read_csv(
-##                             process_table,
-##                             index_col = 0,
-##                             #encoding  = "utf-8",
-##                             encoding  = "unicode_escape",
-##                             delimiter = ",",
-##                             dtype     = field_csv_dtypes,
-##                            )
-
-        # Set all NA values to np.nan, in place
-        #df.fillna(np.nan, inplace = True)
-
-        # Old -> year, lon_UTM, lat_UTM, lat, lon, depth_m, median_est,                        spp_sci, spp_common, wtcpue, transformed_value, transform_unit
-        # New -> year, Easting, Northing,          depth_m, median_est, mean_est, est5, est95, spp_sci, spp_common
-
-        # Rename columns using the dictionary below and the defined list of field names
-        # Easting,Northing,year,depth_m,median_est,mean_est,est5,est95,spp_sci,spp_common
-        # mean_est, est5, est95
-        column_names = {
-                        "common"                  : "CommonName",
-                        "depth"                   : "Depth",
-                        "depth_m"                 : "Depth",
-                        "DistributionProjectName" : "DistributionProjectName",
-                        "est5"                    : "Estimate5",
-                        "est95"                   : "Estimate95",
-                        "haulid"                  : "SampleID",
-                        "lat"                     : "Latitude",
-                        "lat_UTM"                 : "Northing",
-                        "lon"                     : "Longitude",
-                        "lon_UTM"                 : "Easting",
-                        "mean_est"                : "MeanEstimate",
-                        "median_est"              : "MedianEstimate",
-                        "region"                  : "Region",
-                        "sampleid"                : "SampleID",
-                        "spp"                     : "Species",
-                        "spp_common"              : "CommonName",
-                        "spp_sci"                 : "Species",
-                        "stratum"                 : "Stratum",
-                        "stratumarea"             : "StratumArea",
-                        "transformed"             : "MapValue",
-                        "wtcpue"                  : "WTCPUE",
-                        "year"                    : "Year",
-                       }
-
-        df.rename(columns=column_names, inplace=True)
-        del column_names
-
-        # Print column names
-        #for column in list(df.columns): print(column); del column # print columns
-
-        # ###--->>>
-        print(f"Inserting additional columns into the dataframe\n", flush=True)
-
-        print(f"\tInserting 'DatasetCode' column into: {table_name}", flush=True)
-        df.insert(0, "DatasetCode", datasetcode)
-        del datasetcode
-
-        print(f"\tInserting 'Region' column into: {table_name}", flush=True)
-        if "Region" not in list(df.columns):
-            df.insert(df.columns.get_loc("DatasetCode")+1, "Region", f"{region}")
-
-        print(f"\tInserting 'StdTime' column into: {table_name}", flush=True)
-        if "StdTime" not in list(df.columns):
-            df.insert(df.columns.get_loc("Year")+1, "StdTime", pd.to_datetime(df["Year"], format="%Y").dt.tz_localize('Etc/GMT+12'))
-
-        print(f"\tInserting 'MapValue' column into: {table_name}", flush=True)
-        if "MapValue" not in list(df.columns):
-            df.insert(df.columns.get_loc("WTCPUE")+1, "MapValue", np.nan)
-            #-->> MapValue
-            print(f"\tCalculating the MapValue values", flush=True)
-            df["MapValue"] = df["WTCPUE"].pow((1.0/3.0))
-
-        print(f"\tInserting 'SpeciesCommonName' column into: {table_name}", flush=True)
-        if "SpeciesCommonName" not in list(df.columns):
-            df.insert(df.columns.get_loc("CommonName")+1, "SpeciesCommonName", "")
-
-        print(f"\tInserting 'CommonNameSpecies' column into: {table_name}", flush=True)
-        if "CommonNameSpecies" not in list(df.columns):
-            df.insert(df.columns.get_loc("SpeciesCommonName")+1, "CommonNameSpecies", "")
-
-        # Test if 'IDW' in table name
-        if "IDW" in table_name:
-            print(f"\tInserting 'Season' {season} column into: {table_name}", flush=True)
-            if "Season" not in list(df.columns):
-                df.insert(df.columns.get_loc("Region")+1, "Season", season if season != None else "")
-
-            print(f"\tInserting 'SummaryProduct' column into: {table_name}", flush=True)
-            if "SummaryProduct" not in list(df.columns):
-                df.insert(df.columns.get_loc("Season")+1, "SummaryProduct", "Yes")
-
-            print(f"\tInserting 'TransformUnit' column into: {table_name}", flush=True)
-            if "TransformUnit" not in list(df.columns):
-                df.insert(df.columns.get_loc("MapValue")+1, "TransformUnit", "cuberoot")
-
-            print(f"\tInserting 'CoreSpecies' column into: {table_name}", flush=True)
-            if "CoreSpecies" not in list(df.columns):
-                df.insert(df.columns.get_loc("CommonNameSpecies")+1, "CoreSpecies", "No")
-
-            print(f"\tCalculate Null for 'StratumArea' column into: {table_name}", flush=True)
-            if "StratumArea" in list(df.columns):
-                df["StratumArea"].fillna(np.nan, inplace = True)
-
-            print(f"\tCalculate Null for 'DistributionProjectName' column into: {table_name}", flush=True)
-            if "DistributionProjectName" in list(df.columns):
-                df["DistributionProjectName"].fillna(np.nan, inplace = True)
-
-        # Test if 'GLMME' or 'GFDL' in region name
-        if any(t for t in ["GLMME", "GFDL"] if t in table_name):
-            print(f"\tInserting 'SummaryProduct' column into: {table_name}", flush=True)
-            if "SummaryProduct" not in list(df.columns):
-                df.insert(df.columns.get_loc("Region")+1, "SummaryProduct", "No")
-
-            print(f"\tInserting 'StandardError' column into: {table_name}", flush=True)
-            if "StandardError" not in list(df.columns):
-                df.insert(df.columns.get_loc("MapValue")+1, "StandardError", np.nan)
-
-            print(f"\tInserting 'TransformUnit' column into: {table_name}", flush=True)
-            if "TransformUnit" not in list(df.columns):
-                df.insert(df.columns.get_loc("StandardError")+1, "TransformUnit", "ln")
-
-            print(f"\tCalculate Null for 'Easting' column into: {table_name}", flush=True)
-            if "Easting" in list(df.columns):
-                df["Easting"].fillna(np.nan, inplace = True)
-
-            print(f"\tCalculate Null for 'Northing' column into: {table_name}", flush=True)
-            if "Northing" in list(df.columns):
-                df["Northing"].fillna(np.nan, inplace = True)
-
-            print(f"\tCalculate Null for 'MedianEstimate' column into: {table_name}", flush=True)
-            if "MedianEstimate" in list(df.columns):
-                df["MedianEstimate"].fillna(np.nan, inplace = True)
-
-        print(f"\tCalculate Null for 'WTCPUE' column into: {table_name}", flush=True)
-        if "WTCPUE" in list(df.columns):
-            df["WTCPUE"].fillna(np.nan, inplace = True)
-
-        print(f"\tCalculate Null for 'Latitude' column into: {table_name}", flush=True)
-        if "Latitude" in list(df.columns):
-            df["Latitude"].fillna(np.nan, inplace = True)
-
-        print(f"\tCalculate Null for 'Longitude' column into: {table_name}", flush=True)
-        if "Longitude" in list(df.columns):
-            df["Longitude"].fillna(np.nan, inplace = True)
+        encoding, index_column = dismap.get_encoding_index_col(process_table)
 
-        print(f"\tCalculate Null for 'Depth' column into: {table_name}", flush=True)
-        if "Depth" in list(df.columns):
-            df["Depth"].fillna(np.nan, inplace = True)
-
-        del region, season
-
-        # ###--->>>
-        #print(f"Updating and calculating new values for some columns\n")
-        #-->> CommonName
-        print(f"\tSetting 'NaN' in 'CommonName' to ''", flush=True)
-        #df.loc[df['CommonName'] == 'nan', 'CommonName'] =  ""
-        df["CommonName"].fillna("", inplace=True)
-
-        print(f"\tSetting 'CommonName' unicode'", flush=True)
-        # Cast text as Unicode in the CommonName field
-        df["CommonName"] = df["CommonName"].astype("unicode")
-
-        #-->> SpeciesCommonName
-        print(f"\tCalculating SpeciesCommonName and setting it to 'Species (CommonName)'", flush=True)
-        df["SpeciesCommonName"] = np.where(df["CommonName"] != "", df["Species"] + ' (' + df["CommonName"] + ')', "")
-
-        #-->> CommonNameSpecies
-        print(f"\tCalculating  CommonNameSpecies and setting it to 'CommonName (Species)'", flush=True)
-        df["CommonNameSpecies"] = np.where(df["CommonName"] != "", df["CommonName"] + ' (' + df["Species"] + ')', "")
-
-        print(f"\tReplacing Infinity values with Nulls", flush=True)
-        # Replace Inf with Nulls
-        # For some cell values in the 'WTCPUE' column, there is an Inf
-        # value representing an infinit
-        df.replace([np.inf, -np.inf], np.nan, inplace=True)
-
-        # Left justify the column names
-        #df.columns = pd.Index([col.ljust(10) for col in df.columns])
+        out_table = rf"{region_gdb}\{table_name}"
+        #out_table = rf"{region_gdb}\{table_name}_TABLE"
 
-        table_definition = dismap.table_definitions(csv_data_folder, table_name)
+        # Temporary table for the chunks after the first
+        #tmp_table = f"memory\{table_name.lower()}_tmp"
+        tmp_table = rf"{region_gdb}\{table_name.lower()}_tmp"
 
-        # altering the DataFrame
-        df = df[table_definition]
-        del table_definition
+        # Set the output coordinate system to what is needed for the
+        # DisMAP project
+        #geographic_area_sr = os.path.join(f"{project_folder}", "Dataset Shapefiles", f"{table_name}", f"{geographic_area}.prj")
+        #psr = arcpy.SpatialReference(geographic_area_sr); del geographic_area_sr
+        #arcpy.env.outputCoordinateSystem    = psr
+        psr    = arcpy.Describe(rf"{region_gdb}\{table_name}_Region").spatialReference
 
-        #raise Exception(f"Line Number: {traceback.extract_stack()[-1].lineno}")
+        arcpy.env.outputCoordinateSystem = psr
 
-        pd.set_option("display.max_colwidth", 12)
+        if distri_code == "IDW":
 
-        # Change Table Style
-        df.style.set_table_styles([{'selector': 'td', 'props': 'white-space: nowrap !important;'}])
+            # 4326 - World Geodetic System 1984 (WGS 84)
+            gsr     = arcpy.SpatialReference(4326)
+            gsr_wkt = gsr.exportToString()
+            psr_wkt = psr.exportToString()
+            transformation = dismap.get_transformation(gsr_wkt, psr_wkt)
+            arcpy.env.geographicTransformations = transformation
+            del gsr_wkt, psr_wkt
+            del transformation
 
-        print(f"\nDataframe report:\n{df.head(5)}\n", flush=True)
+            # The sample locations are written with each chunk of the table
+            # (see write_chunk), projected from WGS 84 to the region
+            point_features = rf"{region_gdb}\{table_name}_Sample_Locations"
+            tmp_features   = rf"{region_gdb}\{table_name.lower()}_tmp_points"
+        else:
+            gsr, point_features, tmp_features = None, "", ""
+
+        def write_chunk(df, first):
+            # The first chunk creates the table (and the Sample Locations
+            # feature class), the others are appended, so only one chunk of
+            # the CSV file is held in memory
+            if first:
+                pd.set_option("display.max_colwidth", 12)
+                print(f"\nDataframe report:\n{df.head(5)}\n", flush=True)
+                print(f"Converting the Dataframe to an NumPy Array\n", flush=True)
+            try:
+                array = dismap.dataframe_to_array(df, field_gdb_dtypes)
+            except:
+                raise SystemExit(traceback.print_exc())
+            try:
+                if first:
+                    arcpy.da.NumPyArrayToTable(array, out_table)
+                    if point_features:
+                        arcpy.da.NumPyArrayToFeatureClass(array, point_features, ('Longitude', 'Latitude'), gsr)
+                else:
+                    arcpy.da.NumPyArrayToTable(array, tmp_table)
+                    arcpy.management.Append(inputs=tmp_table, target=out_table, schema_type="TEST")
+                    arcpy.management.Delete(tmp_table)
+                    if point_features:
+                        arcpy.da.NumPyArrayToFeatureClass(array, tmp_features, ('Longitude', 'Latitude'), gsr)
+                        arcpy.management.Append(inputs=tmp_features, target=point_features, schema_type="TEST")
+                        arcpy.management.Delete(tmp_features)
+            except:
+                raise arcpy.ExecuteError(arcpy.GetMessages())
+            del array
 
-        print(f"Converting the Dataframe to an NumPy Array\n", flush=True)
-        try:
-            array = np.array(np.rec.fromrecords(df.values), dtype = field_gdb_dtypes)
-        except:
-            raise SystemExit(traceback.print_exc())
+        if chunk_size:
+            print(f"Reading the CSV File in chunks of {chunk_size} rows\n", flush=True)
+        with warnings.catch_warnings():
+            warnings.simplefilter(action='ignore', category=FutureWarning)
+            # DataFrame chunks
+            n_rows = sample_locations_ingest.ingest_csv(
+                                                        process_table,
+                                                        writer         = write_chunk,
+                                                        chunk_size     = chunk_size,
+                                                        transform_args = {"table_name"       : table_name,
+                                                                          "datasetcode"      : datasetcode,
+                                                                          "region"           : region,
+                                                                          "season"           : season,
+                                                                          "table_definition" : table_definition,},
+                                                        read_csv_args  = {"index_col"        : index_column,
+                                                                          "encoding"         : encoding,
+                                                                          "delimiter"        : ",",
+                                                                          "dtype"            : sample_locations_ingest.csv_dtypes(field_csv_dtypes),},
+                                                       )
+        print(f"Imported {n_rows} rows into the {table_name} Table\n", flush=True)
+        del encoding, index_column, n_rows, write_chunk, tmp_table, tmp_features, gsr
+        del table_definition, datasetcode, region, season
 
         del field_gdb_dtypes
         del field_csv_dtypes
 
-        del df # delete dataframe
         # Imports
         del pd, np
 
         del process_table # delete passed variables
 
-        # Temporary table
-        #tmp_table = f"memory\{table_name.lower()}_tmp"
-        tmp_table = rf"{region_gdb}\{table_name.lower()}_tmp"
-        try:
-            arcpy.da.NumPyArrayToTable(array, tmp_table)
-            del array
-        except:
-            raise arcpy.ExecuteError(arcpy.GetMessages())
-
-        desc = arcpy.da.Describe(tmp_table)
+        desc = arcpy.da.Describe(out_table)
         fields = [f.name for f in desc["fields"] if f.type == "String"]
         #fields = ["Season", "Species", "CommonName", "SpeciesCommonName", "CommonNameSpecies", "Stratum"]
         oid    = desc["OIDFieldName"]
         # Use SQL TOP to sort field values
         print(f"{', '.join(fields)}", flush=True)
-        for row in arcpy.da.SearchCursor(tmp_table, fields, f"{oid} <= 5"):
+        for row in arcpy.da.SearchCursor(out_table, fields, f"{oid} <= 5"):
             print(row)
             del row
         del desc, fields, oid
 
-        out_table = rf"{region_gdb}\{table_name}"
-        #out_table = rf"{region_gdb}\{table_name}_TABLE"
-
-        print(f"Copying the {table_name} Table from memory to the GDB", flush=True)
-        arcpy.management.CopyRows(tmp_table, out_table, "")
-        print("Copy Rows: \t{0}\n".format(arcpy.GetMessages().replace("\n", '\n\t')), flush=True)
-        # Remove the temporary table
-        arcpy.management.Delete(tmp_table)
-        del tmp_table
-
         # Test if 'IDW' in region name
         if distri_code == "IDW":
-            # Calculate Core Species
-            dismap.calculate_core_species(out_table)
+            # Calculate Core Species, for the table and the Sample Locations
+            dismap.calculate_core_species(out_table, [point_features])
 
         arcpy.conversion.ExportTable(in_table = out_table, out_table  = f"{csv_data_folder}\_{table_name}.csv", where_clause="", use_field_alias_as_name = "NOT_USE_ALIAS")
         print("Export Table: \t{0}\n".format(arcpy.GetMessages().replace("\n", '\n\t')), flush=True)
@@ -371,31 +233,12 @@ def worker(region_gdb=""):
 
         print(f"Creating the {table_name} Sample Locations Dataset", flush=True)
 
-        # Set the output coordinate system to what is needed for the
-        # DisMAP project
-        #geographic_area_sr = os.path.join(f"{project_folder}", "Dataset Shapefiles", f"{table_name}", f"{geographic_area}.prj")
-        #psr = arcpy.SpatialReference(geographic_area_sr); del geographic_area_sr
-        #arcpy.env.outputCoordinateSystem    = psr
-        psr    = arcpy.Describe(rf"{region_gdb}\{table_name}_Region").spatialReference
-
-        arcpy.env.outputCoordinateSystem = psr
-
         out_features = ""
 
         if distri_code == "IDW":
 
-            # 4326 - World Geodetic System 1984 (WGS 84)
-            gsr     = arcpy.SpatialReference(4326)
-            gsr_wkt = gsr.exportToString()
-            psr_wkt = psr.exportToString()
-            transformation = dismap.get_transformation(gsr_wkt, psr_wkt)
-            arcpy.env.geographicTransformations = transformation
-            del gsr_wkt, psr_wkt
-            del transformation
-
-            out_features = rf"{region_gdb}\{table_name}_Sample_Locations"
-
-            print(f"\tXY Table to Feature Class", flush=True)
+            # Written with the table, one chunk at a time
+            out_features = point_features
 
 ##            arcpy.management.XYTableToPoint(
 ##                                            in_table          = out_table,
@@ -406,13 +249,6 @@ def worker(region_gdb=""):
 ##                                            coordinate_system = gsr
 ##                                           )
 
-            fields = [f.name for f in arcpy.ListFields(out_table) if f.type not in ["Geometry", "OID"]]
-            arr = arcpy.da.TableToNumPyArray(out_table, fields)
-            arcpy.da.NumPyArrayToFeatureClass(arr, out_features, ('Longitude', 'Latitude'), gsr)
-            del arr, fields
-
-            del gsr
-
 ##            if arcpy.Exists(out_features):
 ##                # Get the count of records for selected species
 ##                getcount = arcpy.management.GetCount(out_features)[0]
@@ -462,7 +298,7 @@ def worker(region_gdb=""):
         del geographic_area
         del distri_code
 
-        del psr
+        del psr, point_features
 
         if arcpy.Exists(out_features):
             print(f"Adding field index in the {table_name} Point Locations Dataset", flush=True)
@@ -488,9 +324,9 @@ def worker(region_gdb=""):
         del table_name, project_folder, scratch_workspace
         # Imports
         del warnings
-        del dismap
+        del dismap, sample_locations_ingest
         # Function parameter
-        del region_gdb
+        del region_gdb, chunk_size
 
     except KeyboardInterrupt:
         raise Exception
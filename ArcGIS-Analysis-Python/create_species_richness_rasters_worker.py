@@ -23,7 +23,110 @@ def line_info(msg):
     i = inspect.getframeinfo(f.f_back)
     return f"Script: {os.path.basename(i.filename)}\n\tNear Line: {i.lineno}\n\tFunction: {i.function}\n\tMessage: {msg}"
 
-def worker(region_gdb=""):
+def region_setup(region_gdb=""):
+    # The values that are the same for every year of a region: the size and
+    # grid of the raster mask, the input rasters and the rasters without
+    # biomass. Called once for a region, by worker_tasks when the region is
+    # split, otherwise by the worker.
+    import image_statistics
+    importlib.reload(image_statistics)
+
+    import geotiff_writer
+    importlib.reload(geotiff_writer)
+
+    table_name         = os.path.basename(region_gdb).replace(".gdb","")
+    project_folder     = os.path.dirname(os.path.dirname(region_gdb))
+    region_raster_mask = rf"{region_gdb}\{table_name}_Raster_Mask"
+
+    arcpy.AddMessage(f"\tGet list of variables from the 'Datasets' table")
+
+    # DatasetCode, CSVFile, TransformUnit, TableName, GeographicArea, CellSize,
+    # PointFeatureType, FeatureClassName, Region, Season, DateCode, Status,
+    # DistributionProjectCode, DistributionProjectName, SummaryProduct,
+    # FilterRegion, FilterSubRegion, FeatureServiceName, FeatureServiceTitle,
+    # MosaicName, MosaicTitle, ImageServiceName, ImageServiceTitle
+
+    # Get values for table_name from Datasets table
+    fields = ["GeographicArea", "DatasetCode", "CellSize"]
+    geographic_area, datasetcode, cell_size = [row for row in arcpy.da.SearchCursor(rf"{region_gdb}\Datasets", fields, where_clause = f"TableName = '{table_name}'")][0]
+    del fields
+
+    arcpy.AddMessage(f"\tGet the 'rowCount', 'columnCount', and 'lowerLeft' corner of '{table_name}_Raster_Mask'")
+    # These are used later to set the rows and columns for a zero numpy array
+    setup = {"rowCount"    : int(arcpy.management.GetRasterProperties(region_raster_mask, "ROWCOUNT" ).getOutput(0)),
+             "columnCount" : int(arcpy.management.GetRasterProperties(region_raster_mask, "COLUMNCOUNT" ).getOutput(0)),}
+
+    raster_mask_extent = arcpy.Raster(region_raster_mask)
+    lowerLeft = arcpy.Point(raster_mask_extent.extent.XMin, raster_mask_extent.extent.YMin)
+    del raster_mask_extent
+
+    # The projection information for the geographic region
+    psr = arcpy.SpatialReference(rf"{project_folder}\Dataset Shapefiles\{table_name}\{geographic_area}.prj")
+
+    # The grid of the richness rasters, the same as the raster mask
+    setup["grid"] = geotiff_writer.grid_geometry(lowerLeft.X, lowerLeft.Y, cell_size, psr.exportToString().split(";")[0], psr.factoryCode)
+    del geographic_area, cell_size, lowerLeft, psr
+
+    arcpy.AddMessage(f"\tGet information for input rasters")
+
+    layerspeciesyearimagename = rf"{region_gdb}\{table_name}_LayerSpeciesYearImageName"
+
+    fields = ['DatasetCode', 'CoreSpecies', 'Year', 'Variable', 'ImageName']
+    input_rasters = {}
+    input_rasters_path = rf"{project_folder}\Images\{table_name}"
+
+    with arcpy.da.SearchCursor(layerspeciesyearimagename, fields, where_clause=f"Variable NOT IN ('Core Species Richness', 'Species Richness') and DatasetCode = '{datasetcode}'") as cursor:
+        for row in cursor:
+            _datasetcode    = row[0]
+            _corespecies    = row[1]
+            _year           = row[2]
+            _variable       = row[3]
+            _image          = row[4]
+            input_rasters[f"{_image}.tif"] = [_variable, _corespecies, _year, os.path.join(input_rasters_path, _variable, f"{_image}.tif")]
+            del row, _datasetcode, _corespecies, _year, _variable, _image
+        del cursor
+    del input_rasters_path, fields, layerspeciesyearimagename
+
+    setup["input_rasters"] = input_rasters
+
+    # A raster where every cell is zero does not change the richness, so
+    # these are skipped using the statistics saved by create_rasters_worker.
+    # A negative cell makes the richness cell Null, so a raster is only
+    # skipped when its Minimum is also zero (the Minimum is NaN, and the
+    # raster is read, for statistics saved before it was added).
+    raster_statistics = image_statistics.read_image_statistics(image_statistics.image_statistics_path(rf"{project_folder}\Images", table_name))
+    setup["zero_rasters"] = {r for r in input_rasters if r[:-4] in raster_statistics and raster_statistics[r[:-4]]["Maximum"] == 0.0 and raster_statistics[r[:-4]]["Minimum"] >= 0.0}
+    arcpy.AddMessage(f"\t{len(setup['zero_rasters'])} of {len(input_rasters)} input rasters have no biomass")
+    del raster_statistics
+
+    del image_statistics, geotiff_writer, input_rasters
+    del table_name, project_folder, region_raster_mask, datasetcode, region_gdb
+
+    return setup
+
+def worker_tasks(region_gdb=""):
+    # One task for each year of the region, so the years of a large region
+    # are spread over the Pool (see director_runner.run_workers). The region
+    # is set up once here (see region_setup) and each task gets the input
+    # rasters for its year.
+    setup = region_setup(region_gdb)
+
+    years = sorted({value[2] for value in setup["input_rasters"].values()})
+
+    tasks = []
+    for year in years:
+        input_rasters = {raster : value for raster, value in setup["input_rasters"].items() if value[2] == year}
+        tasks.append({"years" : [year], "setup" : dict(setup, input_rasters = input_rasters, zero_rasters = {r for r in setup["zero_rasters"] if r in input_rasters})})
+        del year, input_rasters
+
+    del setup, years
+
+    return tasks
+
+def worker(region_gdb="", years=None, setup=None):
+    # years: the years to create the richness rasters for, all of the years
+    # when None
+    # setup: the values from region_setup, given by worker_tasks
     try:
         # Test if passed workspace exists, if not raise SystemExit
         if not arcpy.Exists(rf"{region_gdb}"):
@@ -36,6 +139,12 @@ def worker(region_gdb=""):
         # Import
         import numpy as np
 
+        import richness_engine
+        importlib.reload(richness_engine)
+
+        import geotiff_writer
+        importlib.reload(geotiff_writer)
+
         # Set History and Metadata logs, set serverity and message level
         arcpy.SetLogHistory(True) # Look in %AppData%\Roaming\Esri\ArcGISPro\ArcToolbox\History
         arcpy.SetLogMetadata(True)
@@ -49,7 +158,6 @@ def worker(region_gdb=""):
         scratch_folder     = os.path.dirname(region_gdb)
         project_folder     = os.path.dirname(scratch_folder)
         scratch_workspace  = rf"{scratch_folder}\{table_name}\scratch.gdb"
-        region_raster_mask = rf"{region_gdb}\{table_name}_Raster_Mask"
 
         arcpy.AddMessage(f"Table Name: {table_name}\nProject Folder: {project_folder}\nScratch Folder: {scratch_folder}\n")
 
@@ -66,65 +174,17 @@ def worker(region_gdb=""):
 
         arcpy.AddMessage(f"Creating {table_name} Species Richness Rasters")
 
-        arcpy.AddMessage(f"\tGet list of variables from the 'Datasets' table")
-
-        # DatasetCode, CSVFile, TransformUnit, TableName, GeographicArea, CellSize,
-        # PointFeatureType, FeatureClassName, Region, Season, DateCode, Status,
-        # DistributionProjectCode, DistributionProjectName, SummaryProduct,
-        # FilterRegion, FilterSubRegion, FeatureServiceName, FeatureServiceTitle,
-        # MosaicName, MosaicTitle, ImageServiceName, ImageServiceTitle
-
-        # Get values for table_name from Datasets table
-        fields = ["TableName", "GeographicArea", "DatasetCode", "CellSize"]
-        region_list = [row for row in arcpy.da.SearchCursor(rf"{region_gdb}\Datasets", fields, where_clause = f"TableName = '{table_name}'")][0]
-        del fields
-
-        # Assigning variables from items in the chosen table list
-        # ['AI_IDW', 'AI_IDW_Region', 'AI', 'Aleutian Islands', None, 'IDW']
-        table_name      = region_list[0]
-        geographic_area = region_list[1]
-        datasetcode     = region_list[2]
-        cell_size       = region_list[3]
-        del region_list
-
-        arcpy.AddMessage(f"\tGet the 'rowCount', 'columnCount', and 'lowerLeft' corner of '{table_name}_Raster_Mask'")
-        # These are used later to set the rows and columns for a zero numpy array
-        rowCount = int(arcpy.management.GetRasterProperties(region_raster_mask, "ROWCOUNT" ).getOutput(0))
-        columnCount = int(arcpy.management.GetRasterProperties(region_raster_mask, "COLUMNCOUNT" ).getOutput(0))
-
-        # Create Raster from Array
-        raster_mask_extent = arcpy.Raster(region_raster_mask)
-        lowerLeft = arcpy.Point(raster_mask_extent.extent.XMin, raster_mask_extent.extent.YMin)
-        del raster_mask_extent
-
-        arcpy.AddMessage(f"\tSet the 'outputCoordinateSystem' based on the projection information for the geographic region")
-
-        geographic_area_sr = rf"{project_folder}\Dataset Shapefiles\{table_name}\{geographic_area}.prj"
-        # Set the output coordinate system to what is needed for the
-        # DisMAP project
-        psr = arcpy.SpatialReference(geographic_area_sr)
-        arcpy.env.outputCoordinateSystem = psr
-        del geographic_area_sr, geographic_area, psr
-
-        arcpy.AddMessage(f"\tGet information for input rasters")
-
-        layerspeciesyearimagename = rf"{region_gdb}\{table_name}_LayerSpeciesYearImageName"
-
-        fields = ['DatasetCode', 'CoreSpecies', 'Year', 'Variable', 'ImageName']
-        input_rasters = {}
-        input_rasters_path = rf"{project_folder}\Images\{table_name}"
-
-        with arcpy.da.SearchCursor(layerspeciesyearimagename, fields, where_clause=f"Variable NOT IN ('Core Species Richness', 'Species Richness') and DatasetCode = '{datasetcode}'") as cursor:
-            for row in cursor:
-                _datasetcode    = row[0]
-                _corespecies    = row[1]
-                _year           = row[2]
-                _variable       = row[3]
-                _image          = row[4]
-                input_rasters[f"{_image}.tif"] = [_variable, _corespecies, _year, os.path.join(input_rasters_path, _variable, f"{_image}.tif")]
-                del row, _datasetcode, _corespecies, _year, _variable, _image
-            del cursor
-        del input_rasters_path, fields, layerspeciesyearimagename
+        # The values that are the same for every year of the region (see
+        # region_setup), given by worker_tasks when the region is split
+        if setup is None:
+            setup = region_setup(region_gdb)
+
+        rowCount      = setup["rowCount"]
+        columnCount   = setup["columnCount"]
+        grid          = setup["grid"]
+        input_rasters = setup["input_rasters"]
+        zero_rasters  = setup["zero_rasters"]
+        del setup
 
         #for input_raster in input_rasters:
         #    print(input_raster, input_rasters[input_raster])
@@ -132,60 +192,22 @@ def worker(region_gdb=""):
 
         arcpy.AddMessage(f"\tSet the output and scratch paths")
 
-        # Set species_richness_path
-        species_richness_path         = rf"{project_folder}\Images\{table_name}\_Species Richness"
-        species_richness_scratch_path = rf"{project_folder}\Scratch\{table_name}\_Species Richness"
-
-        if not os.path.exists(species_richness_path):
-            os.makedirs(species_richness_path)
-        if not os.path.exists(species_richness_scratch_path):
-            os.makedirs(species_richness_scratch_path)
-
-        years = sorted(list(set([input_rasters[input_raster][2] for input_raster in input_rasters])))
-
-        arcpy.AddMessage(f"\tProcessing all species")
-
-        for year in years:
-            arcpy.AddMessage(f"\t\tYear: {year}")
-
-            layercode_year_richness = os.path.join(species_richness_path, f"{table_name}_Species_Richness_{year}.tif")
-
-            #if not arcpy.Exists(layercode_year_richness):
-
-            arcpy.AddMessage("\t\tProcessing rasters for the year")
-
-            richnessArray = np.zeros((rowCount, columnCount), dtype='float32', order='C')
-
-            rasters = [r for r in input_rasters if input_rasters[r][2] == year]
-
-            # For each raster exported, create the Con mask
-            for raster in rasters:
-                arcpy.AddMessage(f"\t\t\tProcessing the {raster} raster")
-
-                _in_raster = input_rasters[raster][3]
-
-                rasterArray = arcpy.RasterToNumPyArray(_in_raster, nodata_to_value=np.nan)
-
-                rasterArray[rasterArray < 0.0] = np.nan
-
-                rasterArray[rasterArray > 0.0] = 1.0
-
-                #add rasterArray to richnessArray
-                richnessArray = np.add(richnessArray, rasterArray) # Can also use: richnessArray + rasterArray
-                del rasterArray, _in_raster, raster
-
-            arcpy.AddMessage("\t\tCreating Species Richness Raster")
+        # Set species_richness_path and core_species_richness_path
+        species_richness_path              = rf"{project_folder}\Images\{table_name}\_Species Richness"
+        species_richness_scratch_path      = rf"{project_folder}\Scratch\{table_name}\_Species Richness"
+        core_species_richness_path         = rf"{project_folder}\Images\{table_name}\_Core Species Richness"
+        core_species_richness_scratch_path = rf"{project_folder}\Scratch\{table_name}\_Core Species Richness"
 
-            # Cast array as float32
-            richnessArray = richnessArray.astype('float32')
+        # The tasks of a split region start at the same time, so the folders
+        # may be created by another task between a check and makedirs
+        for path in [species_richness_path, species_richness_scratch_path, core_species_richness_path, core_species_richness_scratch_path]:
+            os.makedirs(path, exist_ok=True)
+            del path
 
-            # Convert Array to Raster
-            with arcpy.EnvManager(scratchWorkspace=species_richness_scratch_path, workspace = species_richness_path):
-                richnessArrayRaster = arcpy.NumPyArrayToRaster(richnessArray, lowerLeft, cell_size, cell_size, -3.40282346639e+38) #-3.40282346639e+38
-                richnessArrayRaster.save(layercode_year_richness)
-                del richnessArrayRaster
-                # Add statitics
-                arcpy.management.CalculateStatistics(layercode_year_richness)
+        def save_richness(richness_array, layercode_year_richness):
+            # Convert Array to Raster, the overviews and statistics are
+            # written with the raster (see geotiff_writer)
+            geotiff_writer.write_geotiff(layercode_year_richness, richness_array, grid)
 
             from arcpy import metadata as md
             raster_md = md.Metadata(layercode_year_richness)
@@ -193,87 +215,53 @@ def worker(region_gdb=""):
             raster_md.save()
             del raster_md, md
 
-            del richnessArray, rasters
-
-            #else:
-            #    arcpy.AddMessage(f"\t\t{os.path.basename(layercode_year_richness)} exists")
-
-            del year, layercode_year_richness
-
-        del years, species_richness_path, species_richness_scratch_path
+        region_years = sorted(list(set([input_rasters[input_raster][2] for input_raster in input_rasters])))
+        years = region_years if years is None else [year for year in region_years if year in years]
+        del region_years
 
-            # ###--->>>
-
-        arcpy.AddMessage(f"\tCreating the {table_name} Core Species Richness Rasters")
-
-        # Set core_species_richness_path
-        core_species_richness_path         = rf"{project_folder}\Images\{table_name}\_Core Species Richness"
-        core_species_richness_scratch_path = rf"{project_folder}\Scratch\{table_name}\_Core Species Richness"
-
-        if not os.path.exists(core_species_richness_path):
-            os.makedirs(core_species_richness_path)
-        if not os.path.exists(core_species_richness_scratch_path):
-            os.makedirs(core_species_richness_scratch_path)
-
-        years = sorted(list(set([input_rasters[input_raster][2] for input_raster in input_rasters if input_rasters[input_raster][1] == "Yes"])))
-
-        # ###--->>>
-        arcpy.AddMessage(f"\t\tProcessing Core Species")
+        arcpy.AddMessage(f"\tProcessing all species and core species")
 
+        # Each raster is read once for the year and counted for all species,
+        # for the core species, or both (see richness_engine)
         for year in years:
             arcpy.AddMessage(f"\t\tYear: {year}")
 
-            layercode_year_richness = os.path.join(core_species_richness_path, f"{table_name}_Core_Species_Richness_{year}.tif")
-
-            #if not arcpy.Exists(layercode_year_richness):
-
-            richnessArray = np.zeros((rowCount, columnCount), dtype='float32', order='C')
+            rasters      = [r for r in input_rasters if input_rasters[r][2] == year]
+            core_rasters = [r for r in rasters if input_rasters[r][1] == "Yes"]
+            # One raster is still read when all are zero, for the Null cells
+            all_rasters  = [r for r in rasters if r not in zero_rasters] or rasters[:1]
+            core_rasters = [r for r in core_rasters if r not in zero_rasters] or core_rasters[:1]
 
-            rasters = [r for r in input_rasters if input_rasters[r][2] == year and input_rasters[r][1] == "Yes"]
+            def layers():
+                for raster in all_rasters + [r for r in core_rasters if r not in all_rasters]:
+                    arcpy.AddMessage(f"\t\t\tProcessing the {raster} raster")
+                    yield arcpy.RasterToNumPyArray(input_rasters[raster][3], nodata_to_value=np.nan), raster in all_rasters, raster in core_rasters
+                    del raster
 
-            arcpy.AddMessage("\t\tProcessing rasters")
-
-            # For each raster exported, create the Con mask
-            for raster in rasters:
-                arcpy.AddMessage(f"\t\t\tProcessing {raster} raster")
-
-                _in_raster = input_rasters[raster][3]
-
-                rasterArray = arcpy.RasterToNumPyArray(_in_raster, nodata_to_value=np.nan)
-                rasterArray[rasterArray < 0.0] = np.nan
-
-                rasterArray[rasterArray > 0.0] = 1.0
+            arcpy.AddMessage("\t\tProcessing rasters for the year")
 
-                #add rasterArray to richnessArray
-                richnessArray = np.add(richnessArray, rasterArray)
-                # Can also use: richnessArray + rasterArray
-                del rasterArray, _in_raster, raster
+            all_counts, all_null, core_counts, core_null = richness_engine.richness_counts(layers(), (rowCount, columnCount))
 
-            arcpy.AddMessage("\t\tCreating Core Species Richness Raster")
+            arcpy.AddMessage("\t\tCreating Species Richness Raster")
 
-            # Cast array as float32
-            richnessArray = richnessArray.astype('float32')
+            layercode_year_richness = os.path.join(species_richness_path, f"{table_name}_Species_Richness_{year}.tif")
+            save_richness(richness_engine.richness_array(all_counts, all_null), layercode_year_richness)
+            del layercode_year_richness
 
-            # Convert Array to Raster
-            with arcpy.EnvManager(scratchWorkspace=core_species_richness_scratch_path, workspace = core_species_richness_path):
-                richnessArrayRaster = arcpy.NumPyArrayToRaster(richnessArray, lowerLeft, cell_size, cell_size, -3.40282346639e+38) #-3.40282346639e+38
-                richnessArrayRaster.save(layercode_year_richness)
-                del richnessArrayRaster
-                # Add statistics
-                arcpy.management.CalculateStatistics(layercode_year_richness)
+            if core_rasters:
+                arcpy.AddMessage("\t\tCreating Core Species Richness Raster")
 
-            from arcpy import metadata as md
-            raster_md = md.Metadata(layercode_year_richness)
-            raster_md.title = os.path.basename(layercode_year_richness).replace("_", " ")
-            raster_md.save()
-            del raster_md, md
+                layercode_year_richness = os.path.join(core_species_richness_path, f"{table_name}_Core_Species_Richness_{year}.tif")
+                save_richness(richness_engine.richness_array(core_counts, core_null), layercode_year_richness)
+                del layercode_year_richness
 
-            del richnessArray, rasters
-            #else:
-            #    arcpy.AddMessage(f"\t\t{os.path.basename(layercode_year_richness)} exists")
+            del all_counts, all_null, core_counts, core_null
+            del rasters, all_rasters, core_rasters, layers
+            del year
 
-            del year, layercode_year_richness
-        del years, core_species_richness_path, core_species_richness_scratch_path
+        del years, save_richness
+        del species_richness_path, species_richness_scratch_path
+        del core_species_richness_path, core_species_richness_scratch_path
 
         results = [region_gdb]
 
@@ -282,14 +270,12 @@ def worker(region_gdb=""):
 
         # Clean up
         # Variables for this function only
-        del rowCount, columnCount, lowerLeft, input_rasters
-        del datasetcode, cell_size
-        del region_raster_mask
+        del rowCount, columnCount, grid, input_rasters, zero_rasters
 
         # Basic variables
         del table_name, project_folder, scratch_workspace
         # Imports
-        del dismap, np
+        del dismap, np, richness_engine, geotiff_writer
         # Function parameter
         del region_gdb
 
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+#-------------------------------------------------------------------------------
+# Name:        dataframe_array
+# Purpose:     Converts the CSV DataFrames to NumPy structured arrays with the
+#              geodatabase dtypes, one column at a time
+#
+# Author:      john.f.kennedy
+#
+# Created:     10/18/2026
+# Copyright:   (c) john.f.kennedy 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+# Used by dismap.dataframe_to_array, and checked against the old
+# np.rec.fromrecords(df.values) conversion by dataframe_array_test. This
+# module does not use arcpy.
+import numpy as np
+import pandas as pd
+
+def dataframe_to_array(df, field_gdb_dtypes=[]):
+    # Returns the DataFrame as a NumPy structured array with the dtypes from
+    # dTypesGDB. The array is filled one column at a time, so the DataFrame
+    # is not first copied to a row by row array of Python objects the way
+    # np.rec.fromrecords(df.values) does. The columns are matched to the
+    # fields by position, and the values are cast the same way:
+    #   text fields:   the values as strings (a Null is 'nan')
+    #   double fields: strings such as '1.5' are converted, a Null is NaN
+    #   date fields:   time zone aware dates are converted to UTC
+    if len(df.columns) != len(field_gdb_dtypes):
+        raise ValueError(f"The DataFrame has {len(df.columns)} columns, but there are {len(field_gdb_dtypes)} fields")
+
+    array = np.empty(len(df), dtype=list(field_gdb_dtypes))
+
+    for i, (field, dtype) in enumerate(field_gdb_dtypes):
+        series = df.iloc[:, i]
+        kind   = array.dtype[field].kind
+
+        if kind == "M":
+            if isinstance(series.dtype, pd.DatetimeTZDtype):
+                series = series.dt.tz_convert(None)
+            array[field] = pd.to_datetime(series).to_numpy(dtype=dtype)
+        elif kind in "fiu":
+            array[field] = series.to_numpy(dtype=dtype, na_value=np.nan)
+        elif isinstance(series.dtype, pd.CategoricalDtype):
+            # Each category is cast to text once and the rows are filled from
+            # the codes, a Null (code -1) is the last value, 'nan'
+            categories = np.asarray(list(series.cat.categories) + [np.nan], dtype=object).astype(dtype)
+            array[field] = categories[series.cat.codes.to_numpy()]
+            del categories
+        else:
+            # Nulls in nullable integer columns are written as 'nan', like
+            # the Nulls of the other columns
+            array[field] = series.to_numpy(dtype=object, na_value=np.nan)
+
+        del i, field, dtype, series, kind
+
+    return array
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+#-------------------------------------------------------------------------------
+# Name:        dataframe_array_test
+# Purpose:     Checks dataframe_array.dataframe_to_array against the old
+#              np.rec.fromrecords(df.values) conversion for each table
+#
+# Author:      john.f.kennedy
+#
+# Created:     10/18/2026
+# Copyright:   (c) john.f.kennedy 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+import os, sys # built-ins first
+import traceback
+import importlib
+import warnings
+
+import numpy as np # third-parties second
+import pandas as pd
+
+sys.path.append(os.path.dirname(__file__))
+
+# The field_gdb_dtypes of the tables made from the CSV files (see
+# dismap_schema.field_gdb_dtypes), used when the CSV Data folder with
+# field_definitions.json and table_definitions.json is not given. A SHORT
+# field is "U4" and a DATE field is "M8[us]" (see dismap_schema.gdb_dtype).
+SCHEMAS = {
+           "Datasets" : [("DatasetCode", "U20"), ("CSVFile", "U20"), ("TransformUnit", "U20"), ("TableName", "U20"),
+                         ("GeographicArea", "U20"), ("CellSize", "U4"), ("PointFeatureType", "U20"), ("FeatureClassName", "U40"),
+                         ("Region", "U40"), ("Season", "U15"), ("DateCode", "U10"), ("Status", "U10"),
+                         ("DistributionProjectCode", "U10"), ("DistributionProjectName", "U60"), ("SummaryProduct", "U5"),
+                         ("FilterRegion", "U25"), ("FilterSubRegion", "U40"), ("FeatureServiceName", "U60"),
+                         ("FeatureServiceTitle", "U100"), ("MosaicName", "U20"), ("MosaicTitle", "U60"),
+                         ("ImageServiceName", "U20"), ("ImageServiceTitle", "U60"),],
+           "Species_Filter" : [("Species", "U50"), ("CommonName", "U40"), ("TaxonomicGroup", "U80"), ("FilterRegion", "U25"),
+                               ("FilterSubRegion", "U40"), ("ManagementBody", "U20"), ("ManagementPlan", "U90"),
+                               ("DistributionProjectName", "U60"),],
+           "IDW_Data" : [("DatasetCode", "U20"), ("Region", "U40"), ("Season", "U15"), ("SummaryProduct", "U5"),
+                         ("SampleID", "U20"), ("Year", "U4"), ("StdTime", "M8[us]"), ("Species", "U50"),
+                         ("WTCPUE", "d"), ("MapValue", "d"), ("TransformUnit", "U20"), ("CommonName", "U40"),
+                         ("SpeciesCommonName", "U90"), ("CommonNameSpecies", "U90"), ("CoreSpecies", "U5"),
+                         ("Stratum", "U20"), ("StratumArea", "d"), ("Latitude", "d"), ("Longitude", "d"), ("Depth", "d"),],
+           "GLMME_Data" : [("DatasetCode", "U20"), ("Region", "U40"), ("SummaryProduct", "U5"), ("Year", "U4"),
+                           ("StdTime", "M8[us]"), ("Species", "U50"), ("WTCPUE", "d"), ("MapValue", "d"),
+                           ("StandardError", "d"), ("TransformUnit", "U20"), ("CommonName", "U40"),
+                           ("SpeciesCommonName", "U90"), ("CommonNameSpecies", "U90"), ("Easting", "d"), ("Northing", "d"),
+                           ("Latitude", "d"), ("Longitude", "d"), ("MedianEstimate", "d"), ("Depth", "d"),],
+          }
+
+def synthetic_frame(field_gdb_dtypes, rows=50, typed=False, seed=2024):
+    # A DataFrame for a table with empty strings, Nulls (NaN), integers,
+    # numbers as text and time zone aware dates. With typed=True the columns
+    # have the dtypes used to read the CSV files (see dismap_schema.csv_dtype):
+    # nullable integers and categorical Species and CommonName.
+    rng = np.random.default_rng(seed)
+
+    columns = {}
+    for field, dtype in field_gdb_dtypes:
+        kind = np.dtype(dtype).kind
+        if kind == "M":
+            years = pd.Series(2000 + rng.integers(0, 20, rows)).astype(str)
+            columns[field] = pd.to_datetime(years, format="%Y").dt.tz_localize('Etc/GMT+12')
+            del years
+        elif kind == "f":
+            values = rng.normal(0.0, 100.0, rows)
+            values[rng.random(rows) < 0.2] = np.nan
+            values[:3] = [0.0, -1.5, 3.0]
+            if typed:
+                columns[field] = pd.Series(values, dtype="float64")
+            else:
+                # Numbers read as text, as in a column with a stray value
+                series = pd.Series(values, dtype=object)
+                series[1] = "-1.5"
+                columns[field] = series
+                del series
+            del values
+        elif dtype == "U4":
+            # SHORT fields, e.g. Year
+            values = 2000 + rng.integers(0, 20, rows)
+            if typed:
+                series = pd.Series(values, dtype="Int16")
+                series[4] = pd.NA
+                columns[field] = series
+                del series
+            else:
+                columns[field] = pd.Series(values, dtype="int64")
+            del values
+        else:
+            values = np.array([f"{field} {i % 7}" for i in range(rows)], dtype=object)
+            values[rng.random(rows) < 0.2] = ""
+            values[rng.random(rows) < 0.2] = np.nan
+            values[:2] = ["", np.nan]
+            if typed and field in ["Species", "CommonName"]:
+                columns[field] = pd.Series(values, dtype="category")
+            else:
+                columns[field] = pd.Series(values, dtype=object)
+            del values
+        del field, dtype, kind
+
+    df = pd.DataFrame(columns)
+
+    del rng, columns
+
+    return df
+
+def reference_array(df, field_gdb_dtypes):
+    # The conversion used before dataframe_to_array. A Null in a nullable
+    # integer column (pd.NA) was never written by the old conversion, the
+    # columns were not typed, so it is compared as NaN ('nan') like the
+    # Nulls of the other columns.
+    values = df.values
+    values = np.where(pd.isna(values), np.nan, values) if values.dtype == object else values
+    with warnings.catch_warnings():
+        # The time zone aware dates are converted to UTC, with a warning
+        warnings.simplefilter("ignore", UserWarning)
+        array = np.array(np.rec.fromrecords(values), dtype=list(field_gdb_dtypes))
+    del values
+    return array
+
+def compare(expected, actual):
+    # Returns the fields that are different, NaN is equal to NaN
+    different = []
+    if expected.dtype != actual.dtype:
+        return ["dtype"]
+    for field in expected.dtype.names:
+        if expected.dtype[field].kind == "f":
+            equal = np.array_equal(expected[field], actual[field], equal_nan=True)
+        else:
+            equal = np.array_equal(expected[field], actual[field])
+        if not equal:
+            different.append(field)
+        del field, equal
+    return different
+
+def combined_names_frames(rows=200, seed=2024):
+    # Species and CommonName with Nulls and empty names, as text columns (as
+    # they were read before) and as the categorical columns used by
+    # sample_locations_ingest.transform_frame
+    rng = np.random.default_rng(seed)
+
+    species = np.array([f"Species {i % 5}" for i in range(rows)], dtype=object)
+    species[rng.random(rows) < 0.2] = np.nan
+    common = np.array([f"Common {i % 3}" for i in range(rows)], dtype=object)
+    common[rng.random(rows) < 0.2] = np.nan
+    # A Null Species with and without a CommonName, and an empty Species
+    species[:4] = [np.nan, np.nan, "", ""]
+    common[:4]  = ["Common 0", np.nan, "Common 1", np.nan]
+
+    text = pd.DataFrame({"Species" : pd.Series(species, dtype=object), "CommonName" : pd.Series(common, dtype=object)})
+    text["CommonName"] = text["CommonName"].fillna("").astype("unicode")
+
+    typed = pd.DataFrame({"Species" : pd.Series(species, dtype="category"), "CommonName" : pd.Series(common, dtype="category")})
+    typed["CommonName"] = typed["CommonName"].cat.add_categories("").fillna("")
+
+    del rng, species, common
+
+    return text, typed
+
+def main(csv_data_folder=""):
+    try:
+        import dataframe_array
+        importlib.reload(dataframe_array)
+
+        import sample_locations_ingest
+        importlib.reload(sample_locations_ingest)
+
+        if csv_data_folder and os.path.isdir(csv_data_folder):
+            import dismap_schema
+            schemas = {table : list(dismap_schema.field_gdb_dtypes(csv_data_folder, table)) for table in dismap_schema.table_definitions(csv_data_folder)}
+            print(f"Tables from: {csv_data_folder}\n")
+            del dismap_schema
+        else:
+            schemas = SCHEMAS
+
+        failed = 0
+
+        for table, field_gdb_dtypes in schemas.items():
+            for typed in [False, True]:
+                df = synthetic_frame(field_gdb_dtypes, typed=typed)
+
+                expected = reference_array(df, field_gdb_dtypes)
+                actual   = dataframe_array.dataframe_to_array(df, field_gdb_dtypes)
+
+                different = compare(expected, actual)
+
+                print(f"{table:<16} {'typed' if typed else 'text':<6} {len(df)} rows: {'OK' if not different else 'different fields: ' + ', '.join(different)}")
+
+                failed += 1 if different else 0
+
+                del typed, df, expected, actual, different
+
+            del table, field_gdb_dtypes
+
+        # SpeciesCommonName and CommonNameSpecies from the categorical
+        # columns, compared with the text columns used before
+        text, typed = combined_names_frames()
+
+        for field, pattern in [("SpeciesCommonName", "{species} ({common})"), ("CommonNameSpecies", "{common} ({species})")]:
+            if field == "SpeciesCommonName":
+                values = np.where(text["CommonName"] != "", text["Species"] + ' (' + text["CommonName"] + ')', "")
+            else:
+                values = np.where(text["CommonName"] != "", text["CommonName"] + ' (' + text["Species"] + ')', "")
+
+            expected = reference_array(pd.DataFrame({field : values}), [(field, "U90")])
+            actual   = dataframe_array.dataframe_to_array(pd.DataFrame({field : sample_locations_ingest.combined_names(typed["Species"], typed["CommonName"], pattern)}), [(field, "U90")])
+
+            different = compare(expected, actual)
+
+            print(f"{field:<23} {len(text)} rows: {'OK' if not different else 'different values'}")
+
+            failed += 1 if different else 0
+
+            del field, pattern, values, expected, actual, different
+
+        del text, typed
+
+        print(f"\n{'All tables match' if not failed else f'{failed} checks failed'}")
+
+        del dataframe_array, sample_locations_ingest, schemas
+
+        if failed:
+            raise SystemExit(1)
+
+        del failed
+
+    except SystemExit:
+        raise
+    except:
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == '__main__':
+    try:
+        print(f"{'-' * 90}")
+        print(f"Python Script:  {os.path.basename(__file__)}")
+        print(f"Location:       {os.path.dirname(__file__)}")
+        print(f"Python Version: {sys.version} Environment: {os.path.basename(sys.exec_prefix)}")
+        print(f"{'-' * 90}\n")
+
+        # The CSV Data folder of a project, e.g.
+        # ...\DisMAP\July 1 2024\CSV Data
+        main(sys.argv[1] if len(sys.argv) > 1 else "")
+
+    except SystemExit:
+        raise
+    except:
+        traceback.print_exc()
+        sys.exit(1)
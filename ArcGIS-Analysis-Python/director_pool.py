@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+#-------------------------------------------------------------------------------
+# Name:        director_pool
+# Purpose:     One multiprocessing Pool kept open for all of the directors run
+#              by _director.main
+#
+# Author:      john.f.kennedy
+#
+# Created:     10/18/2026
+# Copyright:   (c) john.f.kennedy 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+# The directors reload director_runner with importlib.reload, which would
+# lose a Pool kept in director_runner, so the Pool is kept in this module and
+# this module should be imported, not reloaded. Without start(), each
+# director_runner.run_workers call creates and closes its own Pool. This
+# module does not use arcpy.
+import os, sys
+import multiprocessing
+
+# The Pool, when start() has been called
+_POOL = None
+
+def processes():
+    # Get CPU count and then take 2 away for other process
+    return max(multiprocessing.cpu_count() - 2, 1)
+
+def start():
+    # Creates the Pool that is used by every director_runner.run_workers call
+    # until close() is called
+    global _POOL
+
+    if _POOL is None:
+        #Set multiprocessing exe in case we're running as an embedded process, i.e ArcGIS
+        multiprocessing.set_executable(os.path.join(sys.exec_prefix, 'pythonw.exe'))
+        #Let each worker process only handle 10 tasks before being restarted (in case of nasty memory leaks)
+        _POOL = multiprocessing.Pool(processes=processes(), maxtasksperchild=10)
+
+    return _POOL
+
+def pool():
+    # The Pool, or None when start() has not been called
+    return _POOL
+
+def close():
+    # Waits for the tasks to complete and closes the processes
+    global _POOL
+
+    if _POOL is not None:
+        _POOL.close()
+        _POOL.join()
+        _POOL = None
+
+def terminate():
+    global _POOL
+
+    if _POOL is not None:
+        _POOL.terminate()
+        _POOL.join()
+        _POOL = None
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+#-------------------------------------------------------------------------------
+# Name:        director_runner
+# Purpose:     Runs a worker for each region, or for each task of a region,
+#              one after the other or in a multiprocessing Pool, and hands
+#              each region's results to the director as soon as that
+#              region's workers finish
+#
+# Author:      john.f.kennedy
+#
+# Created:     10/18/2026
+# Copyright:   (c) john.f.kennedy 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+import os, sys # built-ins first
+import traceback
+import importlib
+import inspect
+
+import arcpy # third-parties second
+
+sys.path.append(os.path.dirname(__file__))
+
+# Kept open across the directors by _director.main, not reloaded
+import director_pool
+
+def line_info(msg):
+    f = inspect.currentframe()
+    i = inspect.getframeinfo(f.f_back)
+    return f"Script: {os.path.basename(i.filename)}\n\tNear Line: {i.lineno}\n\tFunction: {i.function}\n\tMessage: {msg}"
+
+def worker_results_list(worker_results):
+    # The checks the directors made on the value returned by a worker. A
+    # worker returns a path, a list of paths or a list of lists of paths.
+    if type(worker_results).__name__ == "str" and len(worker_results) != 0:
+        return [worker_results]
+    elif type(worker_results).__name__ == "str" and len(worker_results) == 0:
+        raise SystemExit(f"worker_results is str, but empty!!")
+    elif type(worker_results).__name__ == "list" and len(worker_results) != 0:
+        if type(worker_results[0]).__name__ == "list":
+            worker_results = [r for rt in worker_results for r in rt]
+        return list(worker_results)
+    elif type(worker_results).__name__ == "list" and len(worker_results) == 0:
+        raise SystemExit(f"worker_results is list, but empty!!")
+    else:
+        return []
+
+def csv_row_count(csv_file=""):
+    # Number of lines in a CSV file, counted in blocks without parsing
+    if not os.path.isfile(csv_file):
+        return 0
+    n_rows = 0
+    with open(csv_file, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            n_rows += block.count(b"\n")
+            del block
+    del f
+    return n_rows
+
+def region_costs(project_gdb="", table_names=[]):
+    # An estimate of the work for each region, used to start the largest
+    # regions first: the rows in the region's CSV file, plus the species-years
+    # in the LayerSpeciesYearImageName table times the cells in the Fishnet.
+    # A dataset that does not exist yet counts as zero (one for the product).
+    csv_data_folder = rf"{os.path.dirname(project_gdb)}\CSV Data"
+
+    def count(dataset):
+        return int(arcpy.management.GetCount(dataset)[0]) if arcpy.Exists(dataset) else 0
+
+    costs = {}
+    for table_name in table_names:
+        csv_rows      = csv_row_count(rf"{csv_data_folder}\{table_name}.csv")
+        species_years = count(rf"{project_gdb}\{table_name}_LayerSpeciesYearImageName")
+        fishnet_cells = count(rf"{project_gdb}\{table_name}_Fishnet")
+        costs[table_name] = csv_rows + max(species_years, 1) * max(fishnet_cells, 1)
+        del table_name, csv_rows, species_years, fishnet_cells
+
+    del csv_data_folder, count
+
+    return costs
+
+def run_worker(job):
+    # Runs in the Pool process. The exception is returned as text, a
+    # SystemExit raised by a worker would otherwise end the Pool process and
+    # the result would never arrive.
+    from time import perf_counter
+
+    worker, table_name, region_gdb, task = job
+
+    start = perf_counter()
+    try:
+        worker_results, error = worker(region_gdb=region_gdb, **task), ""
+    except BaseException:
+        worker_results, error = None, traceback.format_exc()
+
+    return table_name, worker_results, perf_counter() - start, error
+
+def run_workers(worker, table_names=[], scratch_folder="", Sequential=True, post_process=None, tasks=None, merge=None):
+    # Runs worker(region_gdb=rf"{scratch_folder}\{table_name}.gdb") for each
+    # table name and returns the results of all of the workers as one list.
+    #   post_process: called with the table name and the list of results of a
+    #                 region as soon as its workers finish, e.g. to copy the
+    #                 region's datasets to the project GDB while the other
+    #                 workers are still running
+    #   tasks:        called with the region GDB, returns a list of keyword
+    #                 arguments for the worker (e.g. [{"years" : [2019]}, ...])
+    #                 so a region is split into tasks that are scheduled on
+    #                 the same Pool as the other regions' tasks, and a large
+    #                 region is not left running on one core. An empty list
+    #                 runs the worker once for the whole region.
+    #   merge:        called with the region GDB and the list of results of
+    #                 each of the region's tasks once they have all finished,
+    #                 returns the results of the region. Without merge, or
+    #                 when the region was not split, the results of the
+    #                 tasks are joined.
+    # In a Pool, the tasks are collected in the order they finish, so a
+    # fast region is not held up by a slow one. A region that fails does not
+    # stop the other regions; a SystemExit listing the failed regions is
+    # raised once all of the regions have finished.
+    import dismap
+    importlib.reload(dismap)
+
+    results, failed = [], []
+
+    jobs, pending, task_results, split = [], {}, {}, []
+    for table_name in table_names:
+        region_gdb = rf"{scratch_folder}\{table_name}.gdb"
+        region_tasks = tasks(region_gdb) if tasks else []
+        if region_tasks:
+            split.append(table_name)
+        region_tasks = region_tasks or [{}]
+        jobs.extend([worker, table_name, region_gdb, task] for task in region_tasks)
+        pending[table_name], task_results[table_name] = len(region_tasks), []
+        if len(region_tasks) > 1:
+            arcpy.AddMessage(f"{table_name} is split into {len(region_tasks)} tasks")
+        del table_name, region_gdb, region_tasks
+
+    # The largest regions are started first, so a large region is not left
+    # running at the end while the other processes are idle. A region split
+    # into tasks shares its cost between them.
+    project_gdb = rf"{os.path.dirname(scratch_folder)}\{os.path.basename(os.path.dirname(scratch_folder))}.gdb"
+    costs = region_costs(project_gdb, table_names) if not Sequential and len(jobs) > 1 else {}
+    if costs:
+        jobs.sort(key=lambda job: costs[job[1]] / pending[job[1]], reverse=True)
+        arcpy.AddMessage("Region order: " + ", ".join(f"{table_name} ({costs[table_name]:,d})" for table_name in sorted(costs, key=costs.get, reverse=True)))
+    del project_gdb, costs
+
+    def collect(table_name, worker_results, seconds, error):
+        pending[table_name] -= 1
+        if error:
+            arcpy.AddError(f"Process {table_name} failed after {dismap.convertSeconds(seconds)}\n{error}")
+            if table_name not in failed:
+                failed.append(table_name)
+            return
+        if table_name in failed:
+            return
+        task_results[table_name].append(worker_results)
+        if pending[table_name]:
+            arcpy.AddMessage(f"Task for {table_name} has finished, {pending[table_name]} remaining. Elapsed Time {dismap.convertSeconds(seconds)} (H:M:S)")
+            return
+        arcpy.AddMessage(f"Process {table_name} has finished. Elapsed Time {dismap.convertSeconds(seconds)} (H:M:S)")
+        if merge and table_name in split:
+            worker_results = worker_results_list(merge(rf"{scratch_folder}\{table_name}.gdb", task_results.pop(table_name)))
+        else:
+            worker_results = [r for rt in task_results.pop(table_name) for r in worker_results_list(rt)]
+            worker_results = list(dict.fromkeys(worker_results))
+        if post_process:
+            post_process(table_name, worker_results)
+        results.extend(worker_results)
+
+    # Sequential Processing
+    if Sequential:
+        arcpy.AddMessage(f"Sequential Processing")
+        for job in jobs:
+            arcpy.AddMessage(f"Processing: {job[1]}")
+            table_name, worker_results, seconds, error = run_worker(job)
+            if error:
+                raise SystemExit(error)
+            collect(table_name, worker_results, seconds, error)
+            del job, table_name, worker_results, seconds, error
+
+    # Non-Sequential Processing
+    if not Sequential and jobs:
+        arcpy.AddMessage(f"Non-Sequential Processing")
+
+        import multiprocessing
+
+        arcpy.env.autoCancelling = True
+
+        sys.path.append(sys.exec_prefix)
+
+        for table_name in table_names:
+            arcpy.AddMessage(f"Processing: {table_name}")
+            del table_name
+
+        # The Pool started by _director.main is used when there is one, and
+        # is left open for the next director
+        pool = director_pool.pool()
+        persistent = pool is not None
+
+        if not persistent:
+            arcpy.AddMessage(f"Start multiprocessing using the ArcGIS Pro pythonw.exe.")
+            #Set multiprocessing exe in case we're running as an embedded process, i.e ArcGIS
+            #get_install_path() uses a registry query to figure out 64bit python exe if available
+            multiprocessing.set_executable(os.path.join(sys.exec_prefix, 'pythonw.exe'))
+
+            # Get CPU count and then take 2 away for other process
+            _processes = director_pool.processes()
+            _processes = _processes if len(jobs) >= _processes else len(jobs)
+            arcpy.AddMessage(f"Creating the multiprocessing Pool with {_processes} processes")
+            #Let each worker process only handle 10 tasks before being restarted (in case of nasty memory leaks)
+            pool = multiprocessing.Pool(processes=_processes, maxtasksperchild=10)
+            del _processes
+        else:
+            arcpy.AddMessage(f"Using the open multiprocessing Pool")
+
+        # imap_unordered hands the next job to the first process that is
+        # free and returns each job as soon as it has finished, there is no
+        # polling
+        try:
+            for table_name, worker_results, seconds, error in pool.imap_unordered(run_worker, jobs, chunksize=1):
+                collect(table_name, worker_results, seconds, error)
+                del table_name, worker_results, seconds, error
+        except:
+            # e.g. a SystemExit raised by post_process
+            if persistent:
+                director_pool.terminate()
+            else:
+                pool.terminate()
+            raise
+
+        if not persistent:
+            arcpy.AddMessage(f"\tClose the process pool")
+            # close the process pool
+            pool.close()
+            # wait for all tasks to complete and processes to close
+            arcpy.AddMessage(f"\tWait for all tasks to complete and processes to close")
+            pool.join()
+
+        del pool, persistent, multiprocessing
+
+        arcpy.AddMessage(f"\tDone with multiprocessing Pool")
+
+    if failed:
+        raise SystemExit(line_info(f"The worker failed for: {', '.join(failed)}"))
+
+    del jobs, pending, task_results, split, failed, collect, dismap
+
+    return results
@@ -18,6 +18,10 @@ import arcpy  # third-parties second
 
 sys.path.append(os.path.dirname(__file__))
 
+# Not reloaded with dismap, so the JSON files in the CSV Data folder stay
+# cached for the life of the process
+import dismap_schema
+
 def line_info(msg):
     f = inspect.currentframe()
     i = inspect.getframeinfo(f.f_back)
@@ -32,10 +36,6 @@ def add_fields(csv_data_folder="", in_table=""):
         table       = os.path.basename(in_table)
         project_gdb = os.path.dirname(in_table)
 
-        field_definitions = dismap.field_definitions(csv_data_folder, "")
-        table_definitions = dismap.table_definitions(csv_data_folder, "")
-        del csv_data_folder
-
         # set workspace environment
         arcpy.env.overwriteOutput          = True
         arcpy.env.parallelProcessingFactor = "100%"
@@ -54,19 +54,9 @@ def add_fields(csv_data_folder="", in_table=""):
         else:
             table = table
 
-        fields = table_definitions[table]
-        del table_definitions
-
-        field_definition_list = []
-        for field in fields:
-            field_definition_list.append([
-                                          field_definitions[field]["field_name"],
-                                          field_definitions[field]["field_type"],
-                                          field_definitions[field]["field_alias"],
-                                          field_definitions[field]["field_length"],
-                                        ])
-            del field
-        del field_definitions
+        # [name, type, alias, length] for each field, built once per process
+        field_definition_list = [list(d) for d in dismap_schema.field_descriptions(csv_data_folder, table)]
+        del csv_data_folder
 
         arcpy.AddMessage(f"Adding Fields to Table: {table}")
         # arcpy.AddMessage(in_table)
@@ -74,7 +64,7 @@ def add_fields(csv_data_folder="", in_table=""):
         arcpy.management.AddFields(in_table=in_table, field_description=field_definition_list, template="")
         arcpy.AddMessage("\t{0}\n".format(arcpy.GetMessages().replace("\n", "\n\t")))
 
-        del fields, field_definition_list
+        del field_definition_list
         del project_gdb, table
 
         # Imports
@@ -116,7 +106,8 @@ def alter_fields(csv_data_folder="", in_table=""):
         project_gdb = os.path.dirname(in_table)
         del in_table
 
-        field_definitions = dismap.field_definitions(csv_data_folder, "")
+        # Read-only, not copied
+        field_definitions = dismap_schema.field_definitions(csv_data_folder, "")
         del csv_data_folder
 
         arcpy.env.workspace = project_gdb
@@ -601,7 +592,10 @@ def convertSeconds(seconds):
     except:
         traceback.print_exc()
 
-def calculate_core_species(table):
+def calculate_core_species(table, other_tables=[]):
+    # Sets CoreSpecies in table, and in other_tables (e.g. the Sample
+    # Locations feature class made from the same rows), from the Species,
+    # Year and WTCPUE values of table
     try:
 
         region_gdb = os.path.dirname(table)
@@ -619,71 +613,84 @@ def calculate_core_species(table):
 
         del region_gdb
 
-        # def unique_years(table):
-        #    with arcpy.da.SearchCursor(table, ["Year"]) as cursor:
-        #        return sorted({row[0] for row in cursor})
-
-        def unique_values(table, field):
-            with arcpy.da.SearchCursor(table, [field]) as cursor:
-                return sorted({row[0] for row in cursor})  # Uses list comprehension
-
-        # Get  unique list of years from the table
-        all_years = unique_values(table, "Year")
-
-        PrintListOfYears = False
-        if PrintListOfYears:
-            # Print list of years
-            arcpy.AddMessage(f"--> Years: {', '.join([str(y) for y in all_years])}")
-
-            # Get minimum year (first year) and maximum year (last year)
-            min_year, max_year = min(all_years), max(all_years)
-
-            # Print min year
-            arcpy.AddMessage(f"--> Min Year: {min_year} and Max Year: {max_year}")
+        import core_species
+        importlib.reload(core_species)
 
-            del min_year, max_year
+        import numpy as np
 
-        del PrintListOfYears
+        # Read Species, Year and WTCPUE once, as columns, instead of
+        # selecting the rows for each species. A Null Species is "", a Null
+        # Year is "" or -1 (Year is a text field in the tables made from the
+        # CSV files) and a Null WTCPUE is NaN (not a catch).
+        arcpy.AddMessage(f"\t Reading the Species, Year and WTCPUE values from {os.path.basename(table)}")
+        year_null = "" if [f.type for f in arcpy.ListFields(table, "Year")] == ["String"] else -1
+        columns = arcpy.da.TableToNumPyArray(table, ["Species", "Year", "WTCPUE"], null_value={"Species" : "", "Year" : year_null, "WTCPUE" : np.nan})
 
-        arcpy.AddMessage(f"\t Creating {os.path.basename(table)} Table View")
+        core = core_species.core_species(columns["Species"], columns["Year"], columns["WTCPUE"])
+        del columns, year_null, np
 
-        species_table_view = arcpy.management.MakeTableView(table, f"{os.path.basename(table)} Table View")
-
-        unique_species = unique_values(species_table_view, "Species")
-
-        for unique_specie in unique_species:
+        for unique_specie in sorted(core, key=str):
             arcpy.AddMessage(f"\t\t Unique Species: {unique_specie}")
-
-            # Replace a layer/table view name with a path to a dataset (which can be a layer file) or create the layer/table view within the script
-            # The following inputs are layers or table views: "ai_csv"
-            arcpy.management.SelectLayerByAttribute(in_layer_or_view=species_table_view, selection_type="NEW_SELECTION", where_clause=f"Species = '{unique_specie}' AND WTCPUE > 0.0")
-
-            all_specie_years = unique_values(species_table_view, "Year")
-
-            # arcpy.AddMessage(f"\t\t\t Years: {', '.join([str(y) for y in all_specie_years])}")
-
-            # arcpy.AddMessage(f"\t\t Select Species ({unique_specie}) by attribute")
-
-            arcpy.management.SelectLayerByAttribute(in_layer_or_view=species_table_view, selection_type="NEW_SELECTION", where_clause=f"Species = '{unique_specie}'")
-
-            # arcpy.AddMessage(f"\t Set CoreSpecies to Yes or No")
-
-            if all_years == all_specie_years:
+            if core[unique_specie]:
                 arcpy.AddMessage(f"\t\t\t {unique_specie} is a Core Species")
-                arcpy.management.CalculateField(in_table=species_table_view, field="CoreSpecies", expression="'Yes'", expression_type="PYTHON", code_block="")
             else:
                 arcpy.AddMessage(f"\t\t\t @@@@ {unique_specie} is not a Core Species @@@@")
-                arcpy.management.CalculateField(in_table=species_table_view, field="CoreSpecies", expression="'No'", expression_type="PYTHON", code_block="")
+            del unique_specie
+
+        # Set CoreSpecies to Yes or No in one pass for each table
+        for update_table in [table] + [t for t in other_tables if t]:
+            with arcpy.da.UpdateCursor(update_table, ["Species", "CoreSpecies"]) as cursor:
+                for row in cursor:
+                    core_specie = "Yes" if core.get("" if row[0] is None else row[0], False) else "No"
+                    if row[1] != core_specie:
+                        cursor.updateRow([row[0], core_specie])
+                    del row, core_specie
+                del cursor
+            del update_table
+
+        del core, core_species
+        del table, other_tables
 
-            arcpy.management.SelectLayerByAttribute(species_table_view, "CLEAR_SELECTION")
-            del unique_specie, all_specie_years
+        results = True
 
-        arcpy.management.Delete(f"{os.path.basename(table)} Table View")
-        del species_table_view, unique_species, all_years
-        del unique_values
-        del table
+    except KeyboardInterrupt:
+        raise Exception
+    except arcpy.ExecuteWarning:
+        raise Exception(arcpy.GetMessages())
+    except arcpy.ExecuteError:
+        raise Exception(arcpy.GetMessages())
+    except Exception as e:
+        raise Exception(e)
+    except:
+        traceback.print_exc()
+        raise Exception
+    else:
+        try:
+            leave_out_keys = ["leave_out_keys", "results"]
+            remaining_keys = [key for key in locals().keys() if not key.startswith('__') and key not in leave_out_keys]
+            if remaining_keys:
+                arcpy.AddWarning(f"Remaining Keys in '{inspect.stack()[0][3]}': ##--> '{', '.join(remaining_keys)}' <--## Line Number: {traceback.extract_stack()[-1].lineno}")
+            del leave_out_keys, remaining_keys
+            return results if "results" in locals().keys() else ["NOTE!! The 'results' variable not yet set!!"]
+        except:
+            raise Exception(traceback.print_exc())
+    finally:
+        if "results" in locals().keys(): del results
 
-        results = True
+def dataframe_to_array(df, field_gdb_dtypes=[]):
+    # Returns the DataFrame as a NumPy structured array with the dtypes from
+    # dTypesGDB, filled one column at a time (see dataframe_array, which is
+    # checked against np.rec.fromrecords(df.values) by dataframe_array_test)
+    try:
+        import dataframe_array
+        importlib.reload(dataframe_array)
+
+        results = dataframe_array.dataframe_to_array(df, field_gdb_dtypes)
+
+        # Imports
+        del dataframe_array
+        # Function parameters
+        del df, field_gdb_dtypes
 
     except KeyboardInterrupt:
         raise Exception
@@ -710,6 +717,55 @@ def calculate_core_species(table):
         if "results" in locals().keys(): del results
 
 def dataset_title_dict(project_gdb=""):
+    try:
+        # Test if passed workspace exists, if not raise Exception
+        if not arcpy.Exists(project_gdb):
+            raise Exception(line_info(f"{os.path.basename(project_gdb)} is missing!!"))
+
+        # The titles are built once per project GDB and kept until the rows in
+        # the Datasets table change (see dismap_schema.dataset_titles)
+        fields = ["DatasetCode", "PointFeatureType", "DistributionProjectCode", "Region", "Season"]
+        stamp  = tuple(sorted((tuple(row) for row in arcpy.da.SearchCursor(rf"{project_gdb}\Datasets", fields)), key=str))
+        del fields
+
+        results = dismap_schema.thaw(dismap_schema.dataset_titles(project_gdb, stamp, build_dataset_title_dict))
+        del stamp
+
+        del project_gdb
+
+    except KeyboardInterrupt:
+        raise SystemExit
+    except arcpy.ExecuteWarning:
+        traceback.print_exc()
+        arcpy.AddWarning(arcpy.GetMessages())
+        raise SystemExit
+    except arcpy.ExecuteError:
+        traceback.print_exc()
+        arcpy.AddError(arcpy.GetMessages())
+        raise SystemExit
+    except SystemExit:
+        traceback.print_exc()
+        raise SystemExit
+    except Exception:
+        traceback.print_exc()
+        raise SystemExit
+    except:
+        traceback.print_exc()
+        raise SystemExit
+    else:
+        try:
+            leave_out_keys = ["leave_out_keys", "results"]
+            remaining_keys = [key for key in locals().keys() if not key.startswith('__') and key not in leave_out_keys]
+            if remaining_keys:
+                arcpy.AddWarning(f"Remaining Keys in '{inspect.stack()[0][3]}': ##--> '{', '.join(remaining_keys)}' <--## Line Number: {traceback.extract_stack()[-1].lineno}")
+            del leave_out_keys, remaining_keys
+            return results if "results" in locals().keys() else ["NOTE!! The 'results' variable not yet set!!"]
+        except:
+            raise Exception(traceback.print_exc())
+    finally:
+        if "results" in locals().keys(): del results
+
+def build_dataset_title_dict(project_gdb=""):
     try:
         # Test if passed workspace exists, if not raise Exception
         if not arcpy.Exists(project_gdb):
@@ -720,6 +776,9 @@ def dataset_title_dict(project_gdb=""):
         else:
             project = os.path.basename(os.path.dirname(project_gdb))
 
+        # The date code is the same for every title in the project
+        project_date_code = date_code(project)
+
         project_folder     = os.path.dirname(project_gdb)
         crf_folder         = rf"{project_folder}\CRFs"
         _credits           = "These data were produced by NMFS OST."
@@ -744,8 +803,8 @@ def dataset_title_dict(project_gdb=""):
 
                     #table_name            = f"{dataset_code}_{distribution_project_code}_TABLE"
                     table_name            = f"{dataset_code}_{distribution_project_code}"
-                    table_name_s          = f"{table_name}_{date_code(project)}"
-                    table_name_st         = f"{region} {season} Table {date_code(project)}".replace('  ',' ')
+                    table_name_s          = f"{table_name}_{project_date_code}"
+                    table_name_st         = f"{region} {season} Table {project_date_code}".replace('  ',' ')
 
                     #arcpy.AddMessage(f"\tProcessing: {table_name}")
 
@@ -761,8 +820,8 @@ def dataset_title_dict(project_gdb=""):
 
                     table_name            = f"{dataset_code}_{distribution_project_code}"
                     sample_locations_fc   = f"{table_name}_{point_feature_type.replace(' ', '_')}"
-                    sample_locations_fcs  = f"{table_name}_{point_feature_type.replace(' ', '_')}_{date_code(project)}"
-                    feature_service_title = f"{region} {season} {point_feature_type} {date_code(project)}"
+                    sample_locations_fcs  = f"{table_name}_{point_feature_type.replace(' ', '_')}_{project_date_code}"
+                    feature_service_title = f"{region} {season} {point_feature_type} {project_date_code}"
                     sample_locations_fcst = f"{feature_service_title.replace('  ',' ')}"
                     del feature_service_title
 
@@ -784,8 +843,8 @@ def dataset_title_dict(project_gdb=""):
 
                     #table_name            = f"{dataset_code}_TABLE"
                     table_name            = f"{dataset_code}"
-                    table_name_s          = f"{table_name}_{date_code(project)}"
-                    table_name_st         = f"{region} {season} Table {date_code(project)}".replace('  ',' ')
+                    table_name_s          = f"{table_name}_{project_date_code}"
+                    table_name_st         = f"{region} {season} Table {project_date_code}".replace('  ',' ')
 
                     #arcpy.AddMessage(f"\tProcessing: {table_name}")
 
@@ -801,9 +860,9 @@ def dataset_title_dict(project_gdb=""):
 
                     table_name            = f"{dataset_code}"
                     grid_points_fc        = f"{table_name}_{point_feature_type.replace(' ', '_')}"
-                    grid_points_fcs       = f"{table_name}_{point_feature_type.replace(' ', '_')}_{date_code(project)}"
-                    feature_service_title = f"{region} {season} Sample Locations {date_code(project)}"
-                    grid_points_fcst      = f"{dataset_code.replace('_', ' ')} {point_feature_type} {date_code(project)}"
+                    grid_points_fcs       = f"{table_name}_{point_feature_type.replace(' ', '_')}_{project_date_code}"
+                    feature_service_title = f"{region} {season} Sample Locations {project_date_code}"
+                    grid_points_fcst      = f"{dataset_code.replace('_', ' ')} {point_feature_type} {project_date_code}"
 
                     datasets_dict[grid_points_fc] = {"Dataset Service"       : grid_points_fcs,
                                                      "Dataset Service Title" : grid_points_fcst,
@@ -823,8 +882,8 @@ def dataset_title_dict(project_gdb=""):
 
                 # Bathymetry
                 bathymetry_r          = f"{dataset_code}_Bathymetry"
-                bathymetry_rs         = f"{dataset_code}_Bathymetry_{date_code(project)}"
-                feature_service_title = f"{region} {season} Bathymetry {date_code(project)}"
+                bathymetry_rs         = f"{dataset_code}_Bathymetry_{project_date_code}"
+                feature_service_title = f"{region} {season} Bathymetry {project_date_code}"
                 bathymetry_rst        = f"{feature_service_title.replace('  ',' ')}"
                 del feature_service_title
 
@@ -846,8 +905,8 @@ def dataset_title_dict(project_gdb=""):
 
                 # Boundary
                 boundary_fc           = f"{dataset_code}_Boundary"
-                boundary_fcs          = f"{dataset_code}_Boundary_{date_code(project)}"
-                feature_service_title = f"{region} {season} Boundary {date_code(project)}"
+                boundary_fcs          = f"{dataset_code}_Boundary_{project_date_code}"
+                feature_service_title = f"{region} {season} Boundary {project_date_code}"
                 boundary_fcst         = f"{feature_service_title.replace('  ',' ')}"
                 del feature_service_title
 
@@ -869,8 +928,8 @@ def dataset_title_dict(project_gdb=""):
 
                 # CRF
                 crf_r                 = f"{dataset_code}_CRF"
-                crf_rs                = f"{dataset_code}_{date_code(project)}"
-                feature_service_title = f"{region} {season} {dataset_code[dataset_code.rfind('_')+1:]} {date_code(project)}"
+                crf_rs                = f"{dataset_code}_{project_date_code}"
+                feature_service_title = f"{region} {season} {dataset_code[dataset_code.rfind('_')+1:]} {project_date_code}"
                 crf_rst               = f"{feature_service_title.replace('  ',' ')}"
                 #del feature_service_title
 
@@ -895,8 +954,8 @@ def dataset_title_dict(project_gdb=""):
 
                 # Extent Points
                 extent_points_fc      = f"{dataset_code}_Extent_Points"
-                extent_points_fcs     = f"{dataset_code}_Extent_Points_{date_code(project)}"
-                feature_service_title = f"{region} {season} Extent Points {date_code(project)}"
+                extent_points_fcs     = f"{dataset_code}_Extent_Points_{project_date_code}"
+                feature_service_title = f"{region} {season} Extent Points {project_date_code}"
                 extent_points_fcst    = f"{feature_service_title.replace('  ',' ')}"
                 del feature_service_title
 
@@ -917,8 +976,8 @@ def dataset_title_dict(project_gdb=""):
                 del extent_points_fc, extent_points_fcs, extent_points_fcst
 
                 fishnet_fc            = f"{dataset_code}_Fishnet"
-                fishnet_fcs           = f"{dataset_code}_Fishnet_{date_code(project)}"
-                feature_service_title = f"{region} {season} Fishnet {date_code(project)}"
+                fishnet_fcs           = f"{dataset_code}_Fishnet_{project_date_code}"
+                feature_service_title = f"{region} {season} Fishnet {project_date_code}"
                 fishnet_fcst          = f"{feature_service_title.replace('  ',' ')}"
                 del feature_service_title
 
@@ -939,8 +998,8 @@ def dataset_title_dict(project_gdb=""):
                 del fishnet_fc, fishnet_fcs, fishnet_fcst
 
                 indicators_tb         = f"{dataset_code}_Indicators"
-                indicators_tbs        = f"{dataset_code}_Indicators_{date_code(project)}"
-                feature_service_title = f"{region} {season} Indicators Table {date_code(project)}"
+                indicators_tbs        = f"{dataset_code}_Indicators_{project_date_code}"
+                feature_service_title = f"{region} {season} Indicators Table {project_date_code}"
                 indicators_tbst       = f"{feature_service_title.replace('  ',' ')}"
                 del feature_service_title
 
@@ -961,8 +1020,8 @@ def dataset_title_dict(project_gdb=""):
                 del indicators_tb, indicators_tbs, indicators_tbst
 
                 lat_long_fc           = f"{dataset_code}_Lat_Long"
-                lat_long_fcs          = f"{dataset_code}_Lat_Long_{date_code(project)}"
-                feature_service_title = f"{region} {season} Lat Long {date_code(project)}"
+                lat_long_fcs          = f"{dataset_code}_Lat_Long_{project_date_code}"
+                feature_service_title = f"{region} {season} Lat Long {project_date_code}"
                 lat_long_fcst         = f"{feature_service_title.replace('  ',' ')}"
                 del feature_service_title
 
@@ -983,8 +1042,8 @@ def dataset_title_dict(project_gdb=""):
                 del lat_long_fc, lat_long_fcs, lat_long_fcst
 
                 latitude_r            = f"{dataset_code}_Latitude"
-                latitude_rs           = f"{dataset_code}_Latitude_{date_code(project)}"
-                feature_service_title = f"{region} {season} Latitude {date_code(project)}"
+                latitude_rs           = f"{dataset_code}_Latitude_{project_date_code}"
+                feature_service_title = f"{region} {season} Latitude {project_date_code}"
                 latitude_rst          = f"{feature_service_title.replace('  ',' ')}"
                 del feature_service_title
 
@@ -1005,8 +1064,8 @@ def dataset_title_dict(project_gdb=""):
                 del latitude_r, latitude_rs, latitude_rst
 
                 layer_species_year_image_name_tb   = f"{dataset_code}_LayerSpeciesYearImageName"
-                layer_species_year_image_name_tbs  = f"{dataset_code}_LayerSpeciesYearImageName_{date_code(project)}"
-                feature_service_title             = f"{region} {season} Layer Species Year Image Name Table {date_code(project)}"
+                layer_species_year_image_name_tbs  = f"{dataset_code}_LayerSpeciesYearImageName_{project_date_code}"
+                feature_service_title             = f"{region} {season} Layer Species Year Image Name Table {project_date_code}"
                 layer_species_year_image_name_tbst = f"{feature_service_title.replace('  ',' ')}"
                 del feature_service_title
 
@@ -1027,8 +1086,8 @@ def dataset_title_dict(project_gdb=""):
                 del layer_species_year_image_name_tb, layer_species_year_image_name_tbs, layer_species_year_image_name_tbst
 
                 longitude_r           = f"{dataset_code}_Longitude"
-                longitude_rs          = f"{dataset_code}_Longitude_{date_code(project)}"
-                feature_service_title = f"{region} {season} Longitude {date_code(project)}"
+                longitude_rs          = f"{dataset_code}_Longitude_{project_date_code}"
+                feature_service_title = f"{region} {season} Longitude {project_date_code}"
                 longitude_rst         = f"{feature_service_title.replace('  ',' ')}"
                 del feature_service_title
 
@@ -1049,8 +1108,8 @@ def dataset_title_dict(project_gdb=""):
                 del longitude_r, longitude_rs, longitude_rst
 
                 mosaic_r              = f"{dataset_code}_Mosaic"
-                mosaic_rs             = f"{dataset_code}_Mosaic_{date_code(project)}"
-                feature_service_title = f"{region} {season} {dataset_code[dataset_code.rfind('_')+1:]} Mosaic {date_code(project)}"
+                mosaic_rs             = f"{dataset_code}_Mosaic_{project_date_code}"
+                feature_service_title = f"{region} {season} {dataset_code[dataset_code.rfind('_')+1:]} Mosaic {project_date_code}"
                 mosaic_rst            = f"{feature_service_title.replace('  ',' ')}"
                 del feature_service_title
 
@@ -1072,8 +1131,8 @@ def dataset_title_dict(project_gdb=""):
                 del mosaic_r, mosaic_rs, mosaic_rst
 
                 raster_mask_r         = f"{dataset_code}_Raster_Mask"
-                raster_mask_rs        = f"{dataset_code}_Raster_Mask_{date_code(project)}"
-                feature_service_title = f"{region} {season} Raster Mask {date_code(project)}"
+                raster_mask_rs        = f"{dataset_code}_Raster_Mask_{project_date_code}"
+                feature_service_title = f"{region} {season} Raster Mask {project_date_code}"
                 raster_mask_rst       = f"{feature_service_title.replace('  ',' ')}"
                 del feature_service_title
 
@@ -1094,8 +1153,8 @@ def dataset_title_dict(project_gdb=""):
                 del raster_mask_r, raster_mask_rs, raster_mask_rst
 
                 region_fc             = f"{dataset_code}_Region"
-                region_fcs            = f"{dataset_code}_Region_{date_code(project)}"
-                feature_service_title = f"{region} {season} Region {date_code(project)}"
+                region_fcs            = f"{dataset_code}_Region_{project_date_code}"
+                feature_service_title = f"{region} {season} Region {project_date_code}"
                 region_fcst           = f"{feature_service_title.replace('  ',' ')}"
                 del feature_service_title
 
@@ -1124,8 +1183,8 @@ def dataset_title_dict(project_gdb=""):
                     #arcpy.AddMessage(f"\tProcessing: Datasets")
 
                     datasets_tb   = dataset_code
-                    datasets_tbs  = f"{dataset_code}_{date_code(project)}"
-                    datasets_tbst = f"{dataset_code} {date_code(project)}"
+                    datasets_tbs  = f"{dataset_code}_{project_date_code}"
+                    datasets_tbst = f"{dataset_code} {project_date_code}"
 
                     datasets_dict[datasets_tb] = {"Dataset Service"       : datasets_tbs,
                                                   "Dataset Service Title" : datasets_tbst,
@@ -1142,8 +1201,8 @@ def dataset_title_dict(project_gdb=""):
                     #arcpy.AddMessage(f"\tProcessing: DisMAP_Regions")
 
                     regions_fc   = dataset_code
-                    regions_fcs  = f"{dataset_code}_{date_code(project)}"
-                    regions_fcst = f"DisMAP Regions {date_code(project)}"
+                    regions_fcs  = f"{dataset_code}_{project_date_code}"
+                    regions_fcst = f"DisMAP Regions {project_date_code}"
 
                     datasets_dict[regions_fc] = {"Dataset Service"       : regions_fcs,
                                                  "Dataset Service Title" : regions_fcst,
@@ -1160,8 +1219,8 @@ def dataset_title_dict(project_gdb=""):
                     #arcpy.AddMessage(f"\tProcessing: Indicators")
 
                     indicators_tb   = f"{dataset_code}_Table"
-                    indicators_tbs  = f"{dataset_code}_{date_code(project)}"
-                    indicators_tbst = f"{dataset_code} {date_code(project)}"
+                    indicators_tbs  = f"{dataset_code}_{project_date_code}"
+                    indicators_tbst = f"{dataset_code} {project_date_code}"
 
                     datasets_dict[indicators_tb] = {"Dataset Service"    : indicators_tbs,
                                                    "Dataset Service Title" : indicators_tbst,
@@ -1178,8 +1237,8 @@ def dataset_title_dict(project_gdb=""):
                     #arcpy.AddMessage(f"\tProcessing: LayerSpeciesYearImageName")
 
                     layer_species_year_image_name_tb   = dataset_code
-                    layer_species_year_image_name_tbs  = f"{dataset_code}_{date_code(project)}"
-                    layer_species_year_image_name_tbst = f"Layer Species Year Image Name Table {date_code(project)}"
+                    layer_species_year_image_name_tbs  = f"{dataset_code}_{project_date_code}"
+                    layer_species_year_image_name_tbst = f"Layer Species Year Image Name Table {project_date_code}"
 
                     #arcpy.AddMessage(f"\tProcessing: {layer_species_year_image_name_tb}")
 
@@ -1203,8 +1262,8 @@ def dataset_title_dict(project_gdb=""):
                     #arcpy.AddMessage(f"\tProcessing: Species_Filter")
 
                     species_filter_tb   = dataset_code
-                    species_filter_tbs  = f"{dataset_code}_{date_code(project)}"
-                    species_filter_tbst = f"Layer Species Year Image Name Table {date_code(project)}"
+                    species_filter_tbs  = f"{dataset_code}_{project_date_code}"
+                    species_filter_tbst = f"Layer Species Year Image Name Table {project_date_code}"
 
                     datasets_dict[species_filter_tb] = {"Dataset Service"       : species_filter_tbs,
                                                         "Dataset Service Title" : species_filter_tbst,
@@ -1224,8 +1283,8 @@ def dataset_title_dict(project_gdb=""):
                     #arcpy.AddMessage(f"\tProcessing: {dataset_code}")
 
                     table    = dataset_code
-                    table_s  = f"{dataset_code}_{date_code(project)}"
-                    table_st = f"{table_s.replace('_',' ')} {date_code(project)}"
+                    table_s  = f"{dataset_code}_{project_date_code}"
+                    table_st = f"{table_s.replace('_',' ')} {project_date_code}"
 
                     #arcpy.AddMessage(f"\tProcessing: {table_s}")
 
@@ -1254,7 +1313,7 @@ def dataset_title_dict(project_gdb=""):
 
         del dataset_codes
         del project_folder, crf_folder
-        del project, project_gdb
+        del project, project_date_code, project_gdb
 
         results = datasets_dict
         del datasets_dict
@@ -1343,7 +1402,10 @@ def date_code(version):
     finally:
         if "results" in locals().keys(): del results
 
-def dTypesCSV(csv_data_folder="", table=""):
+def dTypesCSV(csv_data_folder="", table="", typed=True):
+    # The pandas dtypes of the fields of a table, from the field types in
+    # field_definitions.json (see dismap_schema.csv_dtype). With typed=False
+    # every field is "str".
     try:
         import dismap
 
@@ -1371,21 +1433,16 @@ def dTypesCSV(csv_data_folder="", table=""):
         else:
             table = table
 
-        table_definitions = dismap.table_definitions(csv_data_folder, "")
-
-        fields = table_definitions[table.replace(".csv", "")]
-
-        field_csv_dtypes = {k.replace(" ", "_") : "str" for k in table_definitions[table.replace(".csv", "")]}
+        # Built once per process (see dismap_schema)
+        field_csv_dtypes = dismap_schema.field_csv_dtypes(csv_data_folder, table.replace(".csv", ""), typed)
 
-        del fields, table_definitions
-        del csv_data_folder, table
+        del csv_data_folder, table, typed
 
         # Import
         del dismap
 
-        import copy
-        results = copy.deepcopy(field_csv_dtypes)
-        del field_csv_dtypes, copy
+        results = dict(field_csv_dtypes)
+        del field_csv_dtypes
 
     except KeyboardInterrupt:
         raise Exception
@@ -1424,40 +1481,14 @@ def dTypesGDB(csv_data_folder="", table=""):
         else:
             pass
 
-        field_definitions = dismap.field_definitions(csv_data_folder, "")
-        table_definitions = dismap.table_definitions(csv_data_folder, "")
-
-        fields = table_definitions[table.replace(".csv", "")]
-
-        field_gdb_dtypes = []
-        for field in fields:
-            field_definition = field_definitions[field]
-            # print(field_definition["field_type"])
-            # fd = field_definition[:-2]
-            # del fd[2], field_definition
-            if field_definition["field_type"] == "TEXT":
-                field_dtype = f"U{field_definition['field_length']}"
-            elif field_definition["field_type"] == "SHORT":
-                # np.dtype('u4') == dtype('uint32')
-                field_dtype = f"U4"
-            elif field_definition["field_type"] == "DOUBLE":
-                # np.dtype('d') == dtype('float64'), np.dtype('f') == dtype('float32'), np.dtype('f8') == dtype('float64')
-                field_dtype = f"d"
-            elif field_definition["field_type"] == "DATE":
-                field_dtype = f"M8[us]"
-            else:
-                field_dtype = ""
-            field_gdb_dtypes.append((f"{field}", f"{field_dtype}"))
-            del field_definition, field, field_dtype
-        del fields
-
-        del field_definitions, table_definitions
+        # Built once per process (see dismap_schema.gdb_dtype for the dtype
+        # of each field type)
+        field_gdb_dtypes = dismap_schema.field_gdb_dtypes(csv_data_folder, table.replace(".csv", ""))
 
         del table, csv_data_folder
 
-        import copy
-        results = copy.deepcopy(field_gdb_dtypes)
-        del field_gdb_dtypes, copy
+        results = list(field_gdb_dtypes)
+        del field_gdb_dtypes
 
         del dismap
 
@@ -1582,19 +1613,16 @@ def export_metadata(csv_data_folder="", in_table=""):
 
 def field_definitions(csv_data_folder="", field=""):
     try:
-        import json, copy
-
-        # Read a File
-        with open(os.path.join(csv_data_folder, "field_definitions.json"), "r") as json_file:
-            field_definitions = json.load(json_file)
-        del json_file
+        # The file is read once per process (see dismap_schema), only the
+        # part that was asked for is copied
+        field_definitions = dismap_schema.field_definitions(csv_data_folder, "")
 
         if not field:  # if ""
             # Returns a dictionaty of field definitions
-            results = copy.deepcopy(field_definitions)
+            results = dismap_schema.thaw(field_definitions)
         elif field:  # If a field was passed, then return
             if field in field_definitions:
-                results = copy.deepcopy(field_definitions[field])
+                results = dismap_schema.thaw(field_definitions[field])
             else:
                 results = False
         # else:
@@ -1602,9 +1630,6 @@ def field_definitions(csv_data_folder="", field=""):
         #    return field
         del field_definitions
 
-        # Imports copy
-        del json, copy
-
         # Function parameters
         del csv_data_folder, field
 
@@ -1632,33 +1657,126 @@ def field_definitions(csv_data_folder="", field=""):
     finally:
         if "results" in locals().keys(): del results
 
-def get_encoding_index_col(csv_file):
-    import chardet
-    import pandas as pd
-    # Open the file in binary mode
-    with open(csv_file, 'rb') as f:
-        # Read the file's content
-        data = f.read()
-    # Detect the encoding using chardet.detect()
-    encoding_result = chardet.detect(data)
-    # Retrieve the encoding information
-    encoding = encoding_result['encoding']
-    del f, data, encoding_result
-    # Print the detected encoding
-    #print("Detected Encoding:", encoding)
-
-    dtypes = {}
-    # Read the CSV file into a DataFrame
-    df = pd.read_csv(csv_file, encoding  = encoding, delimiter = ",",)
-    # Analyze the data types and lengths
-    for column in df.columns: dtypes[column] = df[column].dtype; del column
-    first_column = list(dtypes.keys())[0]
-    index_column = 0 if first_column == "Unnamed: 0" else None
-    # Variables
-    del df, dtypes, first_column
+def get_encoding_index_col(csv_file, sniff_bytes=65536, cache=True):
+    # Returns the encoding of csv_file and the index column for pd.read_csv
+    # (0 when the first column has no name, as written by df.to_csv).
+    #   sniff_bytes: the amount of the file read to detect the encoding, the
+    #                whole file is only read when this part fails to decode
+    #   cache:       save the results in csv_encoding_cache.json next to the
+    #                file, keyed by file size and modification time, so the
+    #                detection is skipped until the file changes
+    import json
+    import csv
+    import codecs
+    from chardet.universaldetector import UniversalDetector
+
+    cache_file = os.path.join(os.path.dirname(csv_file), "csv_encoding_cache.json")
+    stat = os.stat(csv_file)
+    key = [stat.st_size, stat.st_mtime_ns]
+    del stat
+
+    cached = {}
+    if cache and os.path.isfile(cache_file):
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                cached = json.load(f)
+            del f
+        except ValueError:
+            cached = {}
+
+    name = os.path.basename(csv_file)
+    if name in cached and cached[name]["key"] == key:
+        encoding, index_column = cached[name]["encoding"], cached[name]["index_column"]
+        del cache_file, key, cached, name, json, csv, codecs, UniversalDetector
+        return encoding, index_column
+
+    # Detect the encoding with chardet from the first sniff_bytes of the
+    # file, trimmed to the last complete line so a character is not cut in
+    # two. The whole file is only read, in blocks, when the prefix can not be
+    # decoded with the detected encoding.
+    with open(csv_file, "rb") as f:
+        prefix = f.read(sniff_bytes)
+        if len(prefix) == sniff_bytes and b"\n" in prefix:
+            prefix = prefix[:prefix.rindex(b"\n") + 1]
+
+        detector = UniversalDetector()
+        detector.feed(prefix)
+        detector.close()
+        encoding = detector.result["encoding"] or "utf-8"
+
+        if encoding == "ascii":
+            # A plain ASCII prefix says nothing about the rest of the file
+            # (e.g. a cp1252 name after the first sniff_bytes), and chardet
+            # only looks at the start of what it is given. The rest is
+            # checked for non-ASCII bytes without decoding it. A file that
+            # is all ASCII is read as UTF-8, which decodes it the same way,
+            # otherwise the rest of the file from the first non-ASCII block
+            # is decoded as UTF-8, then cp1252, then latin-1, which decodes
+            # any byte, so pd.read_csv can not fail on it.
+            encoding, start = "utf-8", None
+            f.seek(len(prefix))
+            for block in iter(lambda: f.read(1048576), b""):
+                if not block.isascii():
+                    start = f.tell() - len(block)
+                    break
+                del block
+            if start is not None:
+                for encoding in ["utf-8", "cp1252", "latin-1"]:
+                    f.seek(start)
+                    decoder = codecs.getincrementaldecoder(encoding)()
+                    try:
+                        for block in iter(lambda: f.read(1048576), b""):
+                            decoder.decode(block)
+                        decoder.decode(b"", final=True)
+                        break
+                    except UnicodeDecodeError:
+                        pass
+                del decoder
+            del start
+        else:
+            try:
+                prefix.decode(encoding)
+            except (UnicodeDecodeError, LookupError):
+                encoding = None
+
+        if encoding is None:
+            f.seek(0)
+            detector = UniversalDetector()
+            for block in iter(lambda: f.read(65536), b""):
+                detector.feed(block)
+                del block
+                if detector.done:
+                    break
+            detector.close()
+            encoding = detector.result["encoding"] or "utf-8"
+    del f, detector, prefix
+
+    # Only the header line is needed to find the index column
+    with open(csv_file, "r", encoding=encoding, newline="") as f:
+        header = next(csv.reader(f), [])
+    del f
+    first_column = header[0] if header else None
+    index_column = 0 if first_column in ["", "Unnamed: 0"] else None
+    del header, first_column
+
+    if cache:
+        cached[name] = {"key" : key, "encoding" : encoding, "index_column" : index_column}
+        # Written to a temporary file first, workers for other files may be
+        # updating the cache at the same time
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(cached, f, indent=4)
+            del f
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            if os.path.isfile(tmp_file): os.remove(tmp_file)
+        del tmp_file
 
+    # Variables
+    del cache_file, key, cached, name
     # Import
-    del chardet, pd
+    del json, csv, codecs, UniversalDetector
 
     return encoding, index_column
 
@@ -1681,120 +1799,25 @@ def get_transformation(gsr_wkt="", psr_wkt=""):
 
     return transform
 
-def import_metadata(dataset=""):
+def import_metadata(dataset="", Sequential=True):
     try:
-        # Deprecated
-        from arcpy import metadata as md
-
-        dataset_name = os.path.basename(dataset)
-
-        if dataset_name.endswith(".crf"):
-            dataset_name = dataset_name.replace(".crf", "_CRF")
-            _project = os.path.basename(os.path.dirname(os.path.dirname(dataset)))
-            project_gdb = rf"{os.path.dirname(os.path.dirname(dataset))}\{_project}.gdb"
-            del _project
-        else:
-            project_gdb = os.path.dirname(dataset)
-
-        project_folder  = os.path.dirname(project_gdb)
-        metadata_folder = rf"{project_folder}\ArcGIS Metadata"
-
-        # ArcPy Environments
-        arcpy.env.overwriteOutput          = True
-        arcpy.env.parallelProcessingFactor = "100%"
-        arcpy.env.workspace                = project_gdb
-        arcpy.env.scratchWorkspace         = rf"Scratch\scratch.gdb"
-        arcpy.SetLogMetadata(True)
-
-        metadata_dictionary = dataset_title_dict(project_gdb)
-        #print(metadata_dictionary.keys())
-
-        arcpy.AddMessage(f"Metadata for: {dataset_name} dataset")
-
-        # print(f"\tDataset Service:       {datasets_dict[dataset]['Dataset Service']}")
-        # print(f"\tDataset Service Title: {datasets_dict[dataset]['Dataset Service Title']}")
-
-        # https://pro.arcgis.com/en/pro-app/latest/arcpy/metadata/metadata-class.htm
-        dataset_md = md.Metadata(dataset)
-        dataset_md.synchronize("ALWAYS")
-        dataset_md.title             = metadata_dictionary[dataset_name]["Dataset Service Title"]
-        dataset_md.tags              = metadata_dictionary[dataset_name]["Tags"]
-        dataset_md.summary           = metadata_dictionary[dataset_name]["Summary"]
-        dataset_md.description       = metadata_dictionary[dataset_name]["Description"]
-        dataset_md.credits           = metadata_dictionary[dataset_name]["Credits"]
-        dataset_md.accessConstraints = metadata_dictionary[dataset_name]["Access Constraints"]
-        dataset_md.save()
-        dataset_md.reload()
-
-        poc_template = r"{metadata_folder}\poc_template.xml"
-        poc_template_md = md.Metadata(poc_template)
-        #dataset_md.copy(poc_template_md)
-        dataset_md.importMetadata(r"{metadata_folder}\poc_template.xml")
-        #dataset_md.synchronize("ACCESSED", 0)
-        #dataset_md.synchronize("ALWAYS")
-        #dataset_md.synchronize("CREATED")
-        #dataset_md.synchronize("NOT_CREATED")
-        #dataset_md.synchronize("OVERWRITE")
-        dataset_md.synchronize("SELECTIVE")
-        dataset_md.save()
-        #dataset_md.reload()
-        del poc_template, poc_template_md
-
-        # Delete all geoprocessing history and any enclosed files from the item's metadata
-        #dataset_md.deleteContent('GPHISTORY')
-        #dataset_md.deleteContent('ENCLOSED_FILES')
-        #dataset_md.save()
-        #dataset_md.reload()
-
-        out_xml = rf"{metadata_folder}\{dataset_md.title}.xml"
-        #dataset_md.saveAsXML(out_xml, "REMOVE_ALL_SENSITIVE_INFO")
-        dataset_md.saveAsXML(out_xml, "REMOVE_MACHINE_NAMES")
-        #dataset_md.saveAsXML(out_xml)
+        # dataset is the path of a dataset or a list of paths, so the metadata
+        # of many datasets can be applied in one call. The titles are looked
+        # up once for each project GDB (see metadata_batch).
+        datasets = [dataset] if isinstance(dataset, str) else list(dataset)
 
-        pretty_format_xml_file(out_xml)
-        del out_xml
+        # metadata_batch is not reloaded here, it reloads dismap when it is
+        # imported
+        import metadata_batch
 
-        del dataset_md
+        metadata_batch.apply_metadata_batch(datasets, Sequential=Sequential)
 
-##        arcpy.AddMessage(f"Dataset: {dataset_name}")
-##        dataset_md_path = rf"{metadata_folder}\{dataset_name}.xml"
-##        if arcpy.Exists(dataset_md_path):
-##            arcpy.AddMessage(f"\tMetadata File: {os.path.basename(dataset_md_path)}")
-##            from arcpy import metadata as md
-##            try:
-##                dataset_md = md.Metadata(dataset)
-##                # Import the standard-format metadata content to the target item
-##                if not dataset_md.isReadOnly:
-##                    dataset_md.importMetadata(dataset_md_path, "ARCGIS_METADATA")
-##                    dataset_md.save()
-##                    dataset_md.reload()
-##                    dataset_md.title = title
-##                    dataset_md.save()
-##                    dataset_md.reload()
-##
-##                arcpy.AddMessage(f"\tExporting metadata file from {dataset_name}")
-##
-##                out_xml = rf"{project_folder}\Export Metadata\{title} EXACT_COPY.xml"
-##                dataset_md.saveAsXML(out_xml, "EXACT_COPY")
-##
-##                pretty_format_xml_file(out_xml)
-##                del out_xml
-##
-##                del dataset_md, md
-##
-##            except:
-##                arcpy.AddError(f"\tDataset metadata import error!! {arcpy.GetMessages()}")
-##        else:
-##            arcpy.AddWarning(f"\tDataset missing metadata file!!")
-
-        # Import
-        del md
+        # Imports
+        del metadata_batch
         # Declared variable
-        del metadata_dictionary
-        del dataset_name, project_gdb, project_folder, metadata_folder
-
+        del datasets
         # Function parameters
-        del dataset
+        del dataset, Sequential
 
         results = True
 
@@ -1824,19 +1847,17 @@ def import_metadata(dataset=""):
 
 def metadata_dictionary_json(csv_data_folder="", dataset_name=""):
     try:
-        import json
-
-        # Read a File
-        with open(rf"{csv_data_folder}\metadata_dictionary.json", "r") as json_file:
-            metadata_dictionary = json.load(json_file)
-        del json_file, json, csv_data_folder
+        # The file is read once per process (see dismap_schema)
+        metadata_dictionary = dismap_schema.metadata_dictionary(csv_data_folder, "")
+        del csv_data_folder
 
         if not dataset_name:
-            results = metadata_dictionary
+            results = dismap_schema.thaw(metadata_dictionary)
         elif dataset_name:
-            results = metadata_dictionary[dataset_name]
+            results = dismap_schema.thaw(metadata_dictionary[dataset_name])
         else:
             results = None
+        del metadata_dictionary
 
     except KeyboardInterrupt:
         raise Exception
@@ -1864,57 +1885,21 @@ def metadata_dictionary_json(csv_data_folder="", dataset_name=""):
 
 def pretty_format_xml_file(metadata=""):
     try:
-        # xml.etree.ElementTree Imports
-        import xml.etree.ElementTree as ET
+        # The formatting is done in one pass (see xml_canonical)
+        import xml_canonical
+        importlib.reload(xml_canonical)
 
         #arcpy.AddMessage(f"###--->>> Converting metadata file: {os.path.basename(metadata)} to pretty format")
         if os.path.isfile(metadata):
-            tree = ET.ElementTree(file=metadata)
-            root = tree.getroot()
-            tree = ET.ElementTree(root)
-            ET.indent(tree, space="\t", level=0)
-            xmlstr = ET.tostring(root, encoding="UTF-8").decode("UTF-8")
-            xmlstr = xmlstr.replace(' Sync="TRUE">\n', ' Sync="TRUE">')
-            xmlstr = xmlstr.replace(' Sync="FALSE">\n', ' Sync="FALSE">')
-            xmlstr = xmlstr.replace(' value="eng">\n', ' value="eng">')
-            xmlstr = xmlstr.replace(' value="US">\n', ' value="US">')
-            xmlstr = xmlstr.replace(' value="001">\n', ' value="001">')
-            xmlstr = xmlstr.replace(' value="002">\n', ' value="002">')
-            xmlstr = xmlstr.replace(' value="003">\n', ' value="003">')
-            xmlstr = xmlstr.replace(' value="004">\n', ' value="004">')
-            xmlstr = xmlstr.replace(' value="005">\n', ' value="005">')
-            xmlstr = xmlstr.replace(' value="006">\n', ' value="006">')
-            xmlstr = xmlstr.replace(' value="007">\n', ' value="007">')
-            xmlstr = xmlstr.replace(' value="008">\n', ' value="008">')
-            xmlstr = xmlstr.replace(' value="009">\n', ' value="009">')
-            xmlstr = xmlstr.replace(' value="010">\n', ' value="010">')
-            xmlstr = xmlstr.replace(' value="011">\n', ' value="011">')
-            xmlstr = xmlstr.replace(' value="012">\n', ' value="012">')
-            xmlstr = xmlstr.replace(' value="013">\n', ' value="013">')
-            xmlstr = xmlstr.replace(' value="014">\n', ' value="014">')
-            xmlstr = xmlstr.replace(' value="015">\n', ' value="015">')
-            xmlstr = xmlstr.replace(' code="0">\n', ' code="0">')
-            xmlstr = xmlstr.replace('<RefSystem dimension="horizontal">\n', '<RefSystem dimension="horizontal">',)
-            xmlstr = xmlstr.replace('<UOM type="length">\n', '<UOM type="length">')
-
-            xmlstr = xmlstr.replace("<attrdef>", '<attrdef Sync="TRUE">')
-            xmlstr = xmlstr.replace("<attrdefs>", '<attrdefs Sync="TRUE">')
-            xmlstr = xmlstr.replace("<udom>", '<udom Sync="TRUE">')
-
-            xmlstr = xmlstr.replace('Sync="FALSE"', 'Sync="TRUE"')
-
             try:
-                with open(metadata, "w") as f:
-                    f.write(xmlstr)
-                    del f
-            except:
+                xml_canonical.pretty_format(metadata)
+            except OSError:
                 arcpy.AddError(f"The metadata file: {os.path.basename(metadata)} can not be overwritten!!")
-            del xmlstr, tree, root
         else:
             arcpy.AddWarning(f"\t###--->>> {os.path.basename(metadata)} is missing!! <<<---###")
             arcpy.AddWarning(f"\t###--->>> {metadata} <<<---###")
         # Declared variable
-        del metadata, ET
+        del metadata, xml_canonical
 
         results = True
 
@@ -1943,22 +1928,35 @@ def pretty_format_xml_file(metadata=""):
     finally:
         if "results" in locals().keys(): del results
 
-def pretty_format_xml_files(metadata_folder=""):
+def pretty_format_xml_files(metadata_folder="", Sequential=True):
     try:
+        import xml_canonical
+        importlib.reload(xml_canonical)
+
         arcpy.env.overwriteOutput = True
-        arcpy.env.workspace = metadata_folder
 
-        xml_files = [rf"{metadata_folder}\{xml}" for xml in arcpy.ListFiles("*.xml")]
-        for xml_file in xml_files:
-            arcpy.AddMessage(os.path.basename(xml_file))
-            pretty_format_xml_file(xml_file)
-            del xml_file
+        if Sequential:
+            processes = 1
+        else:
+            import multiprocessing
+            #Set multiprocessing exe in case we're running as an embedded process, i.e ArcGIS
+            multiprocessing.set_executable(os.path.join(sys.exec_prefix, 'pythonw.exe'))
+            # Get CPU count and then take 2 away for other process
+            processes = max(multiprocessing.cpu_count() - 2, 1)
+            del multiprocessing
+
+        for xml_file, written, error in xml_canonical.pretty_format_folder(metadata_folder, processes):
+            if error:
+                arcpy.AddError(f"{os.path.basename(xml_file)}: {error}")
+            else:
+                arcpy.AddMessage(f"{os.path.basename(xml_file)}{'' if written else ' (unchanged)'}")
+            del xml_file, written, error
 
         # Variables declared in the function
-        del xml_files
+        del processes, xml_canonical
 
         # Function paramters
-        del metadata_folder
+        del metadata_folder, Sequential
 
         #print(tgt_item_md.title)
         results = True
@@ -1989,35 +1987,18 @@ def pretty_format_xml_files(metadata_folder=""):
 
 def table_definitions(csv_data_folder="", dataset_name=""):
     try:
-        import json, copy
-
-        # Read a File
-        with open(os.path.join(csv_data_folder, "table_definitions.json"), "r") as json_file:
-            table_definitions = json.load(json_file)
-        del json_file
-
+        # The file is read once per process (see dismap_schema), only the
+        # part that was asked for is copied
         if not dataset_name or dataset_name == "":
             # Return a dictionary of all values
-            results = copy.deepcopy(table_definitions)
+            results = dismap_schema.thaw(dismap_schema.table_definitions(csv_data_folder, ""))
         elif dataset_name:
             # arcpy.AddMessage(f"IN: {dataset_name}")
-            if "_IDW" in dataset_name:
-                dataset_name = "IDW_Data"
-            elif "_GLMME" in dataset_name:
-                dataset_name = "GLMME_Data"
-            elif "_GFDL" in dataset_name:
-                dataset_name = "GFDL_Data"
-            else:
-                pass
+            dataset_name = dismap_schema.table_name(dataset_name)
             # arcpy.AddMessage(f"OUT: {dataset_name}")
-            results = copy.deepcopy(table_definitions[dataset_name])
+            results = dismap_schema.thaw(dismap_schema.table_definitions(csv_data_folder, dataset_name))
         else:
             arcpy.AddError("something wrong")
-
-        # Variables created in function
-        del table_definitions
-        # Import
-        del json, copy
         # Function parameters
         del csv_data_folder, dataset_name
 
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+#-------------------------------------------------------------------------------
+# Name:        dismap_schema
+# Purpose:     Cached, read-only copies of field_definitions.json,
+#              table_definitions.json and metadata_dictionary.json, and of
+#              the dataset titles of each project
+#
+# Author:      john.f.kennedy
+#
+# Created:     10/18/2026
+# Copyright:   (c) john.f.kennedy 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+# The JSON files in the CSV Data folder are read once per process and kept
+# until the file changes (size or modification time). The workers reload
+# dismap with importlib.reload, which would clear a cache kept in dismap, so
+# the cache is kept in this module and this module should be imported, not
+# reloaded.
+#
+# The dictionaries handed out are read-only views (MappingProxyType, with
+# lists as tuples). Use thaw() to get a copy that can be changed. This module
+# does not use arcpy.
+import os
+import json
+from types import MappingProxyType
+
+# Cache of the JSON files, keyed by path: {"stamp", "data", "derived"}
+_CACHE = {}
+
+# Cache of the dataset titles, keyed by project GDB: {"stamp", "data"}
+_TITLES = {}
+
+# Text fields with a few values repeated on every row, read as categorical
+CATEGORICAL_FIELDS = ["Species", "CommonName"]
+
+def freeze(obj):
+    # Read-only copy of a json.load result
+    if isinstance(obj, dict):
+        return MappingProxyType({key : freeze(value) for key, value in obj.items()})
+    elif isinstance(obj, list):
+        return tuple(freeze(value) for value in obj)
+    else:
+        return obj
+
+def thaw(obj):
+    # Copy of a frozen object that can be changed, like copy.deepcopy of the
+    # json.load result
+    if isinstance(obj, MappingProxyType) or isinstance(obj, dict):
+        return {key : thaw(value) for key, value in obj.items()}
+    elif isinstance(obj, tuple) or isinstance(obj, list):
+        return [thaw(value) for value in obj]
+    else:
+        return obj
+
+def _entry(csv_data_folder="", file_name=""):
+    # Returns the cache entry for a JSON file, reading the file when it is not
+    # cached or has changed since it was read
+    json_file = os.path.join(csv_data_folder, file_name)
+
+    stat = os.stat(json_file)
+    stamp = (stat.st_size, stat.st_mtime_ns)
+    del stat
+
+    entry = _CACHE.get(json_file)
+
+    if entry is None or entry["stamp"] != stamp:
+        with open(json_file, "r") as f:
+            data = json.load(f)
+        del f
+        entry = {"stamp" : stamp, "data" : freeze(data), "derived" : {}}
+        _CACHE[json_file] = entry
+        del data
+
+    del json_file, stamp
+
+    return entry
+
+def clear_cache():
+    _CACHE.clear()
+    _TITLES.clear()
+
+def table_name(dataset_name=""):
+    # The table definition used by a dataset, e.g. AI_IDW is IDW_Data
+    if "_IDW" in dataset_name:
+        return "IDW_Data"
+    elif "_GLMME" in dataset_name:
+        return "GLMME_Data"
+    elif "_GFDL" in dataset_name:
+        return "GFDL_Data"
+    else:
+        return dataset_name
+
+def field_definitions(csv_data_folder="", field=""):
+    # All field definitions, or one field definition (None if the field is
+    # not defined)
+    field_definitions = _entry(csv_data_folder, "field_definitions.json")["data"]
+    if not field:
+        return field_definitions
+    return field_definitions.get(field)
+
+def table_definitions(csv_data_folder="", table=""):
+    # All table definitions, or the fields of one table. Raises a KeyError if
+    # the table is not defined.
+    table_definitions = _entry(csv_data_folder, "table_definitions.json")["data"]
+    if not table:
+        return table_definitions
+    return table_definitions[table]
+
+def metadata_dictionary(csv_data_folder="", dataset_name=""):
+    metadata_dictionary = _entry(csv_data_folder, "metadata_dictionary.json")["data"]
+    if not dataset_name:
+        return metadata_dictionary
+    return metadata_dictionary[dataset_name]
+
+def _derived(csv_data_folder, table, key, build):
+    # Per table values built from both definition files, kept with the table
+    # definitions and rebuilt when either file changes
+    fields_entry = _entry(csv_data_folder, "field_definitions.json")
+    tables_entry = _entry(csv_data_folder, "table_definitions.json")
+
+    cache_key = (key, table, fields_entry["stamp"])
+
+    if cache_key not in tables_entry["derived"]:
+        tables_entry["derived"][cache_key] = build(fields_entry["data"], tables_entry["data"][table])
+
+    value = tables_entry["derived"][cache_key]
+
+    del fields_entry, tables_entry, cache_key
+
+    return value
+
+def table_fields(csv_data_folder="", table=""):
+    # Tuple of the field names of a table
+    return _derived(csv_data_folder, table, "fields", lambda fields, names: tuple(names))
+
+def field_descriptions(csv_data_folder="", table=""):
+    # Tuple of [name, type, alias, length] for arcpy.management.AddFields
+    def build(fields, names):
+        return tuple((fields[name]["field_name"],
+                      fields[name]["field_type"],
+                      fields[name]["field_alias"],
+                      fields[name]["field_length"]) for name in names)
+    return _derived(csv_data_folder, table, "descriptions", build)
+
+def gdb_dtype(field_definition):
+    # NumPy dtype for a field in a geodatabase table
+    if field_definition["field_type"] == "TEXT":
+        return f"U{field_definition['field_length']}"
+    elif field_definition["field_type"] == "SHORT":
+        # np.dtype('u4') == dtype('uint32')
+        return "U4"
+    elif field_definition["field_type"] == "DOUBLE":
+        # np.dtype('d') == dtype('float64'), np.dtype('f') == dtype('float32'), np.dtype('f8') == dtype('float64')
+        return "d"
+    elif field_definition["field_type"] == "DATE":
+        return "M8[us]"
+    else:
+        return ""
+
+def field_gdb_dtypes(csv_data_folder="", table=""):
+    # Tuple of (field, dtype) for the NumPy structured arrays of a table
+    return _derived(csv_data_folder, table, "gdb_dtypes",
+                    lambda fields, names: tuple((name, gdb_dtype(fields[name])) for name in names))
+
+def csv_dtype(field, field_definition):
+    # pandas dtype used to read a field from a CSV file. The integer dtypes
+    # are the nullable ones, so a missing value does not turn the column
+    # into floats. Dates are read as text.
+    if field_definition["field_type"] == "TEXT":
+        return "category" if field in CATEGORICAL_FIELDS else "str"
+    elif field_definition["field_type"] == "SHORT":
+        return "Int16"
+    elif field_definition["field_type"] == "LONG":
+        return "Int32"
+    elif field_definition["field_type"] == "FLOAT":
+        return "float32"
+    elif field_definition["field_type"] == "DOUBLE":
+        return "float64"
+    else:
+        return "str"
+
+def field_csv_dtypes(csv_data_folder="", table="", typed=True):
+    # Read-only dictionary of dtypes for pd.read_csv. With typed=False every
+    # field is read as text, e.g. to write the file back out unchanged.
+    if typed:
+        return _derived(csv_data_folder, table, "csv_dtypes",
+                        lambda fields, names: MappingProxyType({name.replace(" ", "_") : csv_dtype(name, fields[name]) for name in names}))
+    return _derived(csv_data_folder, table, "csv_text_dtypes",
+                    lambda fields, names: MappingProxyType({name.replace(" ", "_") : "str" for name in names}))
+
+def dataset_titles(project_gdb="", stamp=(), build=None):
+    # The dataset titles of a project (see dismap.dataset_title_dict). The
+    # stamp is the rows of the project's Datasets table, the titles are built
+    # again with build(project_gdb) when the rows have changed.
+    entry = _TITLES.get(project_gdb)
+
+    if entry is None or entry["stamp"] != stamp:
+        entry = {"stamp" : stamp, "data" : freeze(build(project_gdb))}
+        _TITLES[project_gdb] = entry
+
+    return entry["data"]
@@ -0,0 +1,457 @@
+# -*- coding: utf-8 -*-
+#-------------------------------------------------------------------------------
+# Name:        geotiff_writer
+# Purpose:     Writes a NumPy array as an internally tiled, DEFLATE compressed
+#              GeoTIFF with overviews and statistics, in one pass
+#
+# Author:      john.f.kennedy
+#
+# Created:     10/18/2026
+# Copyright:   (c) john.f.kennedy 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+# Used by create_rasters_worker and create_species_richness_rasters_worker in
+# place of NumPyArrayToRaster followed by BuildPyramids or
+# CalculateStatistics, which each read the whole image again. The overviews
+# are stored in the TIFF (reduced resolution images), the statistics and the
+# NoData value in the GDAL_METADATA and GDAL_NODATA tags. The spatial
+# reference is written in the GeoTIFF keys, as an EPSG code when there is one
+# and as user defined keys when there is not, and always as WKT in the
+# .aux.xml file, which ArcGIS and GDAL read. Only NumPy and the standard
+# library are used, this module does not use arcpy. The file is checked by
+# geotiff_writer_test.
+import os
+import re
+import struct
+import zlib
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+# The NoData value used by NumPyArrayToRaster in the workers
+NODATA = -3.40282346639e+38
+
+# Internal tile size, the overviews are made until the image fits in a tile
+TILE_SIZE = 256
+
+# zlib compression level
+DEFLATE_LEVEL = 6
+
+# TIFF field types
+_SHORT, _LONG, _DOUBLE, _ASCII = 3, 4, 12, 2
+_TYPE_FORMATS = {_SHORT : "H", _LONG : "I", _DOUBLE : "d", _ASCII : "s"}
+
+def grid_geometry(xmin=0.0, ymin=0.0, cell_size=1.0, wkt="", epsg=0):
+    # The grid of a raster: the lower left corner (as used with
+    # NumPyArrayToRaster), the cell size, and the spatial reference as WKT
+    # and, when it has one, an EPSG code (SpatialReference.factoryCode)
+    return {"xmin" : float(xmin), "ymin" : float(ymin), "cell_size" : float(cell_size), "wkt" : wkt or "", "epsg" : int(epsg or 0),}
+
+def raster_statistics(array):
+    # Minimum, maximum, mean and standard deviation of the cells that are
+    # not NaN, as ArcGIS and GDAL store them
+    accumulator = _statistics_accumulator()
+    _accumulate_statistics(accumulator, np.asarray(array, dtype=np.float32))
+    return _accumulated_statistics(accumulator)
+
+def _statistics_accumulator():
+    return {"cells" : 0, "count" : 0, "minimum" : np.inf, "maximum" : -np.inf, "mean" : 0.0, "m2" : 0.0,}
+
+def _accumulate_statistics(accumulator, block):
+    # Adds a block of cells to the statistics, the mean and the sum of the
+    # squared differences from it are combined block by block (Chan et al.),
+    # so the statistics of a raster written in strips are those of the
+    # whole raster
+    valid = block[~np.isnan(block)].astype(np.float64)
+
+    accumulator["cells"] += block.size
+
+    if valid.size:
+        count, mean = accumulator["count"], accumulator["mean"]
+        block_mean  = float(valid.mean())
+        delta       = block_mean - mean
+        total       = count + valid.size
+        accumulator["mean"]    = mean + delta * valid.size / total
+        accumulator["m2"]     += float(np.square(valid - block_mean).sum()) + delta * delta * count * valid.size / total
+        accumulator["count"]   = total
+        accumulator["minimum"] = min(accumulator["minimum"], float(valid.min()))
+        accumulator["maximum"] = max(accumulator["maximum"], float(valid.max()))
+        del count, mean, block_mean, delta, total
+
+    del valid
+
+def _accumulated_statistics(accumulator):
+    if accumulator["count"]:
+        statistics = {"STATISTICS_MINIMUM" : accumulator["minimum"], "STATISTICS_MAXIMUM" : accumulator["maximum"],
+                      "STATISTICS_MEAN"    : accumulator["mean"], "STATISTICS_STDDEV" : float(np.sqrt(accumulator["m2"] / accumulator["count"])),}
+    else:
+        statistics = {}
+    statistics["STATISTICS_VALID_PERCENT"] = 100.0 * accumulator["count"] / accumulator["cells"] if accumulator["cells"] else 0.0
+    return statistics
+
+def overview(array):
+    # Half the resolution, each cell is the mean of the cells (2 x 2) that
+    # are not NaN
+    rows, columns = -(-array.shape[0] // 2), -(-array.shape[1] // 2)
+
+    padded = np.full((rows * 2, columns * 2), np.nan, dtype=np.float32)
+    padded[:array.shape[0], :array.shape[1]] = array
+
+    blocks = padded.reshape(rows, 2, columns, 2)
+    valid  = ~np.isnan(blocks)
+    count  = valid.sum(axis=(1, 3))
+    total  = np.where(valid, blocks, 0.0).sum(axis=(1, 3), dtype=np.float64)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        result = np.where(count > 0, total / count, np.nan).astype(np.float32)
+
+    del rows, columns, padded, blocks, valid, count, total
+
+    return result
+
+def overviews(array, tile_size=TILE_SIZE):
+    # The full resolution image and its overviews, until one tile covers the
+    # image
+    levels = [array]
+    while max(levels[-1].shape) > tile_size:
+        levels.append(overview(levels[-1]))
+    return levels
+
+def _tiles(array, tile_size, nodata, level):
+    # The compressed tiles of an image, in row major order. The tiles on the
+    # right and bottom edges are filled with NoData.
+    rows, columns = array.shape
+    data = np.where(np.isnan(array), np.float32(nodata), array).astype("<f4")
+
+    tiles = []
+    for row in range(0, rows, tile_size):
+        for column in range(0, columns, tile_size):
+            tile = np.full((tile_size, tile_size), np.float32(nodata), dtype="<f4")
+            block = data[row:row + tile_size, column:column + tile_size]
+            tile[:block.shape[0], :block.shape[1]] = block
+            tiles.append(zlib.compress(tile.tobytes(), level) if level else tile.tobytes())
+            del column, tile, block
+        del row
+
+    del rows, columns, data
+
+    return tiles
+
+# GeoTIFF codes for a user defined spatial reference (one without an EPSG
+# code), so the .tif has a usable spatial reference without the .aux.xml
+# file. The names are the lower case names in the WKT.
+_USER_DEFINED = 32767
+_GEOGRAPHIC_CODES = {"gcs_wgs_1984" : 4326, "wgs 84" : 4326, "gcs_north_american_1983" : 4269, "nad83" : 4269,}
+_PROJECTIONS = {"albers" : 11, "albers_conic_equal_area" : 11,  # CT_AlbersEqualArea
+                "transverse_mercator" : 1,  # CT_TransverseMercator
+                "lambert_conformal_conic" : 8, "lambert_conformal_conic_2sp" : 8,  # CT_LambertConfConic_2SP
+                "mercator" : 7, "mercator_2sp" : 7,}  # CT_Mercator
+_PARAMETER_KEYS = {"standard_parallel_1" : 3078, "standard_parallel_2" : 3079,  # ProjStdParallel1GeoKey, ProjStdParallel2GeoKey
+                   "central_meridian" : 3080, "longitude_of_center" : 3080,  # ProjNatOriginLongGeoKey
+                   "latitude_of_origin" : 3081, "latitude_of_center" : 3081,  # ProjNatOriginLatGeoKey
+                   "false_easting" : 3082, "false_northing" : 3083,  # ProjFalseEastingGeoKey, ProjFalseNorthingGeoKey
+                   "scale_factor" : 3092,}  # ProjScaleAtNatOriginGeoKey
+_LINEAR_UNITS = {"meter" : 9001, "metre" : 9001, "foot" : 9002, "foot_us" : 9003, "us survey foot" : 9003,}
+
+_NUMBER = r"\s*([-+0-9.eE]+)"
+
+def _wkt_name(wkt, keyword):
+    # The name of the first keyword[...] in the WKT, "" if there is none
+    match = re.search(rf"{keyword}\[[\"']([^\"']*)[\"']", wkt)
+    return match.group(1) if match else ""
+
+def _geographic_keys(wkt):
+    # The GeoKeys of the GEOGCS in the WKT, a code when the name is known,
+    # otherwise the datum as a user defined ellipsoid and prime meridian
+    name = _wkt_name(wkt, "GEOGCS")
+    if name.lower() in _GEOGRAPHIC_CODES:
+        return {2048 : _GEOGRAPHIC_CODES[name.lower()]}  # GeographicTypeGeoKey
+
+    keys = {2048 : _USER_DEFINED,  # GeographicTypeGeoKey
+            2049 : name or "unnamed",  # GeogCitationGeoKey
+            2050 : _USER_DEFINED,  # GeogGeodeticDatumGeoKey
+            2054 : 9102,  # GeogAngularUnitsGeoKey: degree
+            2056 : _USER_DEFINED,}  # GeogEllipsoidGeoKey
+
+    spheroid = re.search(rf"SPHEROID\[[\"'][^\"']*[\"'],{_NUMBER},{_NUMBER}", wkt)
+    if spheroid:
+        keys[2057] = float(spheroid.group(1))  # GeogSemiMajorAxisGeoKey
+        if float(spheroid.group(2)):
+            keys[2059] = float(spheroid.group(2))  # GeogInvFlatteningGeoKey
+        else:
+            keys[2058] = float(spheroid.group(1))  # GeogSemiMinorAxisGeoKey, a sphere
+
+    primem = re.search(rf"PRIMEM\[[\"'][^\"']*[\"'],{_NUMBER}", wkt)
+    if primem and float(primem.group(1)):
+        keys[2051] = _USER_DEFINED  # GeogPrimeMeridianGeoKey
+        keys[2061] = float(primem.group(1))  # GeogPrimeMeridianLongGeoKey
+
+    del name, spheroid, primem
+
+    return keys
+
+def _projected_keys(wkt):
+    # The GeoKeys of a user defined PROJCS: the projection, its parameters,
+    # the linear unit and the GEOGCS. A projection that is not in
+    # _PROJECTIONS is written without ProjCoordTransGeoKey, and is then only
+    # complete in the .aux.xml file.
+    keys = {3072 : _USER_DEFINED,  # ProjectedCSTypeGeoKey
+            3073 : _wkt_name(wkt, "PROJCS") or "unnamed",  # PCSCitationGeoKey
+            3074 : _USER_DEFINED,}  # ProjectionGeoKey
+
+    keys.update(_geographic_keys(wkt))
+
+    projection = _wkt_name(wkt, "PROJECTION").lower()
+    if projection in _PROJECTIONS:
+        keys[3075] = _PROJECTIONS[projection]  # ProjCoordTransGeoKey
+        for parameter, value in re.findall(rf"PARAMETER\[[\"']([^\"']*)[\"'],{_NUMBER}", wkt):
+            if parameter.lower() in _PARAMETER_KEYS:
+                keys[_PARAMETER_KEYS[parameter.lower()]] = float(value)
+            del parameter, value
+
+    # The linear unit is the last UNIT, the GEOGCS has the angular unit
+    units = re.findall(rf"UNIT\[[\"']([^\"']*)[\"'],{_NUMBER}", wkt)
+    if units and units[-1][0].lower() in _LINEAR_UNITS:
+        keys[3076] = _LINEAR_UNITS[units[-1][0].lower()]  # ProjLinearUnitsGeoKey
+    elif units:
+        keys[3076] = _USER_DEFINED
+        keys[3077] = float(units[-1][1])  # ProjLinearUnitSizeGeoKey, in meters
+
+    del projection, units
+
+    return keys
+
+def _geokeys(grid):
+    # GeoKeyDirectoryTag, GeoDoubleParamsTag and GeoAsciiParamsTag values.
+    # The model type is taken from the WKT (GEOGCS or PROJCS), or from the
+    # EPSG code when there is no WKT. A spatial reference with an EPSG code
+    # is written as the code, one without as a user defined set of keys.
+    wkt, epsg = grid["wkt"].strip(), grid["epsg"]
+
+    if wkt:
+        geographic = wkt.upper().startswith("GEOGCS")
+    else:
+        geographic = 4000 <= epsg < 5000
+
+    geokeys = {1024 : 2 if geographic else 1,  # GTModelTypeGeoKey: geographic or projected
+               1025 : 1,  # GTRasterTypeGeoKey: pixel is area
+               1026 : _wkt_name(wkt, "GEOGCS" if geographic else "PROJCS") or "unnamed",}  # GTCitationGeoKey
+
+    if geographic:
+        geokeys.update({2048 : epsg} if epsg else _geographic_keys(wkt))
+    else:
+        geokeys.update({3072 : epsg} if epsg else _projected_keys(wkt))
+
+    # Whole numbers are stored in the directory, the other values in the
+    # double and ASCII (each ends with |) parameters
+    directory, doubles, ascii_params = [], [], ""
+    for key in sorted(geokeys):
+        value = geokeys[key]
+        if isinstance(value, str):
+            text = value.replace("|", " ") + "|"
+            directory += [key, 34737, len(text), len(ascii_params)]
+            ascii_params += text
+            del text
+        elif isinstance(value, float):
+            directory += [key, 34736, 1, len(doubles)]
+            doubles.append(value)
+        else:
+            directory += [key, 0, 1, value]
+        del key, value
+    directory = [1, 1, 0, len(geokeys)] + directory
+
+    del wkt, epsg, geographic, geokeys
+
+    return directory, doubles, ascii_params
+
+def _aux_xml(grid, statistics):
+    # The GDAL PAM .aux.xml, with the spatial reference and the statistics
+    metadata = "".join(f'        <MDI key="{key}">{value!r}</MDI>\n' for key, value in statistics.items())
+    srs = f'  <SRS>{escape(grid["wkt"])}</SRS>\n' if grid["wkt"] else ""
+    return (f'<PAMDataset>\n{srs}  <PAMRasterBand band="1">\n    <Metadata>\n{metadata}    </Metadata>\n  </PAMRasterBand>\n</PAMDataset>\n')
+
+def write_geotiff(tif_file="", array=None, grid=None, nodata=NODATA, tile_size=TILE_SIZE, level=DEFLATE_LEVEL):
+    # Writes a 2D array (NaN is NoData) as a float32 GeoTIFF. Returns the
+    # statistics written to the file.
+    array = np.asarray(array, dtype=np.float32)
+
+    if array.ndim != 2:
+        raise ValueError(f"Expected a 2D array, not {array.ndim}D")
+
+    return write_geotiff_strips(tif_file, array.shape, [array], grid, nodata, tile_size, level)
+
+def _level_shapes(shape, tile_size):
+    # The shapes of the full resolution image and its overviews, as made by
+    # overviews()
+    shapes = [tuple(shape)]
+    while max(shapes[-1]) > tile_size:
+        shapes.append((-(-shapes[-1][0] // 2), -(-shapes[-1][1] // 2)))
+    return shapes
+
+def write_geotiff_strips(tif_file="", shape=(0, 0), strips=[], grid=None, nodata=NODATA, tile_size=TILE_SIZE, level=DEFLATE_LEVEL):
+    # Writes a float32 GeoTIFF (NaN is NoData) of the given shape from
+    # blocks of whole rows given in order (e.g. a generator), so the image
+    # is never held in memory. Each level keeps at most one row of tiles:
+    # when a row of tiles is complete it is compressed and written, and
+    # halved (overview()) into the next level. The file is written to a
+    # temporary file first, so a failed run does not leave a partial file.
+    # Returns the statistics written to the file.
+    rows, columns = (int(n) for n in shape)
+
+    grid = grid_geometry() if grid is None else grid
+
+    shapes = _level_shapes((rows, columns), tile_size)
+
+    # Per level: the rows waiting for a complete row of tiles, and the
+    # offsets and sizes of the tiles written
+    pending     = [[] for shape in shapes]
+    offsets     = [[] for shape in shapes]
+    byte_counts = [[] for shape in shapes]
+
+    accumulator = _statistics_accumulator()
+
+    tmp_file = f"{tif_file}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_file, "wb") as f:
+            # The offset of the first IFD is written when the data is complete
+            f.write(b"II" + struct.pack("<HI", 42, 0))
+
+            def write_rows(i, block):
+                # Writes a row of tiles of level i, then passes it on halved
+                for tile in _tiles(block, tile_size, nodata, level):
+                    offsets[i].append(f.tell())
+                    byte_counts[i].append(len(tile))
+                    # Word aligned
+                    f.write(tile + (b"\0" if len(tile) % 2 else b""))
+                    del tile
+                if i + 1 < len(shapes):
+                    add_rows(i + 1, overview(block))
+
+            def add_rows(i, block):
+                pending[i].append(block)
+                waiting = sum(len(b) for b in pending[i])
+                while waiting >= tile_size:
+                    block = np.concatenate(pending[i]) if len(pending[i]) > 1 else pending[i][0]
+                    pending[i] = [block[tile_size:]] if len(block) > tile_size else []
+                    write_rows(i, block[:tile_size])
+                    waiting -= tile_size
+
+            received = 0
+            for block in strips:
+                block = np.asarray(block, dtype=np.float32)
+                if block.ndim != 2 or block.shape[1] != columns or received + block.shape[0] > rows:
+                    raise ValueError(f"A block of shape {block.shape} does not fit an image of shape {(rows, columns)} after {received} rows")
+                received += block.shape[0]
+                _accumulate_statistics(accumulator, block)
+                add_rows(0, block)
+                del block
+
+            if received != rows:
+                raise ValueError(f"{received} rows were given for an image of {rows} rows")
+
+            # The last (partial) row of tiles of each level, the full resolution
+            # image first, as each one adds rows to the next
+            for i in range(len(shapes)):
+                if pending[i]:
+                    block = np.concatenate(pending[i])
+                    pending[i] = []
+                    write_rows(i, block)
+                    del block
+                del i
+
+            statistics = _accumulated_statistics(accumulator)
+
+            ifd_start = f.tell()
+            ifds = _ifds(ifd_start, shapes, offsets, byte_counts, grid, statistics, nodata, tile_size, level)
+
+            if ifd_start + len(ifds) >= 2**32:
+                raise ValueError(f"{os.path.basename(tif_file)} is too large for a TIFF file")
+
+            f.write(ifds)
+            f.seek(4)
+            f.write(struct.pack("<I", ifd_start))
+            del f, write_rows, add_rows, received, ifd_start, ifds
+    except:
+        # A block that does not fit, or an error in the code making the blocks
+        if os.path.isfile(tmp_file):
+            os.remove(tmp_file)
+        raise
+    os.replace(tmp_file, tif_file)
+
+    aux_xml = f"{tif_file}.aux.xml"
+    with open(f"{aux_xml}.tmp", "w", encoding="utf-8") as f:
+        f.write(_aux_xml(grid, statistics))
+        del f
+    os.replace(f"{aux_xml}.tmp", aux_xml)
+
+    # Pyramids built by BuildPyramids on an earlier run
+    if os.path.isfile(f"{tif_file}.ovr"):
+        os.remove(f"{tif_file}.ovr")
+
+    del rows, columns, grid, shapes, pending, offsets, byte_counts, accumulator, tmp_file, aux_xml
+
+    return statistics
+
+def _ifds(ifd_start, shapes, offsets, byte_counts, grid, statistics, nodata, tile_size, level):
+    # The Image File Directories of the full resolution image and the
+    # overviews, written at ifd_start after the image data
+    gdal_metadata = ("<GDALMetadata>\n" + "".join(f'  <Item name="{key}" sample="0">{value!r}</Item>\n' for key, value in statistics.items()) + "</GDALMetadata>").encode("ascii")
+    # The NoData value as it is stored in the float32 cells
+    gdal_nodata   = repr(float(np.float32(nodata))).encode("ascii")
+
+    geokeys, geodoubles, citation = _geokeys(grid)
+
+    ymax = grid["ymin"] + shapes[0][0] * grid["cell_size"]
+
+    ifds = bytearray()
+
+    for i, shape in enumerate(shapes):
+        is_overview = i > 0
+        tags = [(254, _LONG, [1 if is_overview else 0]),
+                (256, _LONG, [shape[1]]),
+                (257, _LONG, [shape[0]]),
+                (258, _SHORT, [32]),
+                (259, _SHORT, [8 if level else 1]),
+                (262, _SHORT, [1]),
+                (277, _SHORT, [1]),
+                (284, _SHORT, [1]),
+                (322, _SHORT, [tile_size]),
+                (323, _SHORT, [tile_size]),
+                (324, _LONG, offsets[i]),
+                (325, _LONG, byte_counts[i]),
+                (339, _SHORT, [3]),
+                (42113, _ASCII, gdal_nodata + b"\0"),]
+        if not is_overview:
+            tags += [(33550, _DOUBLE, [grid["cell_size"], grid["cell_size"], 0.0]),
+                     (33922, _DOUBLE, [0.0, 0.0, 0.0, grid["xmin"], ymax, 0.0]),
+                     (34735, _SHORT, geokeys),
+                     (34737, _ASCII, citation.encode("ascii", "replace") + b"\0"),
+                     (42112, _ASCII, gdal_metadata + b"\0"),]
+            if geodoubles:
+                tags.append((34736, _DOUBLE, geodoubles))
+        tags = sorted(tags)
+
+        ifd_offset = ifd_start + len(ifds)
+        # The values that do not fit in the 4 bytes of an entry follow the IFD
+        extra_offset = ifd_offset + 2 + len(tags) * 12 + 4
+        entries, extra = bytearray(), bytearray()
+        for tag, field_type, values in tags:
+            count  = len(values)
+            packed = values if field_type == _ASCII else struct.pack(f"<{count}{_TYPE_FORMATS[field_type]}", *values)
+            if len(packed) <= 4:
+                entries += struct.pack("<HHI", tag, field_type, count) + packed.ljust(4, b"\0")
+            else:
+                entries += struct.pack("<HHII", tag, field_type, count, extra_offset + len(extra))
+                extra += packed
+                if len(extra) % 2:
+                    extra += b"\0"
+            del tag, field_type, values, count, packed
+
+        next_ifd = 0 if i == len(shapes) - 1 else extra_offset + len(extra)
+        ifds += struct.pack("<H", len(tags)) + entries + struct.pack("<I", next_ifd) + extra
+
+        del i, shape, is_overview, tags, ifd_offset, extra_offset, entries, extra, next_ifd
+
+    del gdal_metadata, gdal_nodata, geokeys, geodoubles, citation, ymax
+
+    return ifds
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+#-------------------------------------------------------------------------------
+# Name:        geotiff_writer_test
+# Purpose:     Writes GeoTIFF files with geotiff_writer and reads them back
+#              with struct and zlib, checking the cells, the overviews and
+#              the GeoTIFF keys without ArcGIS or GDAL
+#
+# Author:      john.f.kennedy
+#
+# Created:     10/18/2026
+# Copyright:   (c) john.f.kennedy 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+import os, sys # built-ins first
+import traceback
+import importlib
+import struct
+import tempfile
+import zlib
+
+import numpy as np # third-parties second
+
+sys.path.append(os.path.dirname(__file__))
+
+# Spatial references as SpatialReference.exportToString().split(";")[0] and
+# SpatialReference.factoryCode return them, with the GeoKeys each one is
+# expected to have in the file
+SPATIAL_REFERENCES = {
+    "Albers, no EPSG code" : ('PROJCS["NAD_1983_Albers_DisMAP",GEOGCS["GCS_North_American_1983",DATUM["D_North_American_1983",'
+                              'SPHEROID["GRS_1980",6378137.0,298.257222101]],PRIMEM["Greenwich",0.0],UNIT["Degree",0.0174532925199433]],'
+                              'PROJECTION["Albers"],PARAMETER["False_Easting",0.0],PARAMETER["False_Northing",0.0],'
+                              'PARAMETER["Central_Meridian",-154.0],PARAMETER["Standard_Parallel_1",50.0],'
+                              'PARAMETER["Standard_Parallel_2",58.0],PARAMETER["Latitude_Of_Origin",50.0],UNIT["Meter",1.0]]', 0,
+                              {1024 : 1, 1025 : 1, 1026 : "NAD_1983_Albers_DisMAP", 2048 : 4269, 3072 : 32767,
+                               3073 : "NAD_1983_Albers_DisMAP", 3074 : 32767, 3075 : 11, 3076 : 9001, 3078 : 50.0,
+                               3079 : 58.0, 3080 : -154.0, 3081 : 50.0, 3082 : 0.0, 3083 : 0.0,}),
+    "Transverse Mercator in feet, no EPSG code" : ("PROJCS['PUG1',GEOGCS['GCS_North_American_1983',DATUM['D_North_American_1983',"
+                              "SPHEROID['GRS_1980',6378137.0,298.257222101]],PRIMEM['Greenwich',0.0],UNIT['Degree',0.0174532925199433]],"
+                              "PROJECTION['Transverse_Mercator'],PARAMETER['False_Easting',1640416.666666667],"
+                              "PARAMETER['False_Northing',0.0],PARAMETER['Central_Meridian',-87.0],PARAMETER['Scale_Factor',0.9996],"
+                              "PARAMETER['Latitude_Of_Origin',0.0],UNIT['Foot_US',0.3048006096012192]]", 0,
+                              {1024 : 1, 3072 : 32767, 3075 : 1, 3076 : 9003, 3080 : -87.0, 3082 : 1640416.666666667, 3092 : 0.9996,}),
+    "Geographic, no EPSG code" : ('GEOGCS["GCS_Custom_Sphere",DATUM["D_Custom_Sphere",SPHEROID["Sphere",6371000.0,0.0]],'
+                              'PRIMEM["Greenwich",0.0],UNIT["Degree",0.0174532925199433]]', 0,
+                              {1024 : 2, 1026 : "GCS_Custom_Sphere", 2048 : 32767, 2049 : "GCS_Custom_Sphere", 2054 : 9102,
+                               2057 : 6371000.0, 2058 : 6371000.0, 3072 : None,}),
+    "Projected, EPSG code" : ('PROJCS["WGS_1984_UTM_Zone_2N",GEOGCS["GCS_WGS_1984",DATUM["D_WGS_1984",'
+                              'SPHEROID["WGS_1984",6378137.0,298.257223563]],PRIMEM["Greenwich",0.0],UNIT["Degree",0.0174532925199433]],'
+                              'PROJECTION["Transverse_Mercator"],PARAMETER["False_Easting",500000.0],PARAMETER["False_Northing",0.0],'
+                              'PARAMETER["Central_Meridian",-171.0],PARAMETER["Scale_Factor",0.9996],PARAMETER["Latitude_Of_Origin",0.0],'
+                              'UNIT["Meter",1.0]]', 32602,
+                              {1024 : 1, 1026 : "WGS_1984_UTM_Zone_2N", 3072 : 32602, 3075 : None,}),
+    "Geographic, EPSG code" : ('GEOGCS["GCS_WGS_1984",DATUM["D_WGS_1984",SPHEROID["WGS_1984",6378137.0,298.257223563]],'
+                              'PRIMEM["Greenwich",0.0],UNIT["Degree",0.0174532925199433]]', 4326,
+                              {1024 : 2, 2048 : 4326, 3072 : None,}),
+}
+
+_FORMATS = {1 : "B", 2 : "s", 3 : "H", 4 : "I", 11 : "f", 12 : "d", 16 : "Q"}
+
+def read_ifds(tif_file):
+    # The tags of each IFD of a little endian classic TIFF, as a dictionary
+    # of tag : values (ASCII values as a string)
+    with open(tif_file, "rb") as f:
+        data = f.read()
+        del f
+
+    byte_order, version, offset = struct.unpack("<2sHI", data[:8])
+    if byte_order != b"II" or version != 42:
+        raise ValueError(f"Not a little endian TIFF file: {byte_order}, {version}")
+
+    ifds = []
+    while offset:
+        count = struct.unpack("<H", data[offset:offset + 2])[0]
+        tags = {}
+        for i in range(count):
+            tag, field_type, n = struct.unpack("<HHI", data[offset + 2 + i * 12:offset + 10 + i * 12])
+            size = n * struct.calcsize(_FORMATS[field_type])
+            start = offset + 10 + i * 12 if size <= 4 else struct.unpack("<I", data[offset + 10 + i * 12:offset + 14 + i * 12])[0]
+            if field_type == 2:
+                tags[tag] = data[start:start + n].rstrip(b"\0").decode("ascii")
+            else:
+                tags[tag] = list(struct.unpack(f"<{n}{_FORMATS[field_type]}", data[start:start + size]))
+            del i, tag, field_type, n, size, start
+        ifds.append(tags)
+        offset = struct.unpack("<I", data[offset + 2 + count * 12:offset + 6 + count * 12])[0]
+        del count, tags
+
+    del byte_order, version, offset
+
+    return data, ifds
+
+def read_image(data, tags):
+    # The cells of an image, from its DEFLATE compressed tiles
+    width, length, tile_size = tags[256][0], tags[257][0], tags[322][0]
+    across = -(-width // tile_size)
+    image = np.empty((-(-length // tile_size) * tile_size, across * tile_size), dtype="<f4")
+    for i, (offset, count) in enumerate(zip(tags[324], tags[325])):
+        tile = data[offset:offset + count]
+        tile = zlib.decompress(tile) if tags[259][0] == 8 else tile
+        row, column = divmod(i, across)
+        image[row * tile_size:(row + 1) * tile_size, column * tile_size:(column + 1) * tile_size] = np.frombuffer(tile, dtype="<f4").reshape(tile_size, tile_size)
+        del i, offset, count, tile, row, column
+    image = image[:length, :width]
+    del width, length, tile_size, across
+    return image
+
+def read_geokeys(tags):
+    # The GeoKeys as a dictionary of key : value
+    directory, doubles, ascii_params = tags[34735], tags.get(34736, []), tags.get(34737, "")
+    geokeys = {}
+    for i in range(directory[3]):
+        key, location, count, value = directory[4 + i * 4:8 + i * 4]
+        if location == 0:
+            geokeys[key] = value
+        elif location == 34736:
+            geokeys[key] = doubles[value]
+        elif location == 34737:
+            geokeys[key] = ascii_params[value:value + count].rstrip("|")
+        del i, key, location, count, value
+    del directory, doubles, ascii_params
+    return geokeys
+
+def check_file(geotiff_writer, tif_file, array, grid, expected_keys, strip_rows=0):
+    # Returns the differences between the file and what was written. With
+    # strip_rows the file is written with write_geotiff_strips, in blocks of
+    # strip_rows rows.
+    problems = []
+
+    if strip_rows:
+        statistics = geotiff_writer.write_geotiff_strips(tif_file, array.shape, (array[row:row + strip_rows] for row in range(0, array.shape[0], strip_rows)), grid)
+        expected = geotiff_writer.raster_statistics(array)
+        for name in expected:
+            if not np.isclose(statistics.get(name, np.nan), expected[name], rtol=1e-12):
+                problems.append(f"{name} {statistics.get(name)!r}, expected {expected[name]!r}")
+            del name
+        del expected
+    else:
+        statistics = geotiff_writer.write_geotiff(tif_file, array, grid)
+
+    data, ifds = read_ifds(tif_file)
+
+    nodata = np.float32(geotiff_writer.NODATA)
+
+    levels = geotiff_writer.overviews(array)
+    if len(ifds) != len(levels):
+        problems.append(f"{len(ifds)} images, expected {len(levels)}")
+
+    for i, (tags, level) in enumerate(zip(ifds, levels)):
+        image = read_image(data, tags)
+        if image.shape != level.shape:
+            problems.append(f"image {i}: shape {image.shape}, expected {level.shape}")
+        elif not np.array_equal(image, np.where(np.isnan(level), nodata, level).astype("<f4")):
+            problems.append(f"image {i}: the cells are different")
+        if tags[254][0] != (1 if i else 0):
+            problems.append(f"image {i}: NewSubfileType {tags[254][0]}")
+        if float(tags[42113]) != float(nodata):
+            problems.append(f"image {i}: GDAL_NODATA {tags[42113]}")
+        del i, tags, level, image
+
+    tags = ifds[0]
+
+    if tags[33550][:2] != [grid["cell_size"], grid["cell_size"]]:
+        problems.append(f"ModelPixelScale {tags[33550]}")
+
+    ymax = grid["ymin"] + array.shape[0] * grid["cell_size"]
+    if tags[33922][3:5] != [grid["xmin"], ymax]:
+        problems.append(f"ModelTiepoint {tags[33922]}")
+
+    for name, value in statistics.items():
+        if f'name="{name}" sample="0">{value!r}<' not in tags[42112]:
+            problems.append(f"GDAL_METADATA has no {name}")
+        del name, value
+
+    geokeys = read_geokeys(tags)
+    for key, value in expected_keys.items():
+        if geokeys.get(key) != value:
+            problems.append(f"GeoKey {key}: {geokeys.get(key)!r}, expected {value!r}")
+        del key, value
+
+    if not os.path.isfile(f"{tif_file}.aux.xml"):
+        problems.append("no .aux.xml file")
+
+    del statistics, data, ifds, nodata, levels, tags, ymax, geokeys
+
+    return problems
+
+def main():
+    try:
+        import geotiff_writer
+        importlib.reload(geotiff_writer)
+
+        rng = np.random.default_rng(2024)
+
+        # Larger than a tile, so there are edge tiles and overviews, with
+        # NoData cells and negative values
+        array = rng.gamma(0.5, 10.0, (300, 530)).astype(np.float32)
+        array[rng.random(array.shape) < 0.1] = np.nan
+        array[:40, :60] = np.nan
+        array[5, 100] = -1.0
+
+        failed = 0
+
+        with tempfile.TemporaryDirectory() as folder:
+            for name, (wkt, epsg, expected_keys) in SPATIAL_REFERENCES.items():
+                grid = geotiff_writer.grid_geometry(-1250000.0, 420000.0, 1000.0, wkt, epsg)
+                tif_file = os.path.join(folder, "Test.tif")
+
+                problems = check_file(geotiff_writer, tif_file, array, grid, expected_keys)
+
+                print(f"{name:<42} {'OK' if not problems else '; '.join(problems)}")
+
+                failed += 1 if problems else 0
+
+                del name, wkt, epsg, expected_keys, grid, tif_file, problems
+
+            # Streamed in blocks of rows that do and do not line up with the
+            # tiles, on an image with more overviews
+            tall = rng.gamma(0.5, 10.0, (1100, 300)).astype(np.float32)
+            tall[rng.random(tall.shape) < 0.1] = np.nan
+            tall[700:, :] = np.nan
+
+            wkt, epsg, expected_keys = SPATIAL_REFERENCES["Projected, EPSG code"]
+            grid = geotiff_writer.grid_geometry(-1250000.0, 420000.0, 1000.0, wkt, epsg)
+            tif_file = os.path.join(folder, "Test.tif")
+
+            for strip_rows in [1, 37, 256, 1100]:
+                problems = check_file(geotiff_writer, tif_file, tall, grid, expected_keys, strip_rows)
+
+                print(f"{f'Streamed, {strip_rows} rows at a time':<42} {'OK' if not problems else '; '.join(problems)}")
+
+                failed += 1 if problems else 0
+
+                del strip_rows, problems
+
+            del tall, wkt, epsg, expected_keys, grid, tif_file
+            del folder
+
+        print(f"\n{'All files match' if not failed else f'{failed} checks failed'}")
+
+        del geotiff_writer, rng, array
+
+        if failed:
+            raise SystemExit(1)
+
+        del failed
+
+    except SystemExit:
+        raise
+    except:
+        traceback.print_exc()
+        sys.exit(1)
+
+if __name__ == '__main__':
+    try:
+        print(f"{'-' * 90}")
+        print(f"Python Script:  {os.path.basename(__file__)}")
+        print(f"Location:       {os.path.dirname(__file__)}")
+        print(f"Python Version: {sys.version} Environment: {os.path.basename(sys.exec_prefix)}")
+        print(f"{'-' * 90}\n")
+
+        main()
+
+    except SystemExit:
+        raise
+    except:
+        traceback.print_exc()
+        sys.exit(1)
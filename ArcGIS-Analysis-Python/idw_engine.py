@@ -0,0 +1,451 @@
+# -*- coding: utf-8 -*-
+#-------------------------------------------------------------------------------
+# Name:        idw_engine
+# Purpose:     Inverse distance weighted (IDW) interpolation of the sample
+#              locations with NumPy and SciPy, using the same settings as
+#              the arcpy.ga.IDW call in create_rasters_worker
+#
+# Author:      john.f.kennedy
+#
+# Created:     10/18/2026
+# Copyright:   (c) john.f.kennedy 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+# One KD-tree is built for the sample locations in a year window and the
+# neighbors of every cell in the raster mask are found once, as a sparse
+# weight matrix that can be cached on disk. Each species in the window is
+# then the matrix times its MapValue at the sample locations. Large regions
+# are interpolated in tiles of the mask cells (see interpolate_window_tiled)
+# and the mask is kept as one bit a cell (see cell_mask), so apart from the
+# mask the memory used does not grow with the size of the grid. This module
+# does not use arcpy, the reads and writes stay in the worker.
+import os
+import csv
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from scipy.spatial import cKDTree
+from scipy.sparse import csr_matrix
+
+# Settings used for arcpy.ga.IDW in create_rasters_worker
+POWER         = 2
+MAX_NEIGHBORS = 15
+MIN_NEIGHBORS = 10
+# Samples from year - 2 to year + 2 are used, with YearWeights=3-(abs(Tc-Ti))
+YEAR_WINDOW   = 2
+
+# Number of mask cells interpolated at a time by interpolate_window_tiled
+TILE_CELLS = 250000
+
+# Fields read from the Sample_Locations (or GRID_Points) feature class with
+# arcpy.da.FeatureClassToNumPyArray
+SAMPLE_FIELDS = ["SHAPE@X", "SHAPE@Y", "Species", "Year", "MapValue"]
+
+def read_sample_locations(csv_file="", x_field="Easting", y_field="Northing"):
+    # Reads sample locations from a CSV file into the same structured array
+    # as FeatureClassToNumPyArray(..., SAMPLE_FIELDS), so the engine can be
+    # used without arcpy. Empty MapValue cells are NaN.
+    with open(csv_file, "r", newline="", encoding="utf-8") as f:
+        rows = [[float(row[x_field]), float(row[y_field]), row["Species"], int(row["Year"]), float(row["MapValue"]) if row["MapValue"] else np.nan] for row in csv.DictReader(f)]
+        del f
+
+    samples = np.array([tuple(row) for row in rows], dtype=[("SHAPE@X", "f8"), ("SHAPE@Y", "f8"), ("Species", f"U{max([len(row[2]) for row in rows] + [1])}"), ("Year", "i4"), ("MapValue", "f8")])
+
+    del rows
+
+    return samples
+
+def sample_index(sample_species, sample_years):
+    # Sorts the sample records by Species and Year once. Returns the sort
+    # order and a dictionary of (Species, Year): (start, stop) into it, so
+    # the records for a species-year are a slice instead of a selection.
+    sample_species = np.asarray(sample_species)
+    sample_years   = np.asarray(sample_years)
+
+    order = np.lexsort((sample_years, sample_species))
+
+    slices = {}
+
+    if order.size:
+        sorted_species, sorted_years = sample_species[order], sample_years[order]
+
+        change = np.flatnonzero((sorted_species[1:] != sorted_species[:-1]) | (sorted_years[1:] != sorted_years[:-1])) + 1
+
+        for start, stop in zip(np.r_[0, change], np.r_[change, order.size]):
+            slices[str(sorted_species[start]), int(sorted_years[start])] = (int(start), int(stop))
+            del start, stop
+
+        del sorted_species, sorted_years, change
+
+    return {"order" : order, "slices" : slices}
+
+def index_rows(sample_index, species, years):
+    # The sample record numbers for a species and a list of years
+    order, slices = sample_index["order"], sample_index["slices"]
+
+    rows = [order[slice(*slices[species, int(year)])] for year in years if (species, int(year)) in slices]
+
+    return np.concatenate(rows) if rows else np.array([], dtype=order.dtype)
+
+def window_years(year):
+    # The years used for a year, year - 2 to year + 2
+    return range(int(year) - YEAR_WINDOW, int(year) + YEAR_WINDOW + 1)
+
+def sample_subset(samples, rows, year=None):
+    # The records in rows as an array for arcpy.da.NumPyArrayToFeatureClass,
+    # with the X and Y shape fields and MapValue. When year is given the
+    # YearWeights field is added, calculated in NumPy. Null MapValue records
+    # are left out.
+    rows = rows[~np.isnan(samples["MapValue"][rows])]
+
+    dtype = [("X", "f8"), ("Y", "f8"), ("MapValue", "f8")]
+    if year is not None:
+        dtype.append(("YearWeights", "i2"))
+
+    subset = np.zeros(rows.size, dtype=dtype)
+    subset["X"]        = samples["SHAPE@X"][rows]
+    subset["Y"]        = samples["SHAPE@Y"][rows]
+    subset["MapValue"] = samples["MapValue"][rows]
+    if year is not None:
+        subset["YearWeights"] = year_weights(samples["Year"][rows], year)
+
+    del rows, dtype
+
+    return subset
+
+def search_radius(cell_size):
+    # majSemiaxis and minSemiaxis of the standard search neighborhood
+    return cell_size * 1000
+
+def cell_centers(xmin, ymax, cell_size, mask_array):
+    # x and y of the center of every cell in the mask (cells that are not
+    # Null), in row major order, the same order as mask_array[valid]
+    rows, columns = np.nonzero(~np.isnan(mask_array))
+    return np.column_stack([xmin + (columns + 0.5) * cell_size, ymax - (rows + 0.5) * cell_size])
+
+def cell_mask(xmin, ymax, cell_size, mask_strips):
+    # The raster mask, given as blocks of rows in order (Null cells are NaN),
+    # kept as one bit per cell with the number of mask cells before each
+    # row, so the cells of any rows can be found without the mask array
+    bits, row_cells, columns = [], [0], 0
+    for strip in mask_strips:
+        valid = ~np.isnan(strip)
+        bits.append(np.packbits(valid, axis=1))
+        row_cells.extend(np.count_nonzero(valid, axis=1).tolist())
+        columns = valid.shape[1]
+        del strip, valid
+    bits = np.concatenate(bits) if bits else np.zeros((0, 0), dtype=np.uint8)
+    mask = {"xmin" : float(xmin), "ymax" : float(ymax), "cell_size" : float(cell_size),
+            "shape" : (len(bits), columns), "bits" : bits, "row_cells" : np.cumsum(row_cells, dtype=np.int64),}
+    del bits, row_cells, columns
+    return mask
+
+def mask_rows(mask, row_start, row_end):
+    # The cells of rows row_start to row_end that are in the mask, as booleans
+    return np.unpackbits(mask["bits"][row_start:row_end], axis=1, count=mask["shape"][1]).astype(bool)
+
+def mask_cell_centers(mask, row_start, row_end):
+    # cell_centers for the mask cells of rows row_start to row_end
+    rows, columns = np.nonzero(mask_rows(mask, row_start, row_end))
+    return np.column_stack([mask["xmin"] + (columns + 0.5) * mask["cell_size"], mask["ymax"] - (rows + row_start + 0.5) * mask["cell_size"]])
+
+def mask_tiles(mask, tile_cells=TILE_CELLS):
+    # Blocks of whole rows (row_start, row_end) with at most tile_cells mask
+    # cells each, or one row when a row has more. Blocks without mask cells
+    # are left out.
+    row_cells, tiles, row_start = mask["row_cells"], [], 0
+    while row_start < mask["shape"][0]:
+        row_end = int(np.searchsorted(row_cells, row_cells[row_start] + max(int(tile_cells), 1), side="right")) - 1
+        row_end = min(max(row_end, row_start + 1), mask["shape"][0])
+        if row_cells[row_end] > row_cells[row_start]:
+            tiles.append((row_start, row_end))
+        row_start = row_end
+        del row_end
+    del row_cells, row_start
+    return tiles
+
+def mask_strips(mask, cell_values=None, strip_rows=256):
+    # The raster of cell_values (a value for each mask cell, in row major
+    # order) as blocks of strip_rows rows, for
+    # geotiff_writer.write_geotiff_strips. The cells outside of the mask,
+    # or all of the cells when cell_values is None, are NaN.
+    rows, columns = mask["shape"]
+    for row_start in range(0, rows, strip_rows):
+        row_end = min(row_start + strip_rows, rows)
+        strip = np.full((row_end - row_start, columns), np.nan, dtype=np.float32)
+        if cell_values is not None:
+            strip[mask_rows(mask, row_start, row_end)] = cell_values[mask["row_cells"][row_start]:mask["row_cells"][row_end]]
+        yield strip
+        del row_start, row_end, strip
+    del rows, columns
+
+def year_weights(sample_years, year):
+    # Calculate YearWeights=3-(abs(Tc-Ti))
+    return (YEAR_WINDOW + 1) - np.abs(int(year) - np.asarray(sample_years))
+
+def window_samples(sample_x, sample_y, sample_years, year):
+    # The distinct sample locations (x, y and year) in the year window. The
+    # rows for every species at a haul share the same location, so this is
+    # the set of points the neighbor search is built on.
+    in_window = np.isin(np.asarray(sample_years), window_years(year))
+
+    points, inverse = np.unique(np.column_stack([np.asarray(sample_x)[in_window],
+                                                 np.asarray(sample_y)[in_window],
+                                                 np.asarray(sample_years)[in_window]]), axis=0, return_inverse=True)
+
+    # Index of the window point for each row, -1 for rows outside of the window
+    point_index = np.full(in_window.size, -1)
+    point_index[in_window] = inverse.ravel()
+
+    del in_window, inverse
+
+    return points, point_index
+
+def neighbors(points, cell_xy, radius, max_neighbors=MAX_NEIGHBORS, min_neighbors=MIN_NEIGHBORS, query_workers=-1):
+    # The nearest max_neighbors points within radius of each cell. When there
+    # are fewer than min_neighbors in the radius, the nearest points outside of
+    # it are used until there are min_neighbors. query_workers is the number
+    # of threads used by the cKDTree query, -1 for all of the cores.
+    # Returns indexes and distances as (cells, max_neighbors) arrays, unused
+    # neighbors have an index of -1 and a distance of inf.
+    k = min(max_neighbors, len(points))
+
+    if k == 0:
+        return np.full((len(cell_xy), 0), -1), np.full((len(cell_xy), 0), np.inf)
+
+    distances, indexes = cKDTree(points[:, :2]).query(cell_xy, k=k, workers=query_workers)
+
+    distances, indexes = distances.reshape(len(cell_xy), k), indexes.reshape(len(cell_xy), k)
+
+    rank = np.arange(k)[None, :]
+
+    unused = (distances > radius) & (rank >= min_neighbors)
+
+    indexes[unused] = -1
+    distances[unused] = np.inf
+
+    del k, rank, unused
+
+    return indexes, distances
+
+def halo_neighbors(points, cell_xy, radius, max_neighbors=MAX_NEIGHBORS, min_neighbors=MIN_NEIGHBORS, query_workers=-1):
+    # The same result as neighbors, for a tile of cells. Only the points in
+    # the bounding box of the cells plus a halo of radius are searched, which
+    # finds every neighbor within radius. A cell with fewer than
+    # min_neighbors in radius may use points outside of the halo, so those
+    # cells are searched again with all of the points.
+    k = min(max_neighbors, len(points))
+
+    if k == 0 or len(cell_xy) == 0:
+        return neighbors(points, cell_xy, radius, max_neighbors, min_neighbors, query_workers)
+
+    (xmin, ymin), (xmax, ymax) = cell_xy.min(axis=0) - radius, cell_xy.max(axis=0) + radius
+
+    candidates = np.flatnonzero((points[:, 0] >= xmin) & (points[:, 0] <= xmax) & (points[:, 1] >= ymin) & (points[:, 1] <= ymax))
+
+    del xmin, ymin, xmax, ymax
+
+    indexes, distances = np.full((len(cell_xy), k), -1), np.full((len(cell_xy), k), np.inf)
+
+    if candidates.size:
+        _indexes, _distances = neighbors(points[candidates], cell_xy, radius, max_neighbors, min_neighbors, query_workers)
+        used = _indexes >= 0
+        indexes[:, :_indexes.shape[1]][used] = candidates[_indexes[used]]
+        distances[:, :_indexes.shape[1]][used] = _distances[used]
+        del _indexes, _distances, used
+
+    outside = (distances <= radius).sum(axis=1) < min(min_neighbors, len(points))
+
+    if outside.any():
+        indexes[outside], distances[outside] = neighbors(points, cell_xy[outside], radius, max_neighbors, min_neighbors, query_workers)
+
+    del k, candidates, outside
+
+    return indexes, distances
+
+def idw_weights(indexes, distances, point_weights=None, power=POWER):
+    # Inverse distance weights for each neighbor, normalized so each cell's
+    # weights sum to one. point_weights (e.g. YearWeights) multiply the
+    # inverse distance. When a cell falls on sample points, only those points
+    # are used.
+    used = indexes >= 0
+
+    weights = np.zeros(distances.shape)
+
+    with np.errstate(divide="ignore"):
+        weights[used] = 1.0 / distances[used] ** power
+
+    coincident = used & (distances == 0.0)
+    on_point = coincident.any(axis=1)
+    weights[on_point] = coincident[on_point].astype(np.float64)
+
+    if point_weights is not None:
+        weights *= np.where(used, np.asarray(point_weights, dtype=np.float64)[np.maximum(indexes, 0)], 0.0)
+
+    total = weights.sum(axis=1, keepdims=True)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        weights = weights / total
+
+    del used, coincident, on_point, total
+
+    return weights
+
+def weight_matrix(points, cell_xy, year, cell_size, query_workers=-1):
+    # The IDW weights as a sparse (cells, points) matrix, so the prediction
+    # for a species is the matrix times its values at the window points
+    indexes, distances = halo_neighbors(points, cell_xy, search_radius(cell_size), query_workers=query_workers)
+    weights = idw_weights(indexes, distances, year_weights(points[:, 2], year))
+
+    used = indexes >= 0
+
+    matrix = csr_matrix((weights[used], (np.nonzero(used)[0], indexes[used])), shape=(len(cell_xy), len(points)))
+
+    del indexes, distances, weights, used
+
+    return matrix
+
+def weights_fingerprint(points, cell_xy, year, cell_size):
+    # Changes when the sample locations, the raster mask or the IDW settings
+    # change, so a cached matrix is only used for the same inputs
+    fingerprint = hashlib.md5()
+    for array in [np.ascontiguousarray(points, dtype=np.float64), np.ascontiguousarray(cell_xy, dtype=np.float64)]:
+        fingerprint.update(repr(array.shape).encode())
+        fingerprint.update(array.tobytes())
+        del array
+    fingerprint.update(repr([int(year), float(cell_size), POWER, MAX_NEIGHBORS, MIN_NEIGHBORS, YEAR_WINDOW]).encode())
+    return fingerprint.hexdigest()
+
+def cached_weight_matrix(cache_file, points, cell_xy, year, cell_size, query_workers=-1):
+    # Loads the weight matrix from cache_file (a .npz file) if it was saved
+    # for the same inputs, otherwise builds it and saves it. No file is used
+    # when cache_file is empty.
+    if not cache_file:
+        return weight_matrix(points, cell_xy, year, cell_size, query_workers)
+
+    fingerprint = weights_fingerprint(points, cell_xy, year, cell_size)
+
+    if os.path.isfile(cache_file):
+        with np.load(cache_file) as npz:
+            if str(npz["fingerprint"]) == fingerprint:
+                return csr_matrix((npz["data"], npz["indices"], npz["indptr"]), shape=tuple(npz["shape"]))
+
+    matrix = weight_matrix(points, cell_xy, year, cell_size, query_workers)
+
+    if not os.path.isdir(os.path.dirname(cache_file)):
+        os.makedirs(os.path.dirname(cache_file))
+
+    # Written to a temporary file first, so a failed run does not leave a
+    # partial file
+    tmp_file = f"{cache_file}.tmp.npz"
+    np.savez(tmp_file, data=matrix.data, indices=matrix.indices, indptr=matrix.indptr, shape=np.array(matrix.shape), fingerprint=np.array(fingerprint))
+    os.replace(tmp_file, cache_file)
+
+    del fingerprint, tmp_file
+
+    return matrix
+
+def interpolate_window(points, cell_xy, species_values, year, cell_size, cache_file="", query_workers=-1):
+    # Interpolates every species for a year window.
+    #   points:         window points from window_samples
+    #   cell_xy:        cell centers from cell_centers
+    #   species_values: dictionary of species: values at the window points,
+    #                   NaN where the species was not recorded
+    #   cache_file:     optional .npz file for the shared weight matrix
+    #   query_workers:  threads for each neighbor search, see neighbors
+    # Returns a dictionary of species: prediction for each cell
+
+    # Shared by every species that has a value at every point, these are
+    # predicted together with one sparse matrix product
+    shared = [species for species in species_values if not np.isnan(species_values[species]).any()]
+
+    predictions = {}
+
+    if shared:
+        matrix = cached_weight_matrix(cache_file, points, cell_xy, year, cell_size, query_workers)
+        shared_predictions = matrix @ np.column_stack([species_values[species] for species in shared])
+        for i, species in enumerate(shared):
+            predictions[species] = np.asarray(shared_predictions[:, i])
+            del i, species
+        del matrix, shared_predictions
+
+    for species in [species for species in species_values if species not in predictions]:
+        # The species was not recorded at some points, so it gets its own
+        # neighbor search over the points where it was
+        values = species_values[species]
+        _points = np.flatnonzero(~np.isnan(values))
+        predictions[species] = weight_matrix(points[_points], cell_xy, year, cell_size, query_workers) @ values[_points]
+        del species, values, _points
+
+    del shared
+
+    return predictions
+
+def tile_slices(n_cells, tile_cells=TILE_CELLS):
+    # Slices of the mask cells (row major order) for each tile
+    return [slice(start, min(start + tile_cells, n_cells)) for start in range(0, n_cells, max(int(tile_cells), 1))]
+
+def interpolate_window_tiled(points, cell_xy, species_values, year, cell_size, out, cache_file="", tile_cells=TILE_CELLS, workers=1):
+    # The same as interpolate_window, one tile of the mask cells at a time.
+    #   cell_xy:    the cell centers, or a mask from cell_mask. With a mask
+    #               the tiles are blocks of rows (mask_tiles), and the
+    #               centers of a tile are made when it is interpolated.
+    #   out:        a (species, cells) float32 array, e.g. a np.memmap, for
+    #               the predictions of the species in species_values order
+    #   cache_file: optional .npz file name, the weight matrix of each tile
+    #               is saved as <name>_<tile>.npz
+    #   workers:    number of threads interpolating tiles at once. Each
+    #               thread then searches with one thread, so there are not
+    #               workers times cores threads on top of the process Pool.
+    # Only the weights and predictions of the tiles being interpolated are
+    # held in memory. Returns a dictionary of species: row in out.
+    species_rows = {species : i for i, species in enumerate(species_values)}
+
+    if isinstance(cell_xy, dict):
+        tiles = [(slice(cell_xy["row_cells"][row_start], cell_xy["row_cells"][row_end]), (row_start, row_end)) for row_start, row_end in mask_tiles(cell_xy, tile_cells)]
+    else:
+        tiles = [(cells, None) for cells in tile_slices(len(cell_xy), tile_cells)]
+
+    threaded = workers > 1 and len(tiles) > 1
+
+    def interpolate_tile(i, tile):
+        cells, rows = tile
+        tile_xy = cell_xy[cells] if rows is None else mask_cell_centers(cell_xy, *rows)
+        tile_cache_file = cache_file.replace(".npz", f"_{i}.npz") if cache_file else ""
+        predictions = interpolate_window(points, tile_xy, species_values, year, cell_size, tile_cache_file, 1 if threaded else -1)
+        for species in predictions:
+            out[species_rows[species], cells] = predictions[species]
+            del species
+        del cells, rows, tile_xy, tile_cache_file, predictions
+
+    if threaded:
+        # Each tile writes its own columns of out
+        with ThreadPoolExecutor(max_workers=min(workers, len(tiles))) as executor:
+            list(executor.map(lambda tile: interpolate_tile(*tile), enumerate(tiles)))
+        del executor
+    else:
+        for i, tile in enumerate(tiles):
+            interpolate_tile(i, tile)
+            del i, tile
+
+    del tiles, threaded, interpolate_tile
+
+    return species_rows
+
+def window_values(samples, sample_index, point_index, species, year, n_points):
+    # The values for a species at the window points, NaN where the species
+    # was not recorded. When a species has more than one record for a point
+    # the mean is used. Null MapValue records are left out.
+    rows = index_rows(sample_index, species, window_years(year))
+    rows = rows[~np.isnan(samples["MapValue"][rows])]
+
+    total = np.bincount(point_index[rows], weights=samples["MapValue"][rows], minlength=n_points)
+    count = np.bincount(point_index[rows], minlength=n_points)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        values = np.where(count > 0, total / count, np.nan)
+
+    del rows, total, count
+
+    return values
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+#-------------------------------------------------------------------------------
+# Name:        image_statistics
+# Purpose:     Per-image statistics (minimum, maximum, sum, non-null count
+#              and checksum) for the biomass rasters, saved as a CSV file next
+#              to the images of a region
+#
+# Author:      john.f.kennedy
+#
+# Created:     10/18/2026
+# Copyright:   (c) john.f.kennedy 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+# The statistics are calculated by create_rasters_worker when it saves a
+# biomass raster, so the indicators and species richness workers can skip
+# the rasters without biomass by reading one file, instead of calling
+# GetRasterProperties for each raster. This module does not use arcpy.
+import os
+import csv
+import hashlib
+
+import numpy as np
+
+IMAGE_STATISTICS_FIELDS = ["ImageName", "Variable", "Species", "Year", "Minimum", "Maximum", "Sum", "Count", "Checksum"]
+
+def image_statistics_path(image_folder="", table_name=""):
+    # e.g. Images\AI_IDW\AI_IDW_Image_Statistics.csv
+    return os.path.join(image_folder, table_name, f"{table_name}_Image_Statistics.csv")
+
+def image_statistics(raster_array):
+    # Statistics for a raster read with nodata_to_value=np.nan. Minimum and
+    # Maximum are NaN when the raster only has Null cells.
+    raster_array = np.ascontiguousarray(raster_array, dtype=np.float32)
+
+    valid = ~np.isnan(raster_array)
+
+    count = int(np.count_nonzero(valid))
+
+    statistics = {"Minimum"  : float(np.min(raster_array[valid])) if count else float("nan"),
+                  "Maximum"  : float(np.max(raster_array[valid])) if count else float("nan"),
+                  "Sum"      : float(np.sum(raster_array[valid], dtype=np.float64)),
+                  "Count"    : count,
+                  # The checksum includes the shape, so a raster with a
+                  # different extent does not match
+                  "Checksum" : hashlib.md5(repr(raster_array.shape).encode() + raster_array.tobytes()).hexdigest(),}
+
+    del raster_array, valid, count
+
+    return statistics
+
+def strip_statistics(shape=(0, 0), strips=[], statistics=None):
+    # Yields the blocks of rows of a raster (in order) unchanged, and fills
+    # statistics with the values of image_statistics once the last one has
+    # been yielded, so a raster written block by block (see
+    # geotiff_writer.write_geotiff_strips) is never held in memory. The
+    # Checksum is the same, the Sum can differ in the last digits.
+    checksum = hashlib.md5(repr(tuple(int(n) for n in shape)).encode())
+    minimum, maximum, total, count = np.inf, -np.inf, 0.0, 0
+
+    for strip in strips:
+        strip = np.ascontiguousarray(strip, dtype=np.float32)
+        valid = strip[~np.isnan(strip)]
+        if valid.size:
+            minimum = min(minimum, float(np.min(valid)))
+            maximum = max(maximum, float(np.max(valid)))
+            total  += float(np.sum(valid, dtype=np.float64))
+            count  += int(valid.size)
+        checksum.update(strip.tobytes())
+        del valid
+        yield strip
+        del strip
+
+    if statistics is not None:
+        statistics.update({"Minimum"  : minimum if count else float("nan"),
+                           "Maximum"  : maximum if count else float("nan"),
+                           "Sum"      : total,
+                           "Count"    : count,
+                           "Checksum" : checksum.hexdigest(),})
+
+    del checksum, minimum, maximum, total, count
+
+def read_image_statistics(csv_file=""):
+    # Returns a dictionary of statistics keyed by ImageName, empty if the
+    # file does not exist. Minimum is NaN for the rows written before it was
+    # saved.
+    image_statistics = {}
+
+    if os.path.isfile(csv_file):
+        with open(csv_file, "r", newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                image_statistics[row["ImageName"]] = {"ImageName" : row["ImageName"],
+                                                      "Variable"  : row["Variable"],
+                                                      "Species"   : row["Species"],
+                                                      "Year"      : int(row["Year"]),
+                                                      "Minimum"   : float(row.get("Minimum") or "nan"),
+                                                      "Maximum"   : float(row["Maximum"]),
+                                                      "Sum"       : float(row["Sum"]),
+                                                      "Count"     : int(row["Count"]),
+                                                      "Checksum"  : row["Checksum"],}
+                del row
+            del f
+
+    return image_statistics
+
+def write_image_statistics(csv_file="", image_statistics={}):
+    # Adds or replaces the rows for the images in image_statistics and keeps
+    # the rows for the other images
+    rows = read_image_statistics(csv_file)
+    rows.update(image_statistics)
+
+    _write_rows(csv_file, rows)
+
+    del rows
+
+def remove_image_statistics(csv_file="", image_names=[]):
+    # Removes the rows for the images that are about to be written again, so
+    # a run that fails part way does not leave the old statistics (and
+    # checksums) of images it has already changed
+    rows = read_image_statistics(csv_file)
+
+    stale = [image_name for image_name in image_names if image_name in rows]
+
+    if stale:
+        for image_name in stale:
+            del rows[image_name]
+            del image_name
+        _write_rows(csv_file, rows)
+
+    del rows, stale
+
+def _write_rows(csv_file="", rows={}):
+    # The file is written to a temporary file first, so a failed run does
+    # not leave a partial file
+    tmp_file = f"{csv_file}.tmp"
+
+    with open(tmp_file, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=IMAGE_STATISTICS_FIELDS)
+        writer.writeheader()
+        for image_name in sorted(rows):
+            writer.writerow({field : rows[image_name][field] for field in IMAGE_STATISTICS_FIELDS})
+            del image_name
+        del writer, f
+
+    os.replace(tmp_file, csv_file)
+
+    del tmp_file
@@ -133,13 +133,19 @@ def worker(project_gdb="", csv_file=""):
         # value. So, we are changing that value to an empty string of ''.
         # https://community.esri.com/t5/python-blog/those-pesky-null-things/ba-p/902664
         # https://community.esri.com/t5/python-blog/numpy-snippets-6-much-ado-about-nothing-nan-stuff/ba-p/893702
-        df.fillna('', inplace=True)
+        # The numeric columns are read with their own dtypes, and keep NaN as
+        # Null. The others (text, categorical and nullable integer columns)
+        # are cast to objects so they can hold the empty string.
+        for column in df.columns:
+            if not pd.api.types.is_float_dtype(df[column]):
+                df[column] = df[column].astype(object).fillna('')
+            del column
         #df.fillna(np.nan)
         #df = df.replace({np.nan: None})
 
         arcpy.AddMessage(f">-> Creating the {table_name} Geodatabase Table")
         try:
-            array = np.array(np.rec.fromrecords(df.values), dtype = field_gdb_dtypes)
+            array = dismap.dataframe_to_array(df, field_gdb_dtypes)
         except:
             traceback.print_exc()
             raise Exception
@@ -257,7 +263,8 @@ def update_datecode(csv_file="", project=""):
         arcpy.env.overwriteOutput          = True
         arcpy.env.parallelProcessingFactor = "100%"
 
-        field_csv_dtypes = dismap.dTypesCSV(csv_data_folder, table_name)
+        # Read as text, so only the date code changes when the file is written
+        field_csv_dtypes = dismap.dTypesCSV(csv_data_folder, table_name, typed=False)
 
         arcpy.AddMessage(f"\tUpdating CSV file: {os.path.basename(csv_file)}")
         #arcpy.AddMessage(f"\t\t{csv_file}")
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+#-------------------------------------------------------------------------------
+# Name:        indicators_benchmark
+# Purpose:     Compare the per species-year indicators loop with the
+#              indicators engine on synthetic grids
+#
+# Author:      john.f.kennedy
+#
+# Created:     10/18/2026
+# Copyright:   (c) john.f.kennedy 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+import os, sys # built-ins first
+import traceback
+import importlib
+import math
+from time import perf_counter
+
+import numpy as np # third-parties second
+
+sys.path.append(os.path.dirname(__file__))
+
+def synthetic_region(rows=300, columns=400, seed=2024):
+    # Latitude, longitude and bathymetry grids for a region that crosses the
+    # international date line, with about 20% of the cells outside the mask
+    rng = np.random.default_rng(seed)
+
+    latitudeArray = np.repeat(np.linspace(60.0, 50.0, rows, dtype="float32")[:, None], columns, axis=1)
+
+    longitudeArray = np.repeat(np.linspace(170.0, 190.0, columns, dtype="float32")[None, :], rows, axis=0)
+    longitudeArray = np.where(longitudeArray > 180.0, longitudeArray - 360.0, longitudeArray).astype("float32")
+
+    bathymetryArray = (20.0 - rng.random((rows, columns)) * 500.0).astype("float32")
+
+    mask = rng.random((rows, columns)) < 0.8
+    for array in [latitudeArray, longitudeArray, bathymetryArray]:
+        array[~mask] = np.nan
+        del array
+
+    return rng, mask, latitudeArray, longitudeArray, bathymetryArray
+
+def synthetic_biomass(rng, mask, n_layers):
+    # Something like an interpolated biomass surface, a smooth patch of
+    # biomass with noise and zero biomass away from the center of the patch
+    rows, columns = np.indices(mask.shape)
+    for i in range(n_layers):
+        row, column = rng.random(2) * mask.shape
+        distance = np.hypot((rows - row) / mask.shape[0], (columns - column) / mask.shape[1])
+        biomassArray = (100.0 * np.exp(-8.0 * distance ** 2) * rng.random(mask.shape)).astype("float32")
+        biomassArray[distance > 0.6] = 0.0
+        biomassArray[~mask] = np.nan
+        yield biomassArray
+        del i, row, column, distance, biomassArray
+    del rows, columns
+
+def legacy_layer_indicators(biomassArray, latitudeArray, longitudeArray, bathymetryArray):
+    # The calculations as they were done in create_indicators_table_worker
+    # before the covariate cache, one covariate at a time
+    biomassArray = biomassArray.copy()
+    biomassArray[biomassArray <= 0.0] = np.nan
+
+    sumBiomassArray = np.nansum(biomassArray)
+
+    indicators = {}
+
+    for covariate, covariateArray in [["Latitude", latitudeArray], ["Longitude", np.mod(longitudeArray, 360.0)], ["Depth", bathymetryArray]]:
+        covariateArray = covariateArray.copy()
+        covariateArray[np.isnan(biomassArray)] = np.nan
+        if covariate == "Depth":
+            covariateArray[covariateArray >= 0.0] = 0.0
+
+        flatBiomassArray   = biomassArray.flatten()
+        flatCovariateArray = covariateArray.flatten()
+        inds               = flatCovariateArray.argsort()
+
+        sortedBiomassArrayQuantile = np.nancumsum(flatBiomassArray[inds]) / np.nansum(flatBiomassArray)
+        sortedCovariateArray       = flatCovariateArray[inds]
+
+        Maximum = sortedCovariateArray[np.abs(sortedBiomassArrayQuantile - 0.95).argmin()]
+        Minimum = sortedCovariateArray[np.abs(sortedBiomassArrayQuantile - 0.05).argmin()]
+
+        weightedArray = np.multiply(biomassArray, covariateArray)
+
+        CenterOfGravity   = np.nansum(weightedArray) / sumBiomassArray
+        CenterOfGravitySE = math.sqrt(np.nanvar(weightedArray)) / math.sqrt(np.count_nonzero(~np.isnan(weightedArray)))
+
+        indicators[covariate] = [CenterOfGravity, Minimum, Maximum, CenterOfGravitySE]
+
+        del covariate, covariateArray, flatBiomassArray, flatCovariateArray, inds
+        del sortedBiomassArrayQuantile, sortedCovariateArray, weightedArray
+
+    return indicators
+
+def main(rows=300, columns=400, n_layers=200):
+    try:
+        import indicators_engine
+        importlib.reload(indicators_engine)
+
+        np.seterr(divide='ignore', invalid='ignore')
+
+        print(f"Synthetic region: {rows} rows x {columns} columns, {n_layers} biomass rasters\n")
+
+        rng, mask, latitudeArray, longitudeArray, bathymetryArray = synthetic_region(rows, columns)
+        biomass_layers = list(synthetic_biomass(rng, mask, n_layers))
+        records = [["AI", "Aleutian Islands", "", "20240701", f"Species {i // 20}", "", "Yes", 2000 + i % 20, "", "IDW", "Yes"] for i in range(n_layers)]
+
+        # Legacy loop, the covariate rasters are sorted for every layer
+        start = perf_counter()
+        legacy = [legacy_layer_indicators(b, latitudeArray, longitudeArray, bathymetryArray) for b in biomass_layers]
+        legacy_time = perf_counter() - start
+
+        # Per layer loop using the region covariate cache
+        start = perf_counter()
+        covariates = indicators_engine.region_covariates(latitudeArray, longitudeArray, bathymetryArray)
+        cached = [indicators_engine.layer_indicators(b, covariates) for b in biomass_layers]
+        cached_time = perf_counter() - start
+
+        # Indicators table rows as a structured array, with the offsets
+        start = perf_counter()
+        covariates = indicators_engine.region_covariates(latitudeArray, longitudeArray, bathymetryArray)
+        engine = indicators_engine.indicators_array(records, iter(biomass_layers), covariates)
+        engine_time = perf_counter() - start
+
+        print(f"Legacy loop:          {legacy_time:8.3f} seconds")
+        print(f"Covariate cache loop: {cached_time:8.3f} seconds ({legacy_time / cached_time:5.1f}x)")
+        print(f"Indicators array:     {engine_time:8.3f} seconds ({legacy_time / engine_time:5.1f}x)\n")
+
+        # Largest differences from the legacy loop. The legacy loop sums the
+        # biomass in float32 and does not use a stable sort, so a range limit
+        # can be one cell away when two cells are nearly tied.
+        print("Largest difference from the legacy loop")
+        for covariate in indicators_engine.COVARIATES:
+            for i, indicator in enumerate(["CenterOfGravity", "Minimum", "Maximum", "CenterOfGravitySE"]):
+                expected = np.array([layer[covariate][i] for layer in legacy], dtype="float64")
+                if covariate == "Longitude" and indicator != "CenterOfGravitySE":
+                    expected = indicators_engine.longitude_180(expected)
+                cached_values = np.array([layer[covariate][indicator] for layer in cached], dtype="float64")
+                if covariate == "Longitude" and indicator != "CenterOfGravitySE":
+                    cached_values = indicators_engine.longitude_180(cached_values)
+                field = f"{indicator.replace('CenterOfGravitySE', 'CenterOfGravity')}{covariate}{'SE' if indicator.endswith('SE') else ''}"
+                print(f"{field:<28} cache: {np.nanmax(np.abs(cached_values - expected)):.6g} array: {np.nanmax(np.abs(engine[field] - expected)):.6g}")
+                del i, indicator, expected, cached_values, field
+            del covariate
+
+        del rng, mask, latitudeArray, longitudeArray, bathymetryArray
+        del biomass_layers, records, covariates, legacy, cached, engine, start
+        del legacy_time, cached_time, engine_time
+        del indicators_engine
+
+    except:
+        traceback.print_exc()
+
+if __name__ == '__main__':
+    try:
+        print(f"{'-' * 90}")
+        print(f"Python Script:  {os.path.basename(__file__)}")
+        print(f"Location:       {os.path.dirname(__file__)}")
+        print(f"Python Version: {sys.version} Environment: {os.path.basename(sys.exec_prefix)}")
+        print(f"{'-' * 90}\n")
+
+        main()
+
+    except SystemExit:
+        pass
+    except:
+        traceback.print_exc()
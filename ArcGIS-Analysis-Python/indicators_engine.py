@@ -0,0 +1,437 @@
+# -*- coding: utf-8 -*-
+#-------------------------------------------------------------------------------
+# Name:        indicators_engine
+# Purpose:     NumPy routines used to calculate the DisMAP distribution
+#              indicators (center of gravity, range limits and depth)
+#
+# Author:      john.f.kennedy
+#
+# Created:     10/18/2026
+# Copyright:   (c) john.f.kennedy 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+# This module only depends on NumPy so that it can be used (and checked)
+# outside of ArcGIS Pro. The arcpy reads and writes stay in the worker.
+import os
+import hashlib
+
+import numpy as np
+
+import weighted_quantile
+
+# The covariate grids, in the order they are reported in the Indicators table
+COVARIATES = ["Latitude", "Longitude", "Depth"]
+
+# Fields of the Indicators table (see table_definitions.json and
+# field_definitions.json in the CSV Data folder)
+INDICATORS_FIELDS = [
+                     ("DatasetCode",                "U20"),
+                     ("Region",                     "U40"),
+                     ("Season",                     "U10"),
+                     ("DateCode",                   "U10"),
+                     ("Species",                    "U50"),
+                     ("CommonName",                 "U40"),
+                     ("CoreSpecies",                "U5"),
+                     ("Year",                       "i2"),
+                     ("DistributionProjectName",    "U60"),
+                     ("DistributionProjectCode",    "U10"),
+                     ("SummaryProduct",             "U10"),
+                     ("CenterOfGravityLatitude",    "f8"),
+                     ("MinimumLatitude",            "f8"),
+                     ("MaximumLatitude",            "f8"),
+                     ("OffsetLatitude",             "f8"),
+                     ("CenterOfGravityLatitudeSE",  "f8"),
+                     ("CenterOfGravityLongitude",   "f8"),
+                     ("MinimumLongitude",           "f8"),
+                     ("MaximumLongitude",           "f8"),
+                     ("OffsetLongitude",            "f8"),
+                     ("CenterOfGravityLongitudeSE", "f8"),
+                     ("CenterOfGravityDepth",       "f8"),
+                     ("MinimumDepth",               "f8"),
+                     ("MaximumDepth",               "f8"),
+                     ("OffsetDepth",                "f8"),
+                     ("CenterOfGravityDepthSE",     "f8"),
+                    ]
+
+# The descriptive (non-calculated) fields at the start of each record
+RECORD_FIELDS = [field for field, dtype in INDICATORS_FIELDS[:11]]
+
+# Fields of the Zonal Indicators table, one row for each zone (a polygon of
+# the region's GeographicArea feature class) of each species-year
+ZONAL_FIELDS = INDICATORS_FIELDS[:11] + [
+                                         ("FilterSubRegion",          "U40"),
+                                         ("Zone",                     "i4"),
+                                         ("SumBiomass",               "f8"),
+                                         ("CenterOfGravityLatitude",  "f8"),
+                                         ("OffsetLatitude",           "f8"),
+                                         ("CenterOfGravityLongitude", "f8"),
+                                         ("OffsetLongitude",          "f8"),
+                                         ("CenterOfGravityDepth",     "f8"),
+                                         ("OffsetDepth",              "f8"),
+                                        ]
+
+# The fields calculated from each biomass raster by calculated_array, the
+# other fields are descriptive values or offsets
+CALCULATED_FIELDS = [f"{indicator}{covariate}{suffix}" for covariate in COVARIATES for indicator, suffix in [("CenterOfGravity", ""), ("Minimum", ""), ("Maximum", ""), ("CenterOfGravity", "SE")]]
+
+# Change when the calculations change, so the values saved in the
+# indicators ledgers are calculated again
+LEDGER_VERSION = 2
+
+def region_covariates(latitude_array, longitude_array, bathymetry_array):
+    # Everything that does not depend on the biomass raster is calculated
+    # once per region. The per species-year work is then a mask and a few
+    # reductions over these shared arrays.
+
+    # For issue of international date line
+    # Added/Modified by JFK June 15, 2022
+    longitude_array = np.mod(longitude_array, 360.0)
+
+    # For bathymetry values zero are larger, make zero
+    bathymetry_array = np.array(bathymetry_array, copy=True)
+    bathymetry_array[bathymetry_array >= 0.0] = 0.0
+
+    covariates = {"shape" : latitude_array.shape}
+
+    for covariate, array in zip(COVARIATES, [latitude_array, longitude_array, bathymetry_array]):
+        values = np.ascontiguousarray(array).ravel()
+        # order is an array of indexes representing the sort, Null cells
+        # (outside of the region) are left out
+        covariates[covariate] = {"values" : values,
+                                 "order"  : weighted_quantile.covariate_order(values),}
+        del covariate, array, values
+
+    del latitude_array, longitude_array, bathymetry_array
+
+    return covariates
+
+def layer_indicators(biomass_array, covariates):
+    # Returns the indicators for one biomass raster as a dictionary keyed by
+    # covariate, or None when the raster has no biomass
+
+    if biomass_array.shape != covariates["shape"]:
+        raise ValueError(f"Biomass raster shape {biomass_array.shape} does not match the region shape {covariates['shape']}")
+
+    flat_biomass = np.ascontiguousarray(biomass_array).ravel()
+
+    # Biomass cells that are Null or zero are left out
+    biomass_mask = flat_biomass > 0.0
+
+    biomass = flat_biomass[biomass_mask]
+
+    sum_biomass = np.sum(biomass)
+
+    if not sum_biomass > 0.0:
+        return None
+
+    indicators = {}
+
+    for covariate in COVARIATES:
+        values = covariates[covariate]["values"]
+        order  = covariates[covariate]["order"]
+
+        # Range limits (5th and 95th Percentile)
+        minimum, maximum = weighted_quantile.weighted_quantiles(values, flat_biomass, weighted_quantile.RANGE_QUANTILES, order=order)
+
+        weighted = biomass * values[biomass_mask]
+
+        center_of_gravity = np.nansum(weighted) / sum_biomass
+
+        standard_error = np.sqrt(np.nanvar(weighted)) / np.sqrt(np.count_nonzero(~np.isnan(weighted)))
+
+        indicators[covariate] = {"CenterOfGravity"   : center_of_gravity,
+                                 "Minimum"           : minimum,
+                                 "Maximum"           : maximum,
+                                 "CenterOfGravitySE" : standard_error,}
+
+        del values, order
+        del minimum, maximum, weighted, center_of_gravity, standard_error
+        del covariate
+
+    del flat_biomass, biomass_mask, biomass, sum_biomass
+
+    return indicators
+
+def longitude_180(longitude):
+    # Convert 360 back to 180
+    # Added/Modified by JFK June 15, 2022
+    return np.mod(longitude - 180.0, 360.0) - 180.0
+
+def calculated_array(count, biomass_layers, covariates):
+    # Calculates the CALCULATED_FIELDS for count rasters as a structured
+    # array, longitude values are left in the 0 to 360 range.
+    #   biomass_layers: an iterable of 2D biomass arrays, None is used for
+    #                   rasters without biomass (or that are not calculated)
+    #   covariates:     the dictionary returned by region_covariates
+    # The biomass rasters are read from the iterable one at a time, so only
+    # one raster is held in memory. Each raster is calculated with
+    # layer_indicators: a stacked version shared the sort order across
+    # rasters, but gathering a stack into covariate order costs as much as
+    # gathering each raster, and it was slower (see indicators_benchmark).
+
+    calculated = np.full(count, np.nan, dtype=[(field, "f8") for field in CALCULATED_FIELDS])
+
+    for i, biomass_array in enumerate(biomass_layers):
+        if i >= count:
+            raise ValueError("There are more biomass rasters than records")
+        if biomass_array is not None:
+            indicators = layer_indicators(biomass_array, covariates)
+            if indicators is not None:
+                calculated[i] = tuple(indicators[covariate][indicator] for covariate in COVARIATES for indicator in ["CenterOfGravity", "Minimum", "Maximum", "CenterOfGravitySE"])
+            del indicators
+        del i, biomass_array
+
+    return calculated
+
+def indicators_from_calculated(records, calculated):
+    # Builds the Indicators table rows for a region as a structured array
+    # from a list of the RECORD_FIELDS values and the calculated_array for
+    # the same rasters. The offsets are calculated here, across all of the
+    # years of each species in records.
+
+    indicators = np.zeros(len(records), dtype=INDICATORS_FIELDS)
+
+    # Null text values (e.g. Season) are stored as empty strings
+    for i, field in enumerate(RECORD_FIELDS):
+        indicators[field] = ["" if record[i] is None else record[i] for record in records]
+        del i, field
+
+    for field in [field for field, dtype in INDICATORS_FIELDS[11:]]:
+        indicators[field] = calculated[field] if field in CALCULATED_FIELDS else np.nan
+        del field
+
+    # ###--->>> Offsets
+    # The offset is the change in the center of gravity from the first year
+    # with biomass for the species. The raw (0 to 360) longitude is used.
+    order = np.lexsort((indicators["Year"], indicators["Species"]))
+    species, starts = np.unique(indicators["Species"][order], return_index=True)
+
+    for group in np.split(order, starts[1:]):
+        for covariate in COVARIATES:
+            center = calculated[f"CenterOfGravity{covariate}"][group]
+            valid = np.flatnonzero(~np.isnan(center))
+            if valid.size:
+                indicators[f"Offset{covariate}"][group] = center - center[valid[0]]
+            del covariate, center, valid
+        del group
+
+    del order, species, starts
+
+    # Convert 360 back to 180
+    # Added/Modified by JFK June 15, 2022
+    for field in ["CenterOfGravityLongitude", "MinimumLongitude", "MaximumLongitude"]:
+        indicators[field] = longitude_180(indicators[field])
+        del field
+
+    return indicators
+
+def indicators_array(records, biomass_layers, covariates):
+    # Builds the Indicators table rows for a region as a structured array.
+    #   records:        a list of the RECORD_FIELDS values, one per raster
+    #   biomass_layers: an iterable of 2D biomass arrays in the same order
+    #                   as records, None is used for rasters without biomass
+    #   covariates:     the dictionary returned by region_covariates
+    calculated = calculated_array(len(records), biomass_layers, covariates)
+    indicators = indicators_from_calculated(records, calculated)
+    del calculated
+    return indicators
+
+def covariates_checksum(covariates):
+    # A checksum of the region's covariate grids, used with the image
+    # checksum to key the indicators ledger (see indicators_ledger).
+    # LEDGER_VERSION is included so a change to the calculations does not
+    # reuse the old values.
+    md5 = hashlib.md5(f"{LEDGER_VERSION} {covariates['shape']}".encode())
+    for covariate in COVARIATES:
+        md5.update(np.ascontiguousarray(covariates[covariate]["values"], dtype=np.float64).tobytes())
+        del covariate
+    checksum = md5.hexdigest()
+    del md5
+    return checksum
+
+def zones_checksum(zones):
+    # A checksum of the region's zones and zone labels, used with the image
+    # and covariate checksums to key the zonal values in the indicators
+    # ledger
+    md5 = hashlib.md5(f"{LEDGER_VERSION} {len(zones['zones'])}".encode())
+    md5.update(np.ascontiguousarray(zones["zones"], dtype=np.int64).tobytes())
+    md5.update(np.ascontiguousarray(zones["labels"], dtype=np.int64).tobytes())
+    checksum = md5.hexdigest()
+    del md5
+    return checksum
+
+def null_groups(indicators):
+    # The geodatabase has Null values, NumPy does not. NaN values and empty
+    # text are Null, so the rows of an indicators array are grouped by the
+    # fields that are not Null. Returns a list of (fields, rows), where rows
+    # is an array of row indexes, in the order of the first row of each
+    # group. Rows without biomass, where all of the indicators are NaN, are
+    # usually the only other group.
+    names = indicators.dtype.names
+
+    null = np.empty((len(indicators), len(names)), dtype=bool)
+    for i, field in enumerate(names):
+        if indicators.dtype[field].kind == "f":
+            null[:, i] = np.isnan(indicators[field])
+        elif indicators.dtype[field].kind == "U":
+            null[:, i] = indicators[field] == ""
+        else:
+            null[:, i] = False
+        del i, field
+
+    patterns, inverse = np.unique(null, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+
+    groups = []
+    for i, pattern in enumerate(patterns):
+        fields = [field for field, is_null in zip(names, pattern) if not is_null]
+        groups.append((fields, np.flatnonzero(inverse == i)))
+        del i, pattern, fields
+
+    del names, null, patterns, inverse
+
+    return sorted(groups, key=lambda group: group[1][0])
+
+def region_zones(zone_array, covariates):
+    # The zone labels are calculated once per region. zone_array is the zone
+    # raster (e.g. the OBJECTID of the region's polygons) on the region grid,
+    # with 0 or NaN outside of the zones. Each cell gets the index of its
+    # zone, cells outside of the zones get len(zones) and are left out of
+    # the sums.
+    if zone_array.shape != covariates["shape"]:
+        raise ValueError(f"Zone raster shape {zone_array.shape} does not match the region shape {covariates['shape']}")
+
+    flat_zones = np.ascontiguousarray(zone_array, dtype=np.float64).ravel()
+
+    in_zone = flat_zones > 0.0
+
+    zones, inverse = np.unique(flat_zones[in_zone], return_inverse=True)
+
+    labels = np.full(flat_zones.size, len(zones), dtype=np.intp)
+    labels[in_zone] = inverse.ravel()
+
+    del flat_zones, in_zone, inverse
+
+    return {"labels" : labels, "zones" : zones.astype(np.int32), "filled" : _filled_covariates(covariates),}
+
+def _filled_covariates(covariates):
+    # Null covariate cells add nothing to the weighted sums
+    return {covariate : np.where(np.isnan(covariates[covariate]["values"]), 0.0, covariates[covariate]["values"]) for covariate in COVARIATES}
+
+def save_region_arrays(npz_file="", covariates=None, zones=None):
+    # Saves the covariates and the zones (None when the region has no zones)
+    # of a region to a .npz file, so the tasks of a split region load them in
+    # place of reading and sorting the rasters again (see
+    # create_indicators_table_worker.worker_tasks). Written to a temporary
+    # file first, so a failed run does not leave a partial file.
+    arrays = {"shape" : np.array(covariates["shape"])}
+    for covariate in COVARIATES:
+        arrays[f"{covariate}_values"] = covariates[covariate]["values"]
+        arrays[f"{covariate}_order"]  = covariates[covariate]["order"]
+        del covariate
+    if zones is not None:
+        arrays["zone_labels"] = zones["labels"]
+        arrays["zones"]       = zones["zones"]
+
+    tmp_file = f"{npz_file}.tmp.npz"
+    np.savez(tmp_file, **arrays)
+    os.replace(tmp_file, npz_file)
+
+    del arrays, tmp_file
+
+def load_region_arrays(npz_file=""):
+    # Returns the covariates and zones saved by save_region_arrays
+    with np.load(npz_file) as npz:
+        covariates = {"shape" : tuple(int(n) for n in npz["shape"])}
+        for covariate in COVARIATES:
+            covariates[covariate] = {"values" : npz[f"{covariate}_values"], "order" : npz[f"{covariate}_order"],}
+            del covariate
+        if "zones" in npz.files:
+            zones = {"labels" : npz["zone_labels"], "zones" : npz["zones"], "filled" : _filled_covariates(covariates),}
+        else:
+            zones = None
+
+    return covariates, zones
+
+def zonal_indicators(biomass_array, zones):
+    # The sum of biomass and the center of gravity of every zone for one
+    # biomass raster, from one np.bincount per value over the whole grid
+    # instead of a masked pass for each zone. Longitude is left in the 0 to
+    # 360 range. Zones without biomass are NaN.
+    labels  = zones["labels"]
+    n_zones = len(zones["zones"])
+
+    weights = np.ascontiguousarray(biomass_array).ravel()
+    weights = np.where(weights > 0.0, weights, 0.0).astype(np.float64)
+
+    sum_biomass = np.bincount(labels, weights=weights, minlength=n_zones + 1)[:n_zones]
+
+    has_biomass = sum_biomass > 0.0
+
+    divisor = np.where(has_biomass, sum_biomass, np.nan)
+
+    indicators = {"SumBiomass" : np.where(has_biomass, sum_biomass, np.nan)}
+
+    for covariate in COVARIATES:
+        indicators[covariate] = np.bincount(labels, weights=weights * zones["filled"][covariate], minlength=n_zones + 1)[:n_zones] / divisor
+        del covariate
+
+    del labels, n_zones, weights, sum_biomass, has_biomass, divisor
+
+    return indicators
+
+def zonal_array(records, zonal_layers, zones, filter_subregion=""):
+    # Builds the Zonal Indicators table rows as a structured array, one row
+    # for each zone of each record.
+    #   records:      a list of the RECORD_FIELDS values, one per raster
+    #   zonal_layers: the zonal_indicators for each record, None is used for
+    #                 rasters without biomass
+    # The offsets are the change in the zone's center of gravity from the
+    # first year with biomass in the zone for the species.
+    n_zones = len(zones["zones"])
+
+    zonal = np.zeros(len(records) * n_zones, dtype=ZONAL_FIELDS)
+
+    # Null text values (e.g. Season) are stored as empty strings
+    for i, field in enumerate(RECORD_FIELDS):
+        zonal[field] = np.repeat(np.array(["" if record[i] is None else record[i] for record in records], dtype=zonal.dtype[field]), n_zones)
+        del i, field
+
+    zonal["FilterSubRegion"] = "" if filter_subregion is None else filter_subregion
+    zonal["Zone"] = np.tile(zones["zones"], len(records))
+
+    for field in [field for field, dtype in ZONAL_FIELDS[13:]] + ["SumBiomass"]:
+        zonal[field] = np.nan
+        del field
+
+    for i, layer in enumerate(zonal_layers):
+        if layer is not None:
+            rows = slice(i * n_zones, (i + 1) * n_zones)
+            zonal["SumBiomass"][rows] = layer["SumBiomass"]
+            for covariate in COVARIATES:
+                zonal[f"CenterOfGravity{covariate}"][rows] = layer[covariate]
+                del covariate
+            del rows
+        del i, layer
+
+    # ###--->>> Offsets
+    order = np.lexsort((zonal["Year"], zonal["Zone"], zonal["Species"]))
+    keys = np.stack([zonal["Species"][order], zonal["Zone"][order].astype(str)], axis=1)
+    starts = np.flatnonzero(np.any(keys[1:] != keys[:-1], axis=1)) + 1 if len(order) else np.array([], dtype=np.intp)
+
+    for group in np.split(order, starts):
+        for covariate in COVARIATES:
+            center = zonal[f"CenterOfGravity{covariate}"][group]
+            valid = np.flatnonzero(~np.isnan(center))
+            if valid.size:
+                zonal[f"Offset{covariate}"][group] = center - center[valid[0]]
+            del covariate, center, valid
+        del group
+
+    del order, keys, starts, n_zones
+
+    # Convert 360 back to 180
+    # Added/Modified by JFK June 15, 2022
+    zonal["CenterOfGravityLongitude"] = longitude_180(zonal["CenterOfGravityLongitude"])
+
+    return zonal
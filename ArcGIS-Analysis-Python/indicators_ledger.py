@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+#-------------------------------------------------------------------------------
+# Name:        indicators_ledger
+# Purpose:     The calculated indicators for each biomass raster, keyed by
+#              the image checksum and the covariate grid checksum, saved as
+#              a CSV file next to the images of a region
+#
+# Author:      john.f.kennedy
+#
+# Created:     10/18/2026
+# Copyright:   (c) john.f.kennedy 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+# Used by create_indicators_table_worker, so only the biomass rasters that
+# are new or have changed (or all of them, when the Latitude, Longitude or
+# Bathymetry grids change) are read and calculated again. The offsets are
+# not saved, they are calculated across the years of each species on every
+# run. The values are written with repr, so they are read back unchanged.
+# When the region has zones, the zonal values of each raster are saved in a
+# second file, a row for each zone, keyed by the same checksums and the
+# zone checksum, so the unchanged rasters are not read for their zones.
+# This module does not use arcpy.
+import os
+import csv
+
+import numpy as np
+
+from indicators_engine import CALCULATED_FIELDS, COVARIATES
+
+INDICATORS_LEDGER_FIELDS = ["ImageName", "Checksum", "CovariateChecksum"] + CALCULATED_FIELDS
+
+# The zonal_indicators values, as they are named in the Zonal Indicators table
+ZONAL_VALUE_FIELDS  = ["SumBiomass"] + [f"CenterOfGravity{covariate}" for covariate in COVARIATES]
+ZONAL_LEDGER_FIELDS = ["ImageName", "Checksum", "CovariateChecksum", "ZoneChecksum", "Zone"] + ZONAL_VALUE_FIELDS
+
+def indicators_ledger_path(image_folder="", table_name=""):
+    # e.g. Images\AI_IDW\AI_IDW_Indicators_Ledger.csv
+    return os.path.join(image_folder, table_name, f"{table_name}_Indicators_Ledger.csv")
+
+def zonal_ledger_path(image_folder="", table_name=""):
+    # e.g. Images\AI_IDW\AI_IDW_Zonal_Ledger.csv
+    return os.path.join(image_folder, table_name, f"{table_name}_Zonal_Ledger.csv")
+
+def read_indicators_ledger(csv_file="", zonal_csv_file=""):
+    # Returns a dictionary of entries keyed by ImageName, empty if the file
+    # does not exist. The zonal values in zonal_csv_file are added to the
+    # entries with the same checksums, as ZoneChecksum and Zonal (a
+    # dictionary of Zone and the ZONAL_VALUE_FIELDS arrays, in zone order).
+    ledger = {}
+
+    if os.path.isfile(csv_file):
+        with open(csv_file, "r", newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                ledger[row["ImageName"]] = {"ImageName"         : row["ImageName"],
+                                            "Checksum"          : row["Checksum"],
+                                            "CovariateChecksum" : row["CovariateChecksum"],}
+                ledger[row["ImageName"]].update({field : float(row[field]) for field in CALCULATED_FIELDS})
+                del row
+            del f
+
+    if zonal_csv_file and os.path.isfile(zonal_csv_file):
+        zonal_rows = {}
+        with open(zonal_csv_file, "r", newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                zonal_rows.setdefault(row["ImageName"], []).append(row)
+                del row
+            del f
+
+        for image_name, rows in zonal_rows.items():
+            entry = ledger.get(image_name)
+            if entry is not None and all(row["Checksum"] == entry["Checksum"] and row["CovariateChecksum"] == entry["CovariateChecksum"] and row["ZoneChecksum"] == rows[0]["ZoneChecksum"] for row in rows):
+                entry["ZoneChecksum"] = rows[0]["ZoneChecksum"]
+                entry["Zonal"] = {"Zone" : np.array([int(row["Zone"]) for row in rows], dtype=np.int32)}
+                entry["Zonal"].update({field : np.array([float(row[field]) for row in rows]) for field in ZONAL_VALUE_FIELDS})
+            del image_name, rows, entry
+
+        del zonal_rows
+
+    return ledger
+
+def zonal_entry(zone_checksum="", zones=None, layer=None):
+    # The ZoneChecksum and Zonal values of a ledger entry, from the zone
+    # checksum and zones (see indicators_engine.zones_checksum and
+    # region_zones) and the zonal_indicators of a raster
+    return {"ZoneChecksum" : zone_checksum,
+            "Zonal"        : dict({"Zone" : zones["zones"], "SumBiomass" : layer["SumBiomass"]}, **{f"CenterOfGravity{covariate}" : layer[covariate] for covariate in COVARIATES}),}
+
+def zonal_ledger_values(ledger={}, image_name="", checksum="", covariate_checksum="", zone_checksum=""):
+    # The zonal_indicators saved for an image, or None when the image has no
+    # zonal values in the ledger or a checksum (image, covariates or zones)
+    # does not match
+    if ledger_values(ledger, image_name, checksum, covariate_checksum) is None or not zone_checksum or ledger[image_name].get("ZoneChecksum") != zone_checksum:
+        return None
+
+    zonal = ledger[image_name]["Zonal"]
+
+    return dict({"SumBiomass" : zonal["SumBiomass"]}, **{covariate : zonal[f"CenterOfGravity{covariate}"] for covariate in COVARIATES})
+
+def ledger_values(ledger={}, image_name="", checksum="", covariate_checksum=""):
+    # The CALCULATED_FIELDS values saved for an image, or None when the image
+    # is not in the ledger or either checksum does not match
+    entry = ledger.get(image_name)
+
+    if entry is None or not checksum or entry["Checksum"] != checksum or entry["CovariateChecksum"] != covariate_checksum:
+        return None
+
+    return tuple(entry[field] for field in CALCULATED_FIELDS)
+
+def write_indicators_ledger(csv_file="", ledger={}, zonal_csv_file=""):
+    # Adds or replaces the entries for the images in ledger and keeps the
+    # entries for the other images. The zonal values of the entries that
+    # have them are written to zonal_csv_file. The files are written to a
+    # temporary file first, so a failed run does not leave a partial file.
+    rows = read_indicators_ledger(csv_file, zonal_csv_file)
+    rows.update(ledger)
+
+    tmp_file = f"{csv_file}.tmp"
+
+    with open(tmp_file, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=INDICATORS_LEDGER_FIELDS)
+        writer.writeheader()
+        for image_name in sorted(rows):
+            row = {field : rows[image_name][field] for field in INDICATORS_LEDGER_FIELDS}
+            row.update({field : repr(float(row[field])) for field in CALCULATED_FIELDS})
+            writer.writerow(row)
+            del image_name, row
+        del writer, f
+
+    os.replace(tmp_file, csv_file)
+
+    if zonal_csv_file:
+        tmp_file = f"{zonal_csv_file}.tmp"
+
+        with open(tmp_file, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=ZONAL_LEDGER_FIELDS)
+            writer.writeheader()
+            for image_name in sorted(image_name for image_name in rows if "Zonal" in rows[image_name]):
+                entry = rows[image_name]
+                for i, zone in enumerate(entry["Zonal"]["Zone"]):
+                    row = {field : entry[field] for field in ["ImageName", "Checksum", "CovariateChecksum", "ZoneChecksum"]}
+                    row["Zone"] = int(zone)
+                    row.update({field : repr(float(entry["Zonal"][field][i])) for field in ZONAL_VALUE_FIELDS})
+                    writer.writerow(row)
+                    del i, zone, row
+                del image_name, entry
+            del writer, f
+
+        os.replace(tmp_file, zonal_csv_file)
+
+    del rows, tmp_file
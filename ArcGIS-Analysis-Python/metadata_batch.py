@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+#-------------------------------------------------------------------------------
+# Name:        metadata_batch
+# Purpose:     Applies the dataset titles and the POC template to a list of
+#              datasets, one after the other or in a multiprocessing Pool,
+#              and reports the time taken for each dataset
+#
+# Author:      john.f.kennedy
+#
+# Created:     10/18/2026
+# Copyright:   (c) john.f.kennedy 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+import os, sys # built-ins first
+import traceback
+import importlib
+import inspect
+
+import arcpy # third-parties second
+
+sys.path.append(os.path.dirname(__file__))
+
+# dismap is reloaded once, when this module is imported, and not for each
+# import_metadata call
+import dismap
+importlib.reload(dismap)
+
+def line_info(msg):
+    f = inspect.currentframe()
+    i = inspect.getframeinfo(f.f_back)
+    return f"Script: {os.path.basename(i.filename)}\n\tNear Line: {i.lineno}\n\tFunction: {i.function}\n\tMessage: {msg}"
+
+def dataset_project_gdb(dataset=""):
+    # The name used for the dataset in the title dictionary and the project
+    # GDB of the dataset. A CRF is in the CRFs folder next to the project GDB.
+    dataset_name = os.path.basename(dataset)
+
+    if dataset_name.endswith(".crf"):
+        dataset_name = dataset_name.replace(".crf", "_CRF")
+        _project = os.path.basename(os.path.dirname(os.path.dirname(dataset)))
+        project_gdb = rf"{os.path.dirname(os.path.dirname(dataset))}\{_project}.gdb"
+        del _project
+    else:
+        project_gdb = os.path.dirname(dataset)
+
+    return dataset_name, project_gdb
+
+def geodatabase_datasets(project_gdb=""):
+    # All of the datasets in the project GDB and in the project's CRFs folder
+    workspaces = [project_gdb, rf"{os.path.dirname(project_gdb)}\CRFs"]
+
+    datasets = []
+    for workspace in workspaces:
+        if not arcpy.Exists(workspace):
+            continue
+        for dirpath, dirnames, filenames in arcpy.da.Walk(workspace):
+            datasets.extend(os.path.join(dirpath, filename) for filename in filenames)
+            del dirpath, dirnames, filenames
+        del workspace
+
+    del workspaces
+
+    return sorted(datasets)
+
+def dataset_workspace(dataset=""):
+    # The file geodatabase that holds the dataset, or the dataset itself for
+    # a CRF, which is its own file. The metadata of datasets in the same
+    # geodatabase is saved by one process, so they do not take schema locks
+    # on the geodatabase at the same time.
+    workspace = dataset
+    while workspace and not workspace.lower().endswith(".gdb") and os.path.dirname(workspace) != workspace:
+        workspace = os.path.dirname(workspace)
+    return workspace if workspace.lower().endswith(".gdb") else dataset
+
+def check_template(poc_template=""):
+    # The POC template is parsed once, before any dataset is changed. A
+    # missing or broken template is skipped with a warning, as it was
+    # before the batch, so the titles are still applied (e.g. to the tables
+    # in a Scratch geodatabase, which has no ArcGIS Metadata folder).
+    import xml.etree.ElementTree as ET
+
+    if not os.path.isfile(poc_template):
+        arcpy.AddWarning(f"\t{poc_template} is missing, the POC template is not applied")
+        del ET
+        return False
+    try:
+        ET.parse(poc_template)
+    except ET.ParseError as pe:
+        arcpy.AddWarning(f"\t{os.path.basename(poc_template)} can not be parsed, the POC template is not applied: {pe}")
+        del ET
+        return False
+
+    del ET
+
+    return True
+
+def apply_metadata(job):
+    # Applies the titles and the POC template to one dataset and saves the
+    # metadata as XML in the metadata folder. Runs in the Pool process, so the
+    # exception is returned as text (see director_runner.run_worker).
+    from time import perf_counter
+
+    dataset, titles, poc_template, metadata_folder = job
+
+    start = perf_counter()
+    try:
+        from arcpy import metadata as md
+
+        # dismap is reloaded when this module is imported, not for each dataset
+        import dismap
+
+        arcpy.env.overwriteOutput          = True
+        arcpy.env.parallelProcessingFactor = "100%"
+        arcpy.env.workspace                = dataset_project_gdb(dataset)[1]
+        arcpy.SetLogMetadata(True)
+
+        # https://pro.arcgis.com/en/pro-app/latest/arcpy/metadata/metadata-class.htm
+        dataset_md = md.Metadata(dataset)
+        dataset_md.synchronize("ALWAYS")
+        dataset_md.title             = titles["Dataset Service Title"]
+        dataset_md.tags              = titles["Tags"]
+        dataset_md.summary           = titles["Summary"]
+        dataset_md.description       = titles["Description"]
+        dataset_md.credits           = titles["Credits"]
+        dataset_md.accessConstraints = titles["Access Constraints"]
+        dataset_md.save()
+        dataset_md.reload()
+
+        # poc_template is empty when the template is missing
+        if poc_template:
+            dataset_md.importMetadata(poc_template)
+            dataset_md.synchronize("SELECTIVE")
+            dataset_md.save()
+
+        if os.path.isdir(metadata_folder):
+            out_xml = rf"{metadata_folder}\{dataset_md.title}.xml"
+            dataset_md.saveAsXML(out_xml, "REMOVE_MACHINE_NAMES")
+
+            dismap.pretty_format_xml_file(out_xml)
+
+            del out_xml
+
+        del dataset_md, md, dismap
+
+        error = ""
+    except BaseException:
+        error = traceback.format_exc()
+
+    return dataset, perf_counter() - start, error
+
+def apply_metadata_workspace(jobs):
+    # Applies the metadata to the datasets of one workspace (see
+    # dataset_workspace), one after the other in the same Pool process
+    return [apply_metadata(job) for job in jobs]
+
+def apply_metadata_batch(datasets=[], Sequential=True):
+    # Applies the metadata to each dataset in the list and returns a list of
+    # [dataset, seconds]. The titles are looked up once for each project GDB
+    # and the POC template is checked once for each metadata folder. With
+    # Sequential=False the workspaces run in parallel, and the datasets of a
+    # workspace run one after the other. A dataset that fails does not stop
+    # the other datasets; a SystemExit listing the failed datasets is raised
+    # at the end.
+    from time import perf_counter
+
+    start = perf_counter()
+
+    metadata_dictionaries, templates, jobs = {}, {}, []
+
+    for dataset in datasets:
+        dataset_name, project_gdb = dataset_project_gdb(dataset)
+
+        if project_gdb not in metadata_dictionaries:
+            metadata_dictionaries[project_gdb] = dismap.dataset_title_dict(project_gdb)
+
+        if dataset_name not in metadata_dictionaries[project_gdb]:
+            arcpy.AddWarning(f"\t{dataset_name} is not in the dataset titles for {os.path.basename(project_gdb)}, skipping")
+            del dataset, dataset_name, project_gdb
+            continue
+
+        metadata_folder = rf"{os.path.dirname(project_gdb)}\ArcGIS Metadata"
+        poc_template    = rf"{metadata_folder}\poc_template.xml"
+
+        if poc_template not in templates:
+            templates[poc_template] = check_template(poc_template)
+
+        jobs.append([dataset, metadata_dictionaries[project_gdb][dataset_name], poc_template if templates[poc_template] else "", metadata_folder])
+
+        del dataset, dataset_name, project_gdb, metadata_folder, poc_template
+
+    del metadata_dictionaries, templates
+
+    results, failed = [], []
+
+    def collect(dataset, seconds, error):
+        if error:
+            arcpy.AddError(f"Metadata for {os.path.basename(dataset)} failed after {dismap.convertSeconds(seconds)}\n{error}")
+            failed.append(dataset)
+            return
+        arcpy.AddMessage(f"\tMetadata for: {os.path.basename(dataset)}. Elapsed Time {dismap.convertSeconds(seconds)} (H:M:S)")
+        results.append([dataset, seconds])
+
+    # The jobs of each workspace, in the order of the datasets
+    workspaces = {}
+    for job in jobs:
+        workspaces.setdefault(dataset_workspace(job[0]), []).append(job)
+        del job
+
+    if Sequential or len(workspaces) < 2:
+        for job in jobs:
+            collect(*apply_metadata(job))
+            del job
+    else:
+        import multiprocessing
+
+        arcpy.env.autoCancelling = True
+
+        sys.path.append(sys.exec_prefix)
+
+        #Set multiprocessing exe in case we're running as an embedded process, i.e ArcGIS
+        multiprocessing.set_executable(os.path.join(sys.exec_prefix, 'pythonw.exe'))
+
+        # Get CPU count and then take 2 away for other process
+        _processes = max(multiprocessing.cpu_count() - 2, 1)
+        _processes = _processes if len(workspaces) >= _processes else len(workspaces)
+        arcpy.AddMessage(f"Applying metadata to {len(jobs)} datasets in {len(workspaces)} workspaces with {_processes} processes")
+        #Let each worker process only handle 10 tasks before being restarted (in case of nasty memory leaks)
+        with multiprocessing.Pool(processes=_processes, maxtasksperchild=10) as pool:
+            for workspace_results in pool.imap_unordered(apply_metadata_workspace, list(workspaces.values()), chunksize=1):
+                for dataset, seconds, error in workspace_results:
+                    collect(dataset, seconds, error)
+                    del dataset, seconds, error
+                del workspace_results
+            pool.close()
+            pool.join()
+            del pool
+
+        del _processes, multiprocessing
+
+    arcpy.AddMessage(f"Metadata for {len(results)} datasets. Elapsed Time {dismap.convertSeconds(perf_counter() - start)} (H:M:S)")
+
+    if failed:
+        raise SystemExit(line_info(f"The metadata failed for: {', '.join(os.path.basename(dataset) for dataset in failed)}"))
+
+    del jobs, workspaces, failed, collect, start, perf_counter
+
+    return results
+
+def main(project="", Sequential=True):
+    try:
+        # Set basic arcpy.env variables
+        arcpy.env.overwriteOutput          = True
+        arcpy.env.parallelProcessingFactor = "100%"
+
+        base_project_folder = os.path.dirname(os.path.dirname(__file__))
+        project_gdb = rf"{base_project_folder}\{project}\{project}.gdb"
+        del base_project_folder
+
+        # Test if passed workspace exists, if not raise SystemExit
+        if not arcpy.Exists(project_gdb):
+            raise SystemExit(line_info(f"{os.path.basename(project_gdb)} is missing!!"))
+
+        results = apply_metadata_batch(geodatabase_datasets(project_gdb), Sequential)
+
+        del project_gdb
+
+    except SystemExit:
+        traceback.print_exc()
+        raise SystemExit
+    except:
+        traceback.print_exc()
+        raise SystemExit
+    else:
+        return results
+
+if __name__ == '__main__':
+    try:
+        print(f"{'-' * 90}")
+        print(f"Python Script:  {os.path.basename(__file__)}")
+        print(f"Location:       {os.path.dirname(__file__)}")
+        print(f"Python Version: {sys.version} Environment: {os.path.basename(sys.exec_prefix)}")
+        print(f"{'-' * 90}\n")
+
+        project = arcpy.GetParameterAsText(0)
+
+        if not project:
+            project = "July 1 2024"
+
+        main(project=project, Sequential=False)
+
+        del project
+
+        from time import localtime, strftime
+        print(f"\n{'-' * 90}")
+        print(f"Python script: {os.path.basename(__file__)} successfully completed {strftime('%a %b %d %I:%M %p', localtime())}")
+        print(f"{'-' * 90}")
+        del localtime, strftime
+
+    except SystemExit:
+        pass
+    except:
+        traceback.print_exc()
+    else:
+        pass
+    finally:
+        pass
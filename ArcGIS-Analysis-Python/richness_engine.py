@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+#-------------------------------------------------------------------------------
+# Name:        richness_engine
+# Purpose:     NumPy routines used to count the species present in each cell
+#              for the Species Richness and Core Species Richness rasters
+#
+# Author:      john.f.kennedy
+#
+# Created:     10/18/2026
+# Copyright:   (c) john.f.kennedy 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+# This module only depends on NumPy so that it can be used (and checked)
+# outside of ArcGIS Pro. The arcpy reads and writes stay in the worker.
+import numpy as np
+
+def richness_counts(layers, shape):
+    # Counts the species present (biomass > 0) in each cell. layers is an
+    # iterable of (raster_array, all_species, core_species), where the flags
+    # say if the layer is counted for all species, for the core species or
+    # both, so each raster is read once. A NoData (NaN) or negative cell in
+    # any counted layer makes the cell Null. Returns all_counts, all_null,
+    # core_counts, core_null; the counts are uint16.
+    all_counts  = np.zeros(shape, dtype=np.uint16)
+    core_counts = np.zeros(shape, dtype=np.uint16)
+    all_null    = np.zeros(shape, dtype=bool)
+    core_null   = np.zeros(shape, dtype=bool)
+
+    for raster_array, all_species, core_species in layers:
+        # NaN compares False, so it is neither present nor negative
+        present = raster_array > 0.0
+        null    = np.isnan(raster_array) | (raster_array < 0.0)
+        if all_species:
+            all_counts += present
+            all_null   |= null
+        if core_species:
+            core_counts += present
+            core_null   |= null
+        del raster_array, all_species, core_species, present, null
+
+    return all_counts, all_null, core_counts, core_null
+
+def richness_array(counts, null):
+    # The float32 array written to the richness raster, NaN where Null
+    richness = counts.astype(np.float32)
+    richness[null] = np.nan
+    return richness
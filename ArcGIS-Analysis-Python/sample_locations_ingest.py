@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+#-------------------------------------------------------------------------------
+# Name:        sample_locations_ingest
+# Purpose:     Reads a regional survey CSV file in chunks of rows and applies
+#              the DisMAP columns and values to each chunk
+#
+# Author:      john.f.kennedy
+#
+# Created:     10/18/2026
+# Copyright:   (c) john.f.kennedy 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+# Used by create_region_sample_locations_worker. Each chunk is handed to a
+# writer function, so only one chunk of the CSV file is in memory at a time.
+# The worker's writer adds the chunk to the geodatabase table, other writers
+# (e.g. a list.append) can be used to check the chunks. This module does not
+# use arcpy.
+import numpy as np
+import pandas as pd
+
+# Number of CSV rows read at a time
+CHUNK_SIZE = 500000
+
+# Old -> year, lon_UTM, lat_UTM, lat, lon, depth_m, median_est,                        spp_sci, spp_common, wtcpue, transformed_value, transform_unit
+# New -> year, Easting, Northing,          depth_m, median_est, mean_est, est5, est95, spp_sci, spp_common
+
+# Rename columns using the dictionary below and the defined list of field names
+# Easting,Northing,year,depth_m,median_est,mean_est,est5,est95,spp_sci,spp_common
+# mean_est, est5, est95
+COLUMN_NAMES = {
+                "common"                  : "CommonName",
+                "depth"                   : "Depth",
+                "depth_m"                 : "Depth",
+                "DistributionProjectName" : "DistributionProjectName",
+                "est5"                    : "Estimate5",
+                "est95"                   : "Estimate95",
+                "haulid"                  : "SampleID",
+                "lat"                     : "Latitude",
+                "lat_UTM"                 : "Northing",
+                "lon"                     : "Longitude",
+                "lon_UTM"                 : "Easting",
+                "mean_est"                : "MeanEstimate",
+                "median_est"              : "MedianEstimate",
+                "region"                  : "Region",
+                "sampleid"                : "SampleID",
+                "spp"                     : "Species",
+                "spp_common"              : "CommonName",
+                "spp_sci"                 : "Species",
+                "stratum"                 : "Stratum",
+                "stratumarea"             : "StratumArea",
+                "transformed"             : "MapValue",
+                "wtcpue"                  : "WTCPUE",
+                "year"                    : "Year",
+               }
+
+def csv_dtypes(field_csv_dtypes={}):
+    # The CSV files use the survey column names (year, spp, wtcpue, . . .),
+    # so the dtypes are also given for the columns that are renamed
+    dtypes = dict(field_csv_dtypes)
+    dtypes.update({column : field_csv_dtypes[field] for column, field in COLUMN_NAMES.items() if field in field_csv_dtypes and column not in field_csv_dtypes})
+    return dtypes
+
+def combined_names(species, common, pattern="{species} ({common})"):
+    # pattern applied to the Species and CommonName of each row, or "" when
+    # there is no CommonName, as a categorical column. Both columns are
+    # categorical, so the names are made once for each pair of species and
+    # common name in the chunk. A Null Species with a CommonName gives a
+    # Null name (written as 'nan'), as the text columns did, where
+    # Species + ' (' + CommonName + ')' was NaN.
+    # The codes are moved up by one, so a Null (code -1) is the first name
+    species_names = [None] + [str(name) for name in species.cat.categories]
+    common_names  = [""] + [str(name) for name in common.cat.categories]
+
+    pairs = (species.cat.codes.to_numpy(dtype=np.int64) + 1) * len(common_names) + (common.cat.codes.to_numpy(dtype=np.int64) + 1)
+    pairs, inverse = np.unique(pairs, return_inverse=True)
+
+    names = []
+    for pair in pairs.tolist():
+        species_name, common_name = species_names[pair // len(common_names)], common_names[pair % len(common_names)]
+        if common_name == "":
+            names.append("")
+        elif species_name is None:
+            names.append(np.nan)
+        else:
+            names.append(pattern.format(species=species_name, common=common_name))
+        del pair, species_name, common_name
+
+    # A Null name has code -1
+    name_codes, categories = pd.factorize(np.asarray(names, dtype=object))
+
+    result = pd.Series(pd.Categorical.from_codes(name_codes[inverse.ravel()], categories=categories), index=species.index)
+
+    del species_names, common_names, pairs, inverse, names, name_codes, categories
+
+    return result
+
+def transform_frame(df, table_name="", datasetcode="", region="", season=None, table_definition=[], verbose=True):
+    # Renames the columns, adds the DisMAP columns and returns the DataFrame
+    # with the columns of table_definition, in that order. The messages are
+    # only printed when verbose is True (e.g. for the first chunk).
+    def message(msg):
+        if verbose:
+            print(msg, flush=True)
+
+    df.rename(columns=COLUMN_NAMES, inplace=True)
+
+    # ###--->>>
+    message(f"Inserting additional columns into the dataframe\n")
+
+    message(f"\tInserting 'DatasetCode' column into: {table_name}")
+    df.insert(0, "DatasetCode", datasetcode)
+
+    message(f"\tInserting 'Region' column into: {table_name}")
+    if "Region" not in list(df.columns):
+        df.insert(df.columns.get_loc("DatasetCode")+1, "Region", f"{region}")
+
+    message(f"\tInserting 'StdTime' column into: {table_name}")
+    if "StdTime" not in list(df.columns):
+        df.insert(df.columns.get_loc("Year")+1, "StdTime", pd.to_datetime(df["Year"], format="%Y").dt.tz_localize('Etc/GMT+12'))
+
+    message(f"\tInserting 'MapValue' column into: {table_name}")
+    if "MapValue" not in list(df.columns):
+        df.insert(df.columns.get_loc("WTCPUE")+1, "MapValue", np.nan)
+        #-->> MapValue
+        message(f"\tCalculating the MapValue values")
+        df["MapValue"] = df["WTCPUE"].pow((1.0/3.0))
+
+    message(f"\tInserting 'SpeciesCommonName' column into: {table_name}")
+    if "SpeciesCommonName" not in list(df.columns):
+        df.insert(df.columns.get_loc("CommonName")+1, "SpeciesCommonName", "")
+
+    message(f"\tInserting 'CommonNameSpecies' column into: {table_name}")
+    if "CommonNameSpecies" not in list(df.columns):
+        df.insert(df.columns.get_loc("SpeciesCommonName")+1, "CommonNameSpecies", "")
+
+    # Test if 'IDW' in table name
+    if "IDW" in table_name:
+        message(f"\tInserting 'Season' {season} column into: {table_name}")
+        if "Season" not in list(df.columns):
+            df.insert(df.columns.get_loc("Region")+1, "Season", season if season != None else "")
+
+        message(f"\tInserting 'SummaryProduct' column into: {table_name}")
+        if "SummaryProduct" not in list(df.columns):
+            df.insert(df.columns.get_loc("Season")+1, "SummaryProduct", "Yes")
+
+        message(f"\tInserting 'TransformUnit' column into: {table_name}")
+        if "TransformUnit" not in list(df.columns):
+            df.insert(df.columns.get_loc("MapValue")+1, "TransformUnit", "cuberoot")
+
+        message(f"\tInserting 'CoreSpecies' column into: {table_name}")
+        if "CoreSpecies" not in list(df.columns):
+            df.insert(df.columns.get_loc("CommonNameSpecies")+1, "CoreSpecies", "No")
+
+        message(f"\tCalculate Null for 'StratumArea' column into: {table_name}")
+        if "StratumArea" in list(df.columns):
+            df["StratumArea"] = df["StratumArea"].fillna(np.nan)
+
+        message(f"\tCalculate Null for 'DistributionProjectName' column into: {table_name}")
+        if "DistributionProjectName" in list(df.columns):
+            df["DistributionProjectName"] = df["DistributionProjectName"].fillna(np.nan)
+
+    # Test if 'GLMME' or 'GFDL' in region name
+    if any(t for t in ["GLMME", "GFDL"] if t in table_name):
+        message(f"\tInserting 'SummaryProduct' column into: {table_name}")
+        if "SummaryProduct" not in list(df.columns):
+            df.insert(df.columns.get_loc("Region")+1, "SummaryProduct", "No")
+
+        message(f"\tInserting 'StandardError' column into: {table_name}")
+        if "StandardError" not in list(df.columns):
+            df.insert(df.columns.get_loc("MapValue")+1, "StandardError", np.nan)
+
+        message(f"\tInserting 'TransformUnit' column into: {table_name}")
+        if "TransformUnit" not in list(df.columns):
+            df.insert(df.columns.get_loc("StandardError")+1, "TransformUnit", "ln")
+
+        for column in ["Easting", "Northing", "MedianEstimate"]:
+            message(f"\tCalculate Null for '{column}' column into: {table_name}")
+            if column in list(df.columns):
+                df[column] = df[column].fillna(np.nan)
+            del column
+
+    for column in ["WTCPUE", "Latitude", "Longitude", "Depth"]:
+        message(f"\tCalculate Null for '{column}' column into: {table_name}")
+        if column in list(df.columns):
+            df[column] = df[column].fillna(np.nan)
+        del column
+
+    # ###--->>>
+    # CommonName and Species are read as categorical (see
+    # dismap_schema.csv_dtype) and stay categorical until
+    # dismap.dataframe_to_array fills the array, so the text is made once
+    # for each species and not for each row
+    df["Species"] = df["Species"].astype("category")
+
+    #-->> CommonName
+    message(f"\tSetting 'NaN' in 'CommonName' to ''")
+    df["CommonName"] = df["CommonName"].astype("category")
+    if "" not in df["CommonName"].cat.categories:
+        df["CommonName"] = df["CommonName"].cat.add_categories("")
+    df["CommonName"] = df["CommonName"].fillna("")
+
+    #-->> SpeciesCommonName
+    message(f"\tCalculating SpeciesCommonName and setting it to 'Species (CommonName)'")
+    df["SpeciesCommonName"] = combined_names(df["Species"], df["CommonName"], "{species} ({common})")
+
+    #-->> CommonNameSpecies
+    message(f"\tCalculating  CommonNameSpecies and setting it to 'CommonName (Species)'")
+    df["CommonNameSpecies"] = combined_names(df["Species"], df["CommonName"], "{common} ({species})")
+
+    message(f"\tReplacing Infinity values with Nulls")
+    # Replace Inf with Nulls
+    # For some cell values in the 'WTCPUE' column, there is an Inf
+    # value representing an infinit
+    df.replace([np.inf, -np.inf], np.nan, inplace=True)
+
+    # altering the DataFrame
+    df = df[list(table_definition)]
+
+    del message
+
+    return df
+
+def ingest_csv(csv_file="", writer=None, chunk_size=CHUNK_SIZE, transform_args={}, read_csv_args={}):
+    # Reads csv_file chunk_size rows at a time (all of the rows when
+    # chunk_size is 0), applies transform_frame to each chunk and calls
+    # writer(df, first) with it, where first is True for the first chunk.
+    # Returns the number of rows.
+    reader = pd.read_csv(csv_file, chunksize=chunk_size if chunk_size else None, **read_csv_args)
+
+    chunks = reader if chunk_size else [reader]
+
+    n_rows = 0
+
+    try:
+        for i, df in enumerate(chunks):
+            df = transform_frame(df, verbose=(i == 0), **transform_args)
+            writer(df, i == 0)
+            n_rows += len(df)
+            del i, df
+    finally:
+        if chunk_size:
+            reader.close()
+
+    del reader, chunks
+
+    return n_rows
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+#-------------------------------------------------------------------------------
+# Name:        weighted_quantile
+# Purpose:     Weighted quantiles (range limits) of a covariate grid using a
+#              sort order that can be calculated once and reused
+#
+# Author:      john.f.kennedy
+#
+# Created:     10/18/2026
+# Copyright:   (c) john.f.kennedy 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+# This module only depends on NumPy so that it can be used (and checked)
+# outside of ArcGIS Pro.
+import numpy as np
+
+# The 5th and 95th percentile used for the Minimum and Maximum indicators
+RANGE_QUANTILES = [0.05, 0.95]
+
+def covariate_order(values):
+    # Sort order of a covariate grid with the Null cells removed. Covariate
+    # grids are the same for every species-year in a region, so this is
+    # calculated once and passed to weighted_quantiles.
+    values = np.ascontiguousarray(values).ravel()
+    order = values.argsort(kind="stable")
+    return order[:np.count_nonzero(~np.isnan(values))]
+
+def weighted_quantiles(values, weights, quantiles=RANGE_QUANTILES, order=None):
+    # Returns the covariate values at the weighted quantiles.
+    #   values:    covariate grid (any shape)
+    #   weights:   biomass grid with the same number of cells as values.
+    #              Null, zero and negative weights are left out.
+    #   quantiles: list of quantiles between 0 and 1, for example
+    #              [0.05, 0.95] or [0.1, 0.5, 0.9]
+    #   order:     sort order from covariate_order, calculated if not given
+    # The result has one value per quantile, and is NaN when there is no
+    # biomass.
+    #
+    # Like the original argmin search, the value used is the one at the cell
+    # whose cumulative biomass quantile is nearest to q, with ties going to
+    # the lower cell. The quantile only increases at cells with biomass, so
+    # np.searchsorted finds the first cell at or above q and the cell below
+    # is the last cell with biomass before it.
+
+    if order is None:
+        order = covariate_order(values)
+
+    quantiles = np.asarray(quantiles, dtype=np.float64)
+
+    if np.any((quantiles < 0.0) | (quantiles > 1.0)):
+        raise ValueError(f"Quantiles must be between 0 and 1: {quantiles.tolist()}")
+
+    values = np.ascontiguousarray(values).ravel()
+
+    sorted_weights = np.ascontiguousarray(weights).ravel()[order]
+    sorted_weights = np.where(sorted_weights > 0.0, sorted_weights, 0.0)
+
+    # One cumulative sum gives every quantile
+    cumulative = np.cumsum(sorted_weights, dtype=np.float64)
+
+    total = cumulative[-1] if order.size else 0.0
+
+    result = np.full(quantiles.size, np.nan)
+
+    if total > 0.0:
+        # The quantiles as cumulative biomass, so the cumulative sum does
+        # not need to be divided by the total biomass
+        targets = quantiles * total
+
+        # First and last cells with biomass
+        first = np.searchsorted(cumulative, 0.0, side="right")
+        last  = np.searchsorted(cumulative, total, side="left")
+
+        # First cell with biomass at or above each quantile
+        above = np.clip(np.searchsorted(cumulative, targets, side="left"), first, last)
+
+        # Last cell with biomass below it
+        below_cumulative = cumulative[np.maximum(above - 1, 0)]
+        below = np.searchsorted(cumulative, below_cumulative, side="left")
+
+        use_below = (above > first) & (targets - below_cumulative <= cumulative[above] - targets)
+
+        result = values[order[np.where(use_below, below, above)]]
+
+        del targets, first, last, above, below_cumulative, below, use_below
+
+    del sorted_weights, cumulative, total, order
+
+    return result
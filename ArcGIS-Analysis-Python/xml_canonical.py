@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+#-------------------------------------------------------------------------------
+# Name:        xml_canonical
+# Purpose:     Writes the ArcGIS metadata XML files in the DisMAP pretty
+#              format
+#
+# Author:      john.f.kennedy
+#
+# Created:     10/18/2026
+# Copyright:   (c) john.f.kennedy 2026
+# Licence:     <your licence>
+#-------------------------------------------------------------------------------
+# Used by dismap.pretty_format_xml_file and dismap.pretty_format_xml_files.
+# The XML is indented with ElementTree, then the Sync attributes and the
+# elements written on one line are fixed in one pass of a compiled regular
+# expression. A file is only written when its content changes. This module
+# does not use arcpy.
+import os
+import re
+import hashlib
+import xml.etree.ElementTree as ET
+
+# The elements where the line break after the start tag is removed, the
+# elements given a Sync="TRUE" attribute, and Sync="FALSE", which is set to
+# Sync="TRUE"
+PATTERN = re.compile(r' (?:Sync="(?:TRUE|FALSE)"|value="(?:eng|US|00[1-9]|01[0-5])"|code="0")>\n'
+                     r'|<RefSystem dimension="horizontal">\n'
+                     r'|<UOM type="length">\n'
+                     r'|<(?:attrdef|attrdefs|udom)>'
+                     r'|Sync="FALSE"')
+
+def _replace(match):
+    text = match.group(0)
+    if text.endswith("\n"):
+        return text[:-1].replace('Sync="FALSE"', 'Sync="TRUE"')
+    elif text.startswith("<"):
+        return f'{text[:-1]} Sync="TRUE">'
+    else:
+        return 'Sync="TRUE"'
+
+def canonical_xml(xml_file=""):
+    # The pretty format of an XML file, as a string
+    root = ET.parse(xml_file).getroot()
+    ET.indent(root, space="\t", level=0)
+    xmlstr = ET.tostring(root, encoding="UTF-8").decode("UTF-8")
+    del root
+    return PATTERN.sub(_replace, xmlstr)
+
+def pretty_format(xml_file=""):
+    # Writes the pretty format of an XML file in place. The file is only
+    # written when the content has changed, and then to a temporary file that
+    # replaces the XML file, so the file is never left half written. Returns
+    # True when the file was written.
+    content = canonical_xml(xml_file).encode("UTF-8")
+
+    with open(xml_file, "rb") as f:
+        unchanged = hashlib.sha256(f.read()).digest() == hashlib.sha256(content).digest()
+    del f
+
+    if not unchanged:
+        tmp_file = f"{xml_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "wb") as f:
+            f.write(content)
+        del f
+        os.replace(tmp_file, xml_file)
+        del tmp_file
+
+    del content
+
+    return not unchanged
+
+def _pretty_format(xml_file):
+    # Runs in the Pool process. The exception is returned as text, so one bad
+    # file does not stop the folder.
+    try:
+        return xml_file, pretty_format(xml_file), ""
+    except Exception as e:
+        return xml_file, False, f"{type(e).__name__}: {e}"
+
+def pretty_format_folder(metadata_folder="", processes=1):
+    # Writes the pretty format of each XML file in a folder, using a
+    # multiprocessing Pool when processes is more than 1. Returns a list of
+    # [xml_file, written, error] in the order of the file names.
+    xml_files = sorted(os.path.join(metadata_folder, xml) for xml in os.listdir(metadata_folder) if xml.lower().endswith(".xml"))
+
+    if processes > 1 and len(xml_files) > 1:
+        import multiprocessing
+        with multiprocessing.Pool(processes=min(processes, len(xml_files))) as pool:
+            results = pool.map(_pretty_format, xml_files, chunksize=8)
+        del multiprocessing, pool
+    else:
+        results = [_pretty_format(xml_file) for xml_file in xml_files]
+
+    del xml_files
+
+    return [list(result) for result in results]